@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import argparse
+import csv
+import json
+import resource
+import tracemalloc
+import numpy as np
+from topology_class import inf
+from topology_generator import fabric, fatTree
+from service_class import component, service
+from make_service_graph import make_graph
+from optimisation import columnGeneration
+from pricing import shortest_path_pricer
+from master_problem import master_problem
+from column_generation import solveColumnGeneration
+
+def spine_leaf(n_spines, n_leafs, nodes_per_leaf):
+    # Makes a gateway/spine/leaf/node topology where every spine connects to every leaf, pairs of leafs are joined by
+    # a two way link and each leaf has nodes_per_leaf nodes
+    return fabric(0, n_spines, n_leafs, nodes_per_leaf, name="spine_leaf_{}_{}_{}".format(n_spines, n_leafs, nodes_per_leaf))
+
+def benchmarkGraphBuild(sizes, no_components, repeats=3):
+    # Times make_graph for spine-leaf topologies of increasing size. If construction is linear the time per
+    # element (locations + links) per segment should stay roughly constant as the topology grows.
+    results = []
+    for n_spines, n_leafs, nodes_per_leaf in sizes:
+        _topology = spine_leaf(n_spines, n_leafs, nodes_per_leaf)
+        _service = service("benchmark", [component("component{}".format(i), {"cpu": 1, "ram": 1}, 1) for i in range(no_components)], 1, 10)
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            nodes, edges = make_graph(_service, _topology)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        size = len(_topology.locations) + len(_topology.links)
+        results.append({"topology": _topology.name, "locations": len(_topology.locations), "links": len(_topology.links),
+                        "components": no_components, "graph_nodes": len(nodes), "graph_links": len(edges), "seconds": best,
+                        "us_per_element": 1e6 * best / (size * (no_components + 1))})
+    return results
+
+def makeServices(no_services, no_components):
+    # Services with no_components components each (replica count 1, small requirements) so the master stays feasible
+    return [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 1) for i in range(no_components)], 1, 10)
+            for k in range(no_services)]
+
+def runCase(size, no_components, no_services, backend, mip_pricing):
+    # Runs the pipeline once for a spine-leaf topology of the given size. Returns the seconds taken by each stage and
+    # the sizes of what was built.
+    seconds = {}
+    start = time.perf_counter()
+    _topology = spine_leaf(*size)
+    seconds["topology"] = time.perf_counter() - start
+    services = makeServices(no_services, no_components)
+
+    start = time.perf_counter()
+    nodes, edges = make_graph(services[0], _topology)
+    seconds["make_graph"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for _service in services:
+        _service.addGraph(_topology)
+    seconds["add_graph"] = time.perf_counter() - start
+
+    # Pricing with the hop count costs used to seed column generation. The shortest path pricer is always timed and
+    # the pricing MIP (optimisation.columnGeneration) only if mip_pricing, in which case its paths are the ones kept.
+    start = time.perf_counter()
+    paths = []
+    for _service in services:
+        pricer = shortest_path_pricer(_topology, _service)
+        links_i, _ = pricer.shortestPath(np.array([l.cost for l in pricer.graph.links]))
+        paths.append(pricer.makePath(links_i))
+    seconds["pricing"] = time.perf_counter() - start
+    if mip_pricing:
+        start = time.perf_counter()
+        for _service in services:
+            columnGeneration(_topology, _service, verbose=False, backend=backend)
+        seconds["mip_pricing"] = time.perf_counter() - start
+    else:
+        for _service, path in zip(services, paths):
+            _service.graphs[_topology.name].addPath(path)
+
+    start = time.perf_counter()
+    master = master_problem(_topology, services, relax=True, artificial_cost=inf, verbose=False, backend=backend)
+    seconds["master_build"] = time.perf_counter() - start
+    start = time.perf_counter()
+    status = master.solve()
+    seconds["master_solve"] = time.perf_counter() - start
+
+    return seconds, {"topology": _topology.name, "locations": len(_topology.locations), "links": len(_topology.links),
+                     "components": no_components, "services": no_services, "graph_nodes": len(nodes), "graph_links": len(edges),
+                     "master_rows": master.solver.numRows(), "master_columns": master.solver.numVariables(), "master_status": status}
+
+def benchmarkPipeline(sizes, components, services, repeats=3, backend="highs", mip_pricing=False):
+    # Sweeps topology size, component count and service count. Every case is run repeats times and the fastest time of
+    # each stage is kept, then run once more under tracemalloc to find the peak Python memory (kept separate since
+    # tracing slows everything down). Returns a list with a dictionary of results for each case.
+    results = []
+    for size in sizes:
+        for no_components in components:
+            for no_services in services:
+                best = {}
+                for _ in range(repeats):
+                    seconds, result = runCase(size, no_components, no_services, backend, mip_pricing)
+                    for stage in seconds:
+                        best[stage] = min(best.get(stage, seconds[stage]), seconds[stage])
+                tracemalloc.start()
+                runCase(size, no_components, no_services, backend, mip_pricing)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                for stage in best:
+                    result[stage + "_seconds"] = best[stage]
+                result["peak_memory_mb"] = peak / 2**20
+                # Peak resident memory of the whole process so far (includes solver memory that tracemalloc does not see)
+                result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+                results.append(result)
+    return results
+
+def benchmarkStabilisation(sizes, no_services, no_components, throughput=3, methods=(None, "wentges", "boxstep"), backend="highs"):
+    # Runs column generation on fat tree topologies of the given sizes (ports per switch) with and without dual
+    # stabilisation. Returns a list with a dictionary of the iterations, LP bound, mis-pricings and column generation
+    # time of each topology and stabilisation method.
+    results = []
+    for k in sizes:
+        for method in methods:
+            _topology = fatTree(k, seed=1)
+            services = makeServices(no_services, no_components)
+            for _service in services:
+                _service.required_throughput = throughput
+                _service.addLayeredGraph(_topology)
+            master, history = solveColumnGeneration(_topology, services, backend=backend, stabilisation=method)
+            results.append({"topology": _topology.name, "stabilisation": str(method), "iterations": len(history),
+                            "lp_objective": history[-1]["objective"], "mispricings": sum(h["mispricings"] for h in history),
+                            "cg_seconds": history[-1]["time"], "objective": master.getObjective()})
+    return results
+
+def caseKey(result):
+    return (result["topology"], int(result["components"]), int(result["services"]))
+
+def writeResults(results, filename):
+    # Writes results as JSON or, if filename ends in .csv, CSV
+    if filename.endswith(".csv"):
+        fields = list(dict.fromkeys(key for result in results for key in result))
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(filename, "w") as f:
+            json.dump(results, f, indent=2)
+
+def readResults(filename):
+    # Reads results written by writeResults
+    if filename.endswith(".csv"):
+        with open(filename, newline="") as f:
+            results = list(csv.DictReader(f))
+        for result in results:
+            for key in result:
+                try:
+                    result[key] = float(result[key])
+                except ValueError:
+                    pass
+        return results
+    with open(filename) as f:
+        return json.load(f)
+
+def compareResults(results, baseline, tolerance=0.25, min_seconds=0.01):
+    # Compares the stage times and peak memory of each case with the same case in baseline. A metric has regressed if it
+    # is more than tolerance (relative) worse and, for times, also more than min_seconds worse so noise on very short
+    # stages is ignored. Returns a list with a dictionary for each regression.
+    previous = dict((caseKey(result), result) for result in baseline)
+    regressions = []
+    for result in results:
+        old = previous.get(caseKey(result))
+        if old == None:
+            continue
+        for metric in result:
+            if not (metric.endswith("_seconds") or metric == "peak_memory_mb") or old.get(metric) in (None, ""):
+                continue
+            new_value, old_value = float(result[metric]), float(old[metric])
+            floor = min_seconds if metric.endswith("_seconds") else 0
+            if new_value > old_value * (1 + tolerance) and new_value - old_value > floor:
+                regressions.append({"case": caseKey(result), "metric": metric, "baseline": old_value, "result": new_value,
+                                    "ratio": new_value / old_value if old_value > 0 else inf})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks graph build, pricing and the master problem on spine-leaf topologies")
+    parser.add_argument("--sizes", nargs="+", default=["2,8,4", "4,16,8", "8,32,16"], help="spine-leaf sizes as n_spines,n_leafs,nodes_per_leaf")
+    parser.add_argument("--components", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--services", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backend", default="highs", help="solver backend for the master problem and pricing MIP")
+    parser.add_argument("--mip-pricing", action="store_true", help="also time the pricing MIP (optimisation.columnGeneration)")
+    parser.add_argument("--output", help="file (.json or .csv) to write the results to")
+    parser.add_argument("--baseline", help="results file (.json or .csv) to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slow down counted as a regression")
+    parser.add_argument("--graph-build", action="store_true",
+                        help="instead time make_graph alone for each size and component count (time per element should stay flat)")
+    parser.add_argument("--stabilisation", nargs="*", type=int, metavar="K",
+                        help="instead compare column generation iterations with and without dual stabilisation on fat trees with K ports (default 8 12)")
+    args = parser.parse_args()
+    sizes = [tuple(int(n) for n in size.split(",")) for size in args.sizes]
+
+    if args.graph_build:
+        results = [result for no_components in args.components for result in benchmarkGraphBuild(sizes, no_components, args.repeats)]
+        print("{:>22} {:>5} {:>12} {:>12} {:>10} {:>14}".format("topology", "comp", "graph nodes", "graph links", "seconds", "us/element"))
+        for result in results:
+            print("{topology:>22} {components:>5} {graph_nodes:>12} {graph_links:>12} {seconds:>10.4f} {us_per_element:>14.3f}".format(**result))
+        if args.output:
+            writeResults(results, args.output)
+        return
+
+    if args.stabilisation != None:
+        results = benchmarkStabilisation(args.stabilisation or [8, 12], 6, 3, backend=args.backend)
+        print("{:>22} {:>13} {:>10} {:>12} {:>11} {:>10}".format("topology", "stabilisation", "iterations", "LP", "mispricings", "CG time"))
+        for result in results:
+            print("{topology:>22} {stabilisation:>13} {iterations:>10} {lp_objective:>12.6g} {mispricings:>11} {cg_seconds:>10.3f}".format(**result))
+        if args.output:
+            writeResults(results, args.output)
+        return
+
+    results = benchmarkPipeline(sizes, args.components, args.services, args.repeats, args.backend, args.mip_pricing)
+    stages = ["make_graph", "add_graph", "pricing", "mip_pricing", "master_build", "master_solve"]
+    stages = [stage for stage in stages if stage + "_seconds" in results[0]]
+    print("{:>22} {:>5} {:>5} {:>9} {:>9}".format("topology", "comp", "serv", "rows", "columns") + "".join(" {:>13}".format(stage) for stage in stages) + " {:>9}".format("peak MB"))
+    for result in results:
+        print("{topology:>22} {components:>5} {services:>5} {master_rows:>9} {master_columns:>9}".format(**result)
+              + "".join(" {:>13.4f}".format(result[stage + "_seconds"]) for stage in stages) + " {:>9.1f}".format(result["peak_memory_mb"]))
+    if args.output:
+        writeResults(results, args.output)
+    if args.baseline:
+        regressions = compareResults(results, readResults(args.baseline), args.tolerance)
+        for regression in regressions:
+            print("Regression in {case}: {metric} {baseline:.4g} -> {result:.4g} ({ratio:.2f}x)".format(**regression))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
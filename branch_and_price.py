@@ -0,0 +1,320 @@
+import heapq
+import itertools
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from master_problem import master_problem
+from pricing import makePricer
+from solver_backend import makeBackend, OPTIMAL
+from topology_class import inf
+from heuristic import greedyPlacement
+from metrics import logger, count
+
+# Assignment values within this of 0 or 1 count as integral
+integrality_tolerance = 1e-6
+
+class tree_node(object):
+    id_iter = itertools.count()
+    ## Node of the branch and price tree
+        # \param fixed      {(component index, node index): 0 or 1} of the assignments fixed by the branches down to the node
+        # \param bound      Lower bound on the objective of every solution in the node's subtree (the parent's bound
+        #                   until the node is solved)
+        # \param depth      Number of branches from the root
+    def __init__(self, fixed, bound, depth):
+        self.id = next(tree_node.id_iter)
+        self.fixed = fixed
+        self.bound = bound
+        self.depth = depth
+
+    def __lt__(self, other):
+        # Best bound first, then deepest
+        return (self.bound, -self.depth, self.id) < (other.bound, -other.depth, other.id)
+
+class branch_and_price(object):
+    ## Branch and price over the component to node assignments of the master problem. Every tree node is solved by column
+    ## generation over the LP relaxation with the assignments fixed by its branches, pricing only paths through allowed
+    ## (component, node) pairs, and is branched on its most fractional assignment (fixed to 1, then 0). Tree nodes are
+    ## solved in parallel by worker threads, each with its own master_problem, sharing the column pools of the service
+    ## graphs so a column priced at one node is available at every other. Workers dive depth first into the y = 1 child
+    ## while its bound is within dive_gap of the way from the best open bound to the incumbent (always, until there is an
+    ## incumbent) and otherwise take the open node with the best bound.
+    ## A node is pruned as soon as its Lagrangian bound (master_problem.lagrangianBound) reaches the incumbent, without
+    ## waiting for column generation to converge. The search stops when the gap between the incumbent and the best bound
+    ## is at most gap.
+        # \param topology           Topology the service graphs were made from
+        # \param services           List of services, each with a graph for topology
+        # \param workers            Number of tree nodes solved at once (threads, as the solvers run outside the GIL)
+        # \param gap                Relative gap between the incumbent and best bound at which to stop
+        # \param time_limit         Wall clock budget in seconds (None for no limit)
+        # \param node_limit         Most tree nodes solved (None for no limit)
+        # \param max_iterations     Most column generation iterations at a tree node. A node that needs more is still
+        #                           branched on but its bound is only the best of its parent's and its Lagrangian bound.
+        # \param tolerance          Reduced cost below -tolerance counts as negative
+        # \param artificial_cost    Cost of the artificial flow variables that keep the master feasible
+        # \param pricing            "shortest_path" or "latency" (see column_generation.solveColumnGeneration)
+        # \param backend            Solver backend for the master problems ("gurobi" or "highs")
+        # \param heuristic          If True, heuristic.greedyPlacement gives starting columns and incumbent
+        # \param root_mip           If True, the master over the columns found at the root is solved as a MIP for an incumbent
+        # \param dive_gap           Fraction of the gap between the best open bound and the incumbent within which workers
+        #                           keep diving
+    def __init__(self, topology, services, workers=1, gap=1e-4, time_limit=None, node_limit=None, max_iterations=1000, tolerance=1e-6,
+                 artificial_cost=inf, pricing="shortest_path", backend="gurobi", heuristic=True, root_mip=True, dive_gap=0.25, verbose=False):
+        if pricing not in ("shortest_path", "latency"):
+            raise ValueError("pricing must be 'shortest_path' or 'latency'")
+        self.topology = topology
+        self.services = services
+        self.workers = max(1, workers)
+        self.gap = gap
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.artificial_cost = artificial_cost
+        self.pricing = pricing
+        self.backend = backend
+        self.heuristic = heuristic
+        self.root_mip = root_mip
+        self.dive_gap = dive_gap
+        self.verbose = verbose
+        # Best solution found: objective, {component: [nodes]} and {service: {column: flow}}
+        self.objective = np.inf
+        self.placement = None
+        self.flows = None
+        self.bound = -np.inf
+        self.nodes_solved = 0
+        self.status = None
+        self.history = []
+
+    def relativeGap(self):
+        # (incumbent - best bound) / |incumbent|, inf if there is no incumbent
+        if self.objective == np.inf:
+            return np.inf
+        return max(self.objective - self.bound, 0.0) / max(1.0, abs(self.objective))
+
+    def solve(self):
+        # Runs the search. Returns self, with the best solution in objective, placement and flows and status "optimal"
+        # or "infeasible" (the tree was searched), "gap" (stopped within gap), "time_limit" or "node_limit".
+        topology, services = self.topology, self.services
+        self.start = time.perf_counter()
+        pricers = self.makePricers()
+        if self.heuristic == True:
+            solution = greedyPlacement(topology, services, pricers)
+            if solution.feasible:
+                self.update(solution.cost, solution.placement, solution.flows)
+        for service in services:
+            graph = service.graphs[topology.name]
+            if not graph.getPaths():
+                pricer = pricers[service.description]
+                links_i, _ = pricer.shortestPath(pricer.initialCosts())
+                if links_i:
+                    graph.addPath(pricer.makePath(links_i))
+
+        # Components and nodes in the order of the master problem's assignment variables
+        components = {}
+        for service in services:
+            for component in service.components:
+                components[component] = None
+        self.components = list(components)
+        self.nodes = topology.getLocationsByType("node")
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.open = [tree_node({}, -np.inf, 0)]
+        self.solving = {}
+        self.stop = None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self.worker, w) for w in range(self.workers)]:
+                future.result()
+        if self.stop == None:
+            # The whole tree was searched
+            self.status = "optimal" if self.objective < np.inf else "infeasible"
+            self.bound = self.objective
+        else:
+            self.status = self.stop
+        logger.info("Branch and price finished ({}) after {} nodes: objective {:.6g}, bound {:.6g}, gap {:.3g}, time {:.3f}s".format(
+            self.status, self.nodes_solved, self.objective, self.bound, self.relativeGap(), time.perf_counter() - self.start))
+        return self
+
+    def makePricers(self):
+        # {service description: pricer}. Pricers keep the state of their last search (e.g. latency_pricer.exact) so each
+        # worker has its own.
+        return dict((s.description, makePricer(self.topology, s, latency=self.pricing == "latency")) for s in self.services)
+
+    def update(self, objective, placement, flows):
+        # Takes a solution as the incumbent if it is better (the lock must be held, or no workers running)
+        if objective < self.objective - 1e-9:
+            self.objective, self.placement, self.flows = objective, placement, flows
+            logger.info("Branch and price: new incumbent {:.6g}".format(objective))
+            return True
+        return False
+
+    def pruned(self, bound):
+        return bound >= self.objective - self.gap * max(1.0, abs(self.objective))
+
+    def bestBound(self):
+        # Least bound over the open nodes and those being solved or about to be dived into (the lock must be held)
+        bounds = [node.bound for node in self.solving.values()]
+        if self.open:
+            bounds.append(self.open[0].bound)
+        return min(bounds) if bounds else self.objective
+
+    def checkStop(self):
+        # Sets self.stop if the search should end early (the lock must be held)
+        self.bound = max(self.bound, min(self.bestBound(), self.objective))
+        if self.stop != None:
+            return
+        if self.objective < np.inf and self.relativeGap() <= self.gap:
+            self.stop = "gap"
+        elif self.time_limit != None and time.perf_counter() - self.start > self.time_limit:
+            self.stop = "time_limit"
+        elif self.node_limit != None and self.nodes_solved >= self.node_limit:
+            self.stop = "node_limit"
+
+    def worker(self, w):
+        # Solves tree nodes until the tree is searched or the search stops
+        try:
+            with self.lock:
+                backend = makeBackend(self.backend, "{}_{}".format(self.topology.name, w), self.verbose, threaded=self.workers > 1)
+                master = master_problem(self.topology, self.services, relax=True, artificial_cost=self.artificial_cost, verbose=self.verbose,
+                                        backend=backend, shared_pool=True)
+            pricers = self.makePricers()
+            dive = None
+            while True:
+                with self.condition:
+                    node = None
+                    while node == None:
+                        self.checkStop()
+                        if self.stop != None:
+                            break
+                        if dive != None:
+                            node, dive = dive, None
+                            del self.solving[w]
+                        elif self.open:
+                            node = heapq.heappop(self.open)
+                        elif not self.solving:
+                            break
+                        else:
+                            self.condition.wait()
+                            continue
+                        if self.pruned(node.bound):
+                            node = None
+                    if node == None:
+                        # A dive left when the search stopped
+                        self.solving.pop(w, None)
+                        self.condition.notify_all()
+                        return
+                    self.solving[w] = node
+                children = self.solveNode(master, pricers, node)
+                with self.condition:
+                    del self.solving[w]
+                    self.nodes_solved += 1
+                    if children:
+                        # Dives into the y = 1 child unless it is too far from the best open bound
+                        best = min(self.open[0].bound, children[0].bound) if self.open else children[0].bound
+                        if self.objective == np.inf or children[0].bound <= best + self.dive_gap * (self.objective - best):
+                            # Kept in solving until it is taken so that its bound counts in bestBound
+                            dive = self.solving[w] = children[0]
+                            children = children[1:]
+                        for child in children:
+                            heapq.heappush(self.open, child)
+                    self.condition.notify_all()
+        except BaseException:
+            with self.condition:
+                self.stop = "error"
+                self.condition.notify_all()
+            raise
+
+    def forbidden(self, node):
+        # assignmentflow dual keys of the (service, component, node) triples fixed to 0 at node
+        keys = []
+        for (c, n), value in node.fixed.items():
+            if value == 0:
+                component = self.components[c]
+                keys += [(s.description, component.description, self.nodes[n].description) for s in self.services if component in s.components]
+        return keys
+
+    def solveNode(self, master, pricers, node):
+        # Column generation at node, then branching. Returns the children of node (empty if it is pruned or integral).
+        master.fixAssignments(node.fixed)
+        forbidden = self.forbidden(node)
+        converged = False
+        # Best Lagrangian bound on the node's LP relaxation (master_problem.lagrangianBound) over its iterations, so
+        # the node can be pruned before column generation converges
+        lagrangian = -np.inf
+        for iteration in range(self.max_iterations):
+            with self.lock:
+                master.addNewColumns()
+            if master.solve() != OPTIMAL:
+                # The fixings leave no feasible placement
+                count("bp_nodes_infeasible")
+                return []
+            duals = master.getDuals()
+            for key in forbidden:
+                duals["assignmentflow"][key] = -np.inf
+            new_paths, reduced_costs = [], {}
+            for service in self.services:
+                pricer = pricers[service.description]
+                links_i, cost = pricer.shortestPath(pricer.linkCosts(duals))
+                reduced_cost = cost - duals["throughput"][service.description] if links_i else np.inf
+                if getattr(pricer, "exact", True) == True:
+                    reduced_costs[service.description] = reduced_cost
+                if reduced_cost < -self.tolerance:
+                    new_paths.append((service, pricer.makePath(links_i)))
+            if not new_paths:
+                # Converged only if every pricer proved there is no path with negative reduced cost
+                converged = len(reduced_costs) == len(self.services)
+                break
+            lagrangian = max(lagrangian, master.lagrangianBound(master.solver.duals(), reduced_costs))
+            with self.lock:
+                if self.pruned(lagrangian):
+                    count("bp_nodes_pruned_early")
+                    self.history.append({"node": node.id, "depth": node.depth, "bound": lagrangian, "objective": master.getObjective(), "iterations": iteration + 1,
+                                         "converged": False, "incumbent": self.objective, "time": time.perf_counter() - self.start})
+                    return []
+            with self.lock:
+                for service, path in new_paths:
+                    service.graphs[self.topology.name].addPath(path)
+            count("bp_columns", len(new_paths))
+        result = master.getResult()
+        objective = result.objective
+        bound = max(node.bound, objective) if converged else max(node.bound, lagrangian)
+        y = result.values("y")
+        fractional = np.abs(y - np.round(y)) > integrality_tolerance
+        with self.lock:
+            self.history.append({"node": node.id, "depth": node.depth, "bound": bound, "objective": objective, "iterations": iteration + 1,
+                                 "converged": converged, "incumbent": self.objective, "time": time.perf_counter() - self.start})
+            if not fractional.any():
+                # Flows are continuous so an integral assignment is a solution
+                self.update(objective, result.placements(), self.columnFlows(master, result))
+        if node.depth == 0 and self.root_mip == True:
+            self.rootMIP(master)
+        with self.lock:
+            if not fractional.any() or self.pruned(bound):
+                return []
+        # Branches on the most fractional assignment
+        k = int(np.argmin(np.where(fractional, np.abs(y - 0.5), np.inf)))
+        key = (k // len(self.nodes), k % len(self.nodes))
+        children = []
+        for value in (1, 0):
+            fixed = dict(node.fixed)
+            fixed[key] = value
+            children.append(tree_node(fixed, bound, node.depth + 1))
+        return children
+
+    def columnFlows(self, master, result):
+        # {service: {column: flow}} of the flows above 0 in the solution of master
+        flows = {}
+        for service in self.services:
+            values = result.flows(service)
+            flows[service.description] = dict((int(k), float(values[k])) for k in np.flatnonzero(values > 1e-9))
+        return flows
+
+    def rootMIP(self, master):
+        # Solves the master over the columns found so far with binary assignments for an incumbent
+        master.setRelaxed(False)
+        if master.solve() == OPTIMAL:
+            result = master.getResult()
+            with self.lock:
+                self.update(result.objective, result.placements(), self.columnFlows(master, result))
+        master.setRelaxed(True)
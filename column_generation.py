@@ -0,0 +1,285 @@
+import time
+import numpy as np
+from optimisation import pricingProblem, makePath, columnGeneration
+from master_problem import master_problem
+from topology_class import inf
+from pricing import makePricer
+from solver_backend import OPTIMAL
+from metrics import logger, timer, count
+from parallel_pricing import pricing_pool
+from warm_start import loadState, applyState, saveState
+from heuristic import greedyPlacement, applyStart
+from stabilisation import makeStabiliser
+
+# Small cost added to every service graph link when pricing so that zero cost cycles are never part of a path
+hop_cost = 1e-6
+
+def dualCosts(topology, service, duals):
+    # Prices the links in the service graph so that the cost of a path is its reduced cost plus the throughput dual.
+    # A link copied from a topology link costs minus the bandwidth dual of that link and a link into a dummy node
+    # representing component c on node n costs minus the assignmentflow dual for (service, c, n).
+    # Returns the array of dual costs (without hop_cost) over the service graph links. The links' own costs are left
+    # as they are.
+    graph = service.graphs[topology.name]
+    nodes = topology.getNodes()
+    costs = np.zeros(len(graph.links))
+    for i in range(len(graph.links)):
+        l = graph.links[i]
+        cost = 0
+        if l.origin != None:
+            cost -= duals["bandwidth"][l.origin]
+        if l.sink.assignment != None:
+            c, n = l.sink.assignment
+            cost -= duals["assignmentflow"][(service.description, service.components[c].description, nodes[n].description)]
+        # Duals of <= rows are non-positive so any negative cost here is numerical noise
+        costs[i] = max(cost, 0)
+    return costs
+
+def evictColumns(master, services, max_columns, max_age):
+    # Ages the active columns of each service from the basis of the solved master and evicts those the pool chooses
+    result = master.getResult()
+    reduced_costs, basis = result.RC, result.VBasis
+    for service in services:
+        pool = service.graphs[master.topology.name].pool
+        columns, variables = master.activeColumns(service)
+        basic = basis[variables] == 0
+        pool.update(columns.tolist(), reduced_costs[variables], basic)
+        master.evictColumns(service, pool.evictionCandidates(columns.tolist(), basic, max_columns, max_age))
+
+def poolStats(topology, services):
+    # Column pool statistics summed over the services
+    stats = {}
+    for service in services:
+        for key, value in service.graphs[topology.name].pool.stats().items():
+            stats[key] = stats.get(key, 0) + value
+    return stats
+
+def solveColumnGeneration(topology, services, max_iterations=100, time_limit=None, tolerance=1e-6, artificial_cost=inf, pricing="shortest_path", workers=None, backend="gurobi", max_columns=None, max_age=None, warm_start_dir=None, master=None, heuristic=False, stabilisation=None, gap=None, max_labels=None, verbose=False):
+    # Column generation over the paths of each service graph. Each iteration re-solves the LP relaxation of the master
+    # problem (kept alive between iterations and warm started), reprices every service graph with its duals and adds each path with negative reduced cost as a new column.
+    # Stops when no path has negative reduced cost, the iteration/time budget runs out or the master objective is within
+    # gap of the best Lagrangian bound on the LP relaxation (master_problem.lagrangianBound, from the pricing results),
+    # then solves the master problem with binary assignment variables over the paths generated. If the only paths priced
+    # with negative reduced cost are already in the master, it stops "stalled" rather than "optimal", and if no path has
+    # negative reduced cost but a pricer could not prove its path the cheapest (pricing.latency_pricer reaching
+    # max_labels), it stops "inexact".
+    # \param max_iterations    Maximum number of master/pricing iterations
+    # \param time_limit        Wall clock budget in seconds (None for no limit)
+    # \param tolerance         Reduced cost below -tolerance counts as negative
+    # \param artificial_cost   Cost of the artificial flow variables that keep the master feasible
+    # \param pricing           "shortest_path" to price with Dijkstra over the service graph (pricing.shortest_path_pricer,
+    #                          or pricing.layered_pricer for graphs made with service.addLayeredGraph)
+    #                          "latency" to price only paths within the latency budget of each service as a resource
+    #                          constrained shortest path (pricing.latency_pricer, layered graphs only)
+    #                          or "mip" to solve the pricing MIP (optimisation.pricingProblem)
+    # \param workers           If more than 1, shortest path pricing is done in parallel with this many worker processes
+    #                          (parallel_pricing.pricing_pool)
+    # \param backend           Solver backend for the master problem and pricing MIP ("gurobi" or "highs")
+    # \param max_columns       If given, the most columns of each service kept in the master. Non basic columns are evicted
+    #                          (oldest first) to stay within it and added back if they are priced out again.
+    # \param max_age           If given, columns not basic for more than this many iterations are evicted
+    # \param warm_start_dir    If given, the columns, LP basis and placement saved there by an earlier run on the same
+    #                          topology and services (see warm_start) start this run, which saves its own on finishing
+    # \param master            master_problem returned by an earlier call for topology and services. The changes made to
+    #                          the topology since (topology.removeLink, updateLink etc.) are applied to it in place
+    #                          (master_problem.applyDeltas) and column generation restarts from its last LP basis.
+    # \param heuristic         If True, a greedy placement and routing (heuristic.greedyPlacement) seeds the service graphs
+    #                          with columns that make the master feasible and is the start of the final MIP solve
+    # \param stabilisation     "wentges" or "boxstep" (or a stabilisation.stabiliser) to price at stabilised duals,
+    #                          None to price at the master's duals (stabilisation.stabiliser)
+    # \param gap               If given, stop once (master objective - Lagrangian bound) / max(1, |master objective|) is
+    #                          at most this. The bound is only known when every pricer is exact, so gap is not
+    #                          reached with pricing="latency" if a service's pricer gave up (pricing.latency_pricer).
+    # \param max_labels        Most labels made by each latency pricer in one search (pricing.latency_pricer's default if
+    #                          None)
+    # Returns the final master_problem and a list with a dictionary of bounds and counts for each iteration, including
+    # the best Lagrangian bound so far ("lagrangian_bound") and the relative gap to the master objective ("gap"). The
+    # last also has the reason column generation stopped ("status"). If nothing was priced it is the only one, with
+    # objective None.
+    if pricing not in ("shortest_path", "latency", "mip"):
+        raise ValueError("pricing must be 'shortest_path', 'latency' or 'mip'")
+    if pricing == "mip" and any(service.graphs[topology.name].layered != None for service in services):
+        raise ValueError("layered service graphs can only be priced with pricing='shortest_path' or 'latency'")
+    start = time.perf_counter()
+    state = loadState(topology, services, warm_start_dir) if warm_start_dir != None and master == None else None
+    if master != None:
+        master.setRelaxed(True)
+        master.applyDeltas()
+    pricers = {}
+    if pricing != "mip":
+        for service in services:
+            pricers[service.description] = makePricer(topology, service, latency=pricing == "latency", max_labels=max_labels)
+    solution = None
+    if heuristic == True and master == None:
+        solution = greedyPlacement(topology, services, pricers if pricing != "mip" else None)
+    # Seeds each service graph with a shortest path (by number of links) if it has none
+    for service in services:
+        graph = service.graphs[topology.name]
+        if graph.getPaths():
+            continue
+        if pricing != "mip":
+            pricer = pricers[service.description]
+            links_i, _ = pricer.shortestPath(pricer.initialCosts())
+            # There may be no path within the latency budget, leaving the service to its artificial flow
+            if links_i:
+                graph.addPath(pricer.makePath(links_i))
+        else:
+            columnGeneration(topology, service, verbose, backend)
+
+    pool = None
+    if pricing != "mip" and workers != None and workers > 1:
+        pool = pricing_pool([pricers[service.description] for service in services], workers)
+
+    # The worker processes are shut down even if the solver or pricing raises
+    try:
+        if master == None:
+            master = master_problem(topology, services, relax=True, artificial_cost=artificial_cost, verbose=verbose, backend=backend)
+        if state != None:
+            applyState(master, state)
+        def price(duals):
+            # Prices every service at duals. Returns the paths with negative reduced cost, [(service, path)], and the least
+            # reduced cost of a path of each service, {service: reduced cost} (inf if there is no path, left out if the
+            # pricer could not prove its path the cheapest)
+            new_paths, reduced_costs = [], {}
+            if pool != None:
+                priced = pool.price(duals)
+            for s, service in enumerate(services):
+                exact = True
+                if pool != None:
+                    pricer = pricers[service.description]
+                    links_i, cost, exact = priced[s]
+                elif pricing != "mip":
+                    pricer = pricers[service.description]
+                    links_i, cost = pricer.shortestPath(pricer.linkCosts(duals))
+                    exact = getattr(pricer, "exact", True)
+                else:
+                    costs = dualCosts(topology, service, duals)
+                    _, links_i = pricingProblem(topology, service, verbose, backend, costs + hop_cost)
+                    cost = costs[links_i].sum()
+                if exact == True:
+                    reduced_costs[service.description] = np.inf
+                if not links_i:
+                    continue
+                reduced_cost = cost - duals["throughput"][service.description]
+                if service.description in reduced_costs:
+                    reduced_costs[service.description] = reduced_cost
+                if reduced_cost < -tolerance:
+                    if pricing != "mip":
+                        new_paths.append((service, pricer.makePath(links_i)))
+                    else:
+                        new_paths.append((service, makePath(topology, service, links_i)))
+            return new_paths, reduced_costs
+
+        stabiliser = makeStabiliser(stabilisation)
+        best_bound = -np.inf
+        history = []
+        status = "iteration_limit"
+        for iteration in range(max_iterations):
+            if master.solve() != OPTIMAL:
+                status = "master_not_optimal"
+                break
+            duals = master.getDuals()
+            objective = master.getObjective()
+            feasible = bool(master.getResult().values("artificial").sum() < tolerance)
+            if max_columns != None or max_age != None:
+                evictColumns(master, services, max_columns, max_age)
+
+            # Prices every service then adds the paths with negative reduced cost as columns. With stabilisation, services
+            # are priced at the stabiliser's separation point and only paths with negative reduced cost at the master's
+            # duals are kept, moving the separation point towards them until some are found or pricing is exact.
+            mispricings = 0
+            pricing_start = time.perf_counter()
+            with timer("pricing", iteration=iteration):
+                pi = master.solver.duals()
+                while True:
+                    point = stabiliser.separationPoint(pi)
+                    new_paths, reduced_costs = price(master.dualsFromVector(point))
+                    stabiliser.update(point, master.lagrangianBound(point, reduced_costs))
+                    at_duals = stabiliser.exact(pi, point)
+                    if at_duals:
+                        break
+                    new_paths = [(service, path) for service, path in new_paths if master.reducedCost(service, path.getColumns(), duals) < -tolerance]
+                    if new_paths:
+                        break
+                    stabiliser.misprice()
+                    mispricings += 1
+                stabiliser.priced()
+                bound = stabiliser.bound
+                count("mispricings", mispricings, iteration=iteration)
+            if at_duals:
+                min_reduced_cost = min([0] + [rc for rc in reduced_costs.values() if rc < np.inf])
+            else:
+                # reduced_costs are at the separation point, so the least reduced cost at the master's duals of the paths
+                # kept is recorded instead
+                min_reduced_cost = min([0] + [master.reducedCost(service, path.getColumns(), duals) for service, path in new_paths])
+            # Whether every pricer proved its path the cheapest in the last round
+            all_exact = len(reduced_costs) == len(services)
+            pricing_time = time.perf_counter() - pricing_start
+            # The bound holds for the LP relaxation over every path so the best over the iterations is kept
+            best_bound = max(best_bound, bound)
+            relative_gap = max(objective - best_bound, 0.0) / max(1.0, abs(objective))
+            # A path already in the pool is only added back to the master if it had been evicted. One already in the
+            # master is a duplicate: its reduced cost there is not negative, so pricing disagrees with the master (e.g. a
+            # tolerance mismatch).
+            added, duplicates = 0, 0
+            for service, path in new_paths:
+                graph = service.graphs[topology.name]
+                column, new = graph.addPath(path)
+                if new:
+                    master.addPath(service, path)
+                elif not graph.pool.active[column]:
+                    master.activateColumn(service, column)
+                else:
+                    duplicates += 1
+                    continue
+                added += 1
+            count("iterations", iteration=iteration)
+            count("columns_generated", added, iteration=iteration)
+
+            elapsed = time.perf_counter() - start
+            history.append({"iteration": iteration, "objective": objective, "min_reduced_cost": min_reduced_cost, "feasible": feasible,
+                            "columns_added": added, "duplicates": duplicates, "columns": sum(len(s.graphs[topology.name].getPaths()) for s in services), "time": elapsed,
+                            "pricing_time": pricing_time, "mispricings": mispricings,
+                            "lagrangian_bound": best_bound, "gap": relative_gap, "exact": all_exact})
+            if pool != None:
+                history[-1]["worker_times"] = pool.timings[-1]
+            history[-1]["pool"] = poolStats(topology, services)
+            logger.info("Iteration {}: master objective {:.6g}, bound {:.6g}, gap {:.3g}, min reduced cost {:.6g}, columns added {}, time {:.3f}s".format(
+                iteration, objective, best_bound, relative_gap, min_reduced_cost, added, elapsed))
+            if added == 0 and duplicates > 0:
+                # Paths with negative reduced cost were found but all are in the master already, so it is not proven optimal
+                logger.warning("Column generation stalled: the %d paths priced with negative reduced cost are all in the master", duplicates)
+                status = "stalled"
+                break
+            if added == 0 and not all_exact:
+                # No pricer found a path with negative reduced cost, but not every one searched all the paths
+                logger.warning("Column generation stopped inexact: %d pricers could not prove their path the cheapest", len(services) - len(reduced_costs))
+                status = "inexact"
+                break
+            if added == 0:
+                status = "optimal"
+                break
+            if gap != None and relative_gap <= gap:
+                status = "gap"
+                break
+            if time_limit != None and elapsed > time_limit:
+                status = "time_limit"
+                break
+    finally:
+        if pool != None:
+            pool.close()
+    if not history:
+        # Nothing was priced (the first master solve was not optimal or max_iterations is 0), so the only row holds
+        # the status
+        history.append({"iteration": 0, "objective": None, "min_reduced_cost": None, "feasible": False, "columns_added": 0, "duplicates": 0,
+                        "columns": sum(len(s.graphs[topology.name].getPaths()) for s in services), "time": time.perf_counter() - start,
+                        "pricing_time": 0.0, "mispricings": 0, "lagrangian_bound": -np.inf, "gap": np.inf})
+    history[-1]["status"] = status
+    logger.info("Column generation finished ({}) after {} iterations, column pool {}".format(status, len(history), poolStats(topology, services)))
+    master.setRelaxed(False)
+    if solution != None:
+        applyStart(master, solution)
+    master.solve()
+    if warm_start_dir != None:
+        saveState(master, warm_start_dir)
+    return master, history
@@ -0,0 +1,71 @@
+def signature(columns):
+    # Hashable signature of a path from its compact master problem coefficients (topology link indexes, counts,
+    # component indexes, node indexes). Two paths with the same signature give identical master problem columns.
+    return tuple(tuple(int(i) for i in part) for part in columns)
+
+class column_pool(object):
+    ## Pool of the columns (paths) of a service graph, held in its column_store. Each column is only stored once, keyed
+    ## by its signature, and the pool tracks the last reduced cost of each column and its age (master solves since it
+    ## was last basic). Columns can be evicted from the master problem when unused for long and re-added later from the
+    ## store, so the pool records which columns are active.
+        # \param store      column_store of the service graph
+    def __init__(self, store):
+        self.store = store
+        self.signatures = {}
+        self.reduced_costs = []
+        self.ages = []
+        self.active = []
+        self.hits = 0
+        self.evictions = 0
+        self.readded = 0
+
+    def __len__(self):
+        return len(self.ages)
+
+    def find(self, columns):
+        # Index of the stored column with the same coefficients (None if there is none). Counts a hit if found.
+        column = self.signatures.get(signature(columns))
+        if column != None:
+            self.hits += 1
+        return column
+
+    def add(self, columns, column):
+        # Records a new column (already appended to the store at index column)
+        self.signatures[signature(columns)] = column
+        self.reduced_costs.append(0.0)
+        self.ages.append(0)
+        self.active.append(True)
+
+    def update(self, columns, reduced_costs, basic):
+        # Records the reduced costs of the given (active) columns after a master solve and ages those that are not basic
+        for column, reduced_cost, is_basic in zip(columns, reduced_costs.tolist(), basic.tolist()):
+            self.reduced_costs[column] = reduced_cost
+            self.ages[column] = 0 if is_basic else self.ages[column] + 1
+
+    def evictionCandidates(self, columns, basic, max_active=None, max_age=None, min_age=3):
+        # Chooses which of the given active columns to evict: those not basic for more than max_age solves and then, if
+        # more than max_active columns would still be active, the oldest non basic columns (highest reduced cost first
+        # among columns of the same age). Basic columns are never evicted so the basis stays valid, and neither are
+        # columns not basic for fewer than min_age solves: on a degenerate master a new column often enters at zero
+        # and evicting it straight away makes pricing find the same columns again and again.
+        candidates = [c for c, is_basic in zip(columns, basic.tolist()) if not is_basic and self.ages[c] >= min_age]
+        candidates.sort(key=lambda c: (-self.ages[c], -self.reduced_costs[c]))
+        evict = [c for c in candidates if max_age != None and self.ages[c] > max_age]
+        if max_active != None:
+            excess = sum(self.active) - len(evict) - max_active
+            if excess > 0:
+                chosen = set(evict)
+                evict += [c for c in candidates if c not in chosen][:excess]
+        return evict
+
+    def setActive(self, column, active):
+        if self.active[column] and not active:
+            self.evictions += 1
+        elif not self.active[column] and active:
+            self.readded += 1
+            self.ages[column] = 0
+        self.active[column] = active
+
+    def stats(self):
+        # Counts of the columns held and active, duplicate paths rejected (hits), evictions and re-added columns
+        return {"columns": len(self), "active": sum(self.active), "hits": self.hits, "evictions": self.evictions, "readded": self.readded}
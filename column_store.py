@@ -0,0 +1,63 @@
+from array import array
+import numpy as np
+import scipy.sparse as sp
+
+def view(values, start, end):
+    # NumPy array of values[start:end]. The slice is a copy so the store's arrays can still grow while it is in use.
+    return np.frombuffer(values[start:end], dtype=np.int64)
+
+class column_store(object):
+    ## Compressed sparse column store of the paths in a service graph. For each path it keeps the indexes of the topology
+    ## links it traverses with the number of times each is traversed, and the (component, node) indexes of the
+    ## assignments it makes. The master problem reads its coefficient matrices straight from here.
+        # \param n_links        Number of links in the topology
+        # \param n_components   Number of components in the service
+        # \param n_nodes        Number of nodes (locations of type "node") in the topology
+    def __init__(self, n_links, n_components, n_nodes):
+        self.n_links = n_links
+        self.n_components = n_components
+        self.n_nodes = n_nodes
+        self.link_indptr = array("q", [0])
+        self.link_indices = array("q")
+        self.link_counts = array("q")
+        self.assignment_indptr = array("q", [0])
+        self.assignment_components = array("q")
+        self.assignment_nodes = array("q")
+
+    def __len__(self):
+        return len(self.link_indptr) - 1
+
+    def addColumn(self, link_indices, link_counts, components, nodes):
+        # Appends a path and returns its column index
+        self.link_indices.extend(link_indices)
+        self.link_counts.extend(link_counts)
+        self.link_indptr.append(len(self.link_indices))
+        self.assignment_components.extend(components)
+        self.assignment_nodes.extend(nodes)
+        self.assignment_indptr.append(len(self.assignment_components))
+        return len(self) - 1
+
+    def getLinks(self, column):
+        # (topology link indexes, counts) of a column
+        start, end = self.link_indptr[column], self.link_indptr[column+1]
+        return view(self.link_indices, start, end), view(self.link_counts, start, end)
+
+    def getAssignments(self, column):
+        # (component indexes, node indexes) of a column
+        start, end = self.assignment_indptr[column], self.assignment_indptr[column+1]
+        return view(self.assignment_components, start, end), view(self.assignment_nodes, start, end)
+
+    def linkMatrix(self, start=0):
+        # Link incidence matrix (topology links x columns from start onwards) with the number of traversals as entries
+        indptr = view(self.link_indptr, start, len(self.link_indptr))
+        indices = view(self.link_indices, indptr[0], indptr[-1])
+        data = view(self.link_counts, indptr[0], indptr[-1])
+        return sp.csc_matrix((data.astype(float), indices, indptr - indptr[0]), shape=(self.n_links, len(indptr) - 1))
+
+    def assignmentMatrix(self, start=0):
+        # Assignment matrix ((component, node) at row component*n_nodes + node x columns from start onwards)
+        indptr = view(self.assignment_indptr, start, len(self.assignment_indptr))
+        components = view(self.assignment_components, indptr[0], indptr[-1])
+        nodes = view(self.assignment_nodes, indptr[0], indptr[-1])
+        data = np.ones(len(components))
+        return sp.csc_matrix((data, components * self.n_nodes + nodes, indptr - indptr[0]), shape=(self.n_components * self.n_nodes, len(indptr) - 1))
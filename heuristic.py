@@ -0,0 +1,127 @@
+import numpy as np
+from pricing import makePricer
+from metrics import logger, timed
+
+# Flow or capacity below this counts as none
+epsilon = 1e-9
+
+class heuristic_solution(object):
+    ## Placement and routing found by greedyPlacement
+        # \param placement  {component description: [node descriptions]} of the replicas placed
+        # \param flows      {service description: {column in the service's column_store: flow}} of the paths routed
+        # \param unmet      {service description: throughput that could not be routed}
+        # \param cost       Rental cost of the nodes used by the placement
+    def __init__(self, placement, flows, unmet, cost):
+        self.placement = placement
+        self.flows = flows
+        self.unmet = unmet
+        self.cost = cost
+
+    @property
+    def feasible(self):
+        return all(unmet <= epsilon for unmet in self.unmet.values())
+
+def placeComponents(topology, components):
+    # Places the replicas of each component (most demanding first) on the nodes with the lowest cost per unit of capacity
+    # that still have room for it, i.e. node cost / number of copies of the component that would fit in what is left.
+    # Resources a node has no capacity for are not limited, as in the master problem.
+    # Returns {component: [node indexes]}, with fewer nodes than the replica count if not enough have room.
+    arrays = topology.getArrays()
+    remaining = np.where(arrays.has_resource, arrays.capacity, np.inf)
+    total = np.where(arrays.has_resource, arrays.capacity, 0).sum(axis=0)
+    requirements = dict((c, np.array([c.requirements.get(r, 0) for r in arrays.resources], dtype=float)) for c in components)
+    demand = lambda c: c.replica_count * (requirements[c] / np.maximum(total, epsilon)).sum()
+    placement = {}
+    for component in sorted(components, key=demand, reverse=True):
+        requirement = requirements[component]
+        fits = np.all(remaining >= requirement, axis=1)
+        needed = requirement > 0
+        units = (remaining[:, needed] / requirement[needed]).min(axis=1) if needed.any() else np.full(len(remaining), np.inf)
+        candidates = np.flatnonzero(fits)
+        order = sorted(candidates.tolist(), key=lambda n: (arrays.node_cost[n] / units[n], -units[n], n))
+        chosen = order[:component.replica_count]
+        remaining[chosen] -= requirement
+        placement[component] = chosen
+        if len(chosen) < component.replica_count:
+            logger.warning("Greedy placement: only %d of %d replicas of %s fit", len(chosen), component.replica_count, component.description)
+    return placement
+
+def routeService(topology, service, pricer, placement, residual, max_paths=100):
+    # Routes the required throughput of service along paths through nodes in placement, taking the fewest hop path over
+    # links with residual bandwidth each time and sending as much as the most loaded link of the path allows. Adds each
+    # path to the service graph and takes its flow off residual (indexed by topology link).
+    # Returns ({column: flow}, throughput not routed).
+    graph = service.graphs[topology.name]
+    nodes = topology.getNodes()
+    assignment = {}
+    for component in service.components:
+        placed = set(placement.get(component, []))
+        for n, node in enumerate(nodes):
+            assignment[(service.description, component.description, node.description)] = 0.0 if n in placed else -np.inf
+    # Paths are priced from made up duals: every link with bandwidth left costs 1 and any other link, or a node not in the
+    # placement, cannot be used
+    duals = {"assignmentflow": assignment, "throughput": {service.description: np.inf}}
+    demand = float(service.required_throughput)
+    flows = {}
+    for k in range(max_paths):
+        if demand <= epsilon:
+            break
+        duals["bandwidth"] = np.where(residual > epsilon, -1.0, -np.inf)
+        links_i, cost = pricer.shortestPath(pricer.linkCosts(duals))
+        if not links_i or cost == np.inf:
+            break
+        path = pricer.makePath(links_i)
+        link_indices, link_counts = np.asarray(path.columns[0], dtype=np.int64), np.asarray(path.columns[1], dtype=float)
+        flow = min(demand, (residual[link_indices] / link_counts).min()) if len(link_indices) else demand
+        if flow <= epsilon:
+            break
+        residual[link_indices] -= flow * link_counts
+        column, _ = graph.addPath(path)
+        flows[column] = flows.get(column, 0.0) + flow
+        demand -= flow
+    return flows, max(demand, 0.0)
+
+@timed("heuristic")
+def greedyPlacement(topology, services, pricers=None, max_paths=100):
+    # Constructive heuristic for a feasible starting point: places the component replicas greedily (placeComponents),
+    # then routes each service (largest throughput first) within the bandwidth left by those before it (routeService).
+    # The paths are added to the service graphs as columns, so a master_problem built afterwards has them.
+    # \param pricers    {service description: pricer} to route with (pricing.makePricer for each service if not given)
+    # \param max_paths  Most paths routed for each service
+    # Returns a heuristic_solution (see applyStart)
+    components = {}
+    for service in services:
+        for component in service.components:
+            components[component] = None
+    placement = placeComponents(topology, list(components))
+    residual = topology.getArrays().availableBandwidth().astype(float)
+    flows, unmet = {}, {}
+    for service in sorted(services, key=lambda s: s.required_throughput, reverse=True):
+        pricer = pricers[service.description] if pricers != None else makePricer(topology, service)
+        flows[service.description], unmet[service.description] = routeService(topology, service, pricer, placement, residual, max_paths)
+    nodes = topology.getNodes()
+    node_cost = topology.getArrays().node_cost
+    solution = heuristic_solution(dict((c.description, [nodes[n].description for n in placed]) for c, placed in placement.items()), flows, unmet,
+                                  float(sum(node_cost[placed].sum() for placed in placement.values())))
+    logger.info("Greedy placement: node cost {:.6g}, unmet throughput {:.6g}".format(solution.cost, sum(unmet.values())))
+    return solution
+
+def applyStart(master, solution):
+    # Gives the placement, path flows and artificial flows of solution as the start of the next MIP solve of master (built
+    # after greedyPlacement so that it has the heuristic's columns)
+    variables, values = [], []
+    for c, component in enumerate(master.components):
+        placed = set(solution.placement.get(component.description, []))
+        for n, node in enumerate(master.nodes):
+            variables.append(int(master.y[c * len(master.nodes) + n]))
+            values.append(1.0 if node.description in placed else 0.0)
+    for service in master.services:
+        flows = solution.flows.get(service.description, {})
+        for column, variable in enumerate(master.flows[service.description]):
+            if variable >= 0:
+                variables.append(int(variable))
+                values.append(flows.get(column, 0.0))
+        if service.description in master.artificial:
+            variables.append(int(master.artificial[service.description]))
+            values.append(solution.unmet.get(service.description, 0.0))
+    master.solver.setStart(variables, values)
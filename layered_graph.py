@@ -0,0 +1,156 @@
+import bisect
+import numpy as np
+
+# Kinds of block in a layered graph: the segment before the first component ("first"), between components ("middle"),
+# after the last component ("last") and the dummy nodes of a component ("dummy")
+FIRST, MIDDLE, LAST, DUMMY = "first", "middle", "last", "dummy"
+
+class segment_template(object):
+    ## Arrays describing one kind of segment of a service graph over local node indexes. Built once per topology and
+    ## shared by every segment of that kind in every service.
+        # \param n_local    Number of nodes in the segment
+        # \param tails      Local index of the tail of every link in the segment
+        # \param heads      Local index of the head of every link in the segment
+        # \param origins    Topology link each link is a copy of (-1 for the links joining the out and in copies of a node)
+        # \param locations  Index (in base_layer.locations) of the location each local node is a copy of
+        # \param node_of    Index in topology.getNodes() of every location in base_layer.locations (-1 if not a node)
+    def __init__(self, n_local, tails, heads, origins, locations, node_of):
+        self.n_local = n_local
+        self.tails = np.asarray(tails, dtype=np.int64)
+        self.heads = np.asarray(heads, dtype=np.int64)
+        self.origins = np.asarray(origins, dtype=np.int64)
+        self.locations = np.asarray(locations, dtype=np.int64)
+        # CSR out adjacency: the links leaving local node u are order[indptr[u]:indptr[u+1]]
+        self.order = np.argsort(self.tails, kind="stable")
+        self.indptr = np.zeros(n_local + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.tails, minlength=n_local), out=self.indptr[1:])
+        # As in make_graph, copies of topology nodes with no links out of the segment join the dummy nodes of the next
+        # component (exits[u] is the topology node index or -1) and those with no links into it are joined from the dummy
+        # nodes of the previous one (entries[n] is the local index or -1)
+        node = node_of[self.locations]
+        no_out = np.bincount(self.tails, minlength=n_local) == 0
+        no_in = np.bincount(self.heads, minlength=n_local) == 0
+        self.exits = np.where((node >= 0) & no_out, node, -1)
+        self.entries = np.full(int((node_of >= 0).sum()), -1, dtype=np.int64)
+        entering = np.flatnonzero((node >= 0) & no_in)
+        self.entries[node[entering][::-1]] = entering[::-1]
+        # The same in reverse for searches back from the end of the graph: CSR in adjacency (rorder/rindptr), the local
+        # nodes exiting to the dummy node of each topology node (exit_order[exit_indptr[n]:exit_indptr[n+1]]) and the
+        # topology node whose dummy node enters each local node (entry_of, -1 if none)
+        self.rorder = np.argsort(self.heads, kind="stable")
+        self.rindptr = np.zeros(n_local + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.heads, minlength=n_local), out=self.rindptr[1:])
+        exiting = np.flatnonzero(self.exits >= 0)
+        self.exit_order = exiting[np.argsort(self.exits[exiting], kind="stable")]
+        self.exit_indptr = np.zeros(len(self.entries) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.exits[exiting], minlength=len(self.entries)), out=self.exit_indptr[1:])
+        self.entry_of = np.full(n_local, -1, dtype=np.int64)
+        entered = np.flatnonzero(self.entries >= 0)
+        self.entry_of[self.entries[entered]] = entered
+        # Python lists are much faster than numpy arrays to index one element at a time in the search
+        self._indptr = self.indptr.tolist()
+        self._order = self.order.tolist()
+        self._heads = self.heads.tolist()
+        self._tails = self.tails.tolist()
+        self._origins = self.origins.tolist()
+        self._exits = self.exits.tolist()
+        self._entries = self.entries.tolist()
+        self._rindptr = self.rindptr.tolist()
+        self._rorder = self.rorder.tolist()
+        self._exit_indptr = self.exit_indptr.tolist()
+        self._exit_order = self.exit_order.tolist()
+        self._entry_of = self.entry_of.tolist()
+
+class base_layer(object):
+    ## Read only, array backed description of the segments of every service graph made from a topology (see
+    ## make_service_graph.make_graph). A service graph is a chain of segments joined by the dummy nodes of each component,
+    ## and each segment is a copy of one of three templates, so the templates are built once per topology (baseLayer) and
+    ## shared by all services.
+        # \param topology   Topology the service graphs are made from
+    def __init__(self, topology):
+        gateway = topology.getGateway()
+        layers = topology.getLocationsByTypes()
+        self.locations = [l for layer in layers for l in layer]
+        self.n_links = len(topology.links)
+        index = dict((l.id, i) for i, l in enumerate(self.locations))
+        nodes = topology.getNodes()
+        self.n_nodes = len(nodes)
+        node_of = np.full(len(self.locations), -1, dtype=np.int64)
+        node_of[[index[n.id] for n in nodes]] = np.arange(len(nodes))
+        self.gateway = index[gateway.id]
+
+        # Links between locations in the layers as arrays of (source, sink) indexes into self.locations
+        arrays = topology.getArrays()
+        position = np.full(len(topology.locations), -1, dtype=np.int64)
+        position[[arrays.location_index[l.id] for l in self.locations]] = np.arange(len(self.locations))
+        sources, sinks = position[arrays.link_source], position[arrays.link_sink]
+        origins = np.flatnonzero((sources >= 0) & (sinks >= 0))
+        sources, sinks, two_way = sources[origins], sinks[origins], arrays.two_way[origins]
+
+        def copies(u, v, u_local, v_local):
+            # Links of copy_edge(edge, copies of u, copies of v): u -> v for every link and v -> u for two way links,
+            # between the local copies given by the u_local/v_local maps (-1 where there is no copy)
+            a, b = u_local[u], v_local[v]
+            keep = (a >= 0) & (b >= 0)
+            back = keep & two_way
+            return (np.r_[a[keep], b[back]], np.r_[b[keep], a[back]], np.r_[origins[keep], origins[back]])
+
+        n = len(self.locations)
+        identity = np.arange(n)
+        self.templates = {}
+        tails, heads, link_origins = copies(sources, sinks, identity, identity)
+        self.templates[FIRST] = segment_template(n, tails, heads, link_origins, identity, node_of)
+        tails, heads, link_origins = copies(sinks, sources, identity, identity)
+        self.templates[LAST] = segment_template(n, tails, heads, link_origins, identity, node_of)
+
+        # A middle segment has out copies of the locations below the top layer, copies of the top layer (one below the
+        # gateway) and in copies of the locations below the top layer, in that order
+        mid = np.array([index[l.id] for l in layers[1]], dtype=np.int64) if len(layers) > 1 else np.zeros(0, dtype=np.int64)
+        below = np.array([index[l.id] for layer in layers[2:] for l in layer], dtype=np.int64)
+        out_local, mid_local, in_local = np.full(n, -1), np.full(n, -1), np.full(n, -1)
+        out_local[below] = np.arange(len(below))
+        mid_local[mid] = len(below) + np.arange(len(mid))
+        in_local[below] = len(below) + len(mid) + np.arange(len(below))
+        blocks = [copies(sinks, sources, out_local, out_local), copies(sources, sinks, in_local, in_local),
+                  copies(sinks, sources, out_local, mid_local), copies(sources, sinks, mid_local, in_local),
+                  (out_local[below], in_local[below], np.full(len(below), -1))]
+        self.templates[MIDDLE] = segment_template(2 * len(below) + len(mid), np.concatenate([b[0] for b in blocks]),
+                                                  np.concatenate([b[1] for b in blocks]), np.concatenate([b[2] for b in blocks]),
+                                                  np.r_[below, mid, below], node_of)
+
+    def size(self, kind):
+        return self.templates[kind].n_local
+
+def baseLayer(topology):
+    # The base_layer of topology, built when first needed and kept until links are added to the topology
+    if topology.base_layer == None:
+        topology.base_layer = base_layer(topology)
+    return topology.base_layer
+
+class layered_graph(object):
+    ## Service graph held as a chain of blocks over a shared base_layer: the segment before the first component, then for
+    ## every component a block of dummy nodes (one per topology node) followed by the next segment. Nodes are numbered
+    ## globally by block offset plus local index, so a service only stores the offsets of its blocks and links are never
+    ## copied.
+        # \param base           base_layer of the topology
+        # \param n_components   Number of components in the service
+    def __init__(self, base, n_components):
+        self.base = base
+        self.n_components = n_components
+        self.kinds = []
+        self.components = []
+        for k in range(n_components + 1):
+            self.kinds.append(FIRST if k == 0 else LAST if k == n_components else MIDDLE)
+            self.components.append(-1)
+            if k < n_components:
+                self.kinds.append(DUMMY)
+                self.components.append(k)
+        sizes = [base.n_nodes if kind == DUMMY else base.size(kind) for kind in self.kinds]
+        self.offsets = np.r_[0, np.cumsum(sizes)].astype(np.int64).tolist()
+        self.n_nodes = self.offsets[-1]
+        self.start = base.gateway
+        self.end = self.offsets[-2] + base.gateway
+
+    def block(self, u):
+        # Index of the block holding global node u
+        return bisect.bisect_right(self.offsets, u) - 1
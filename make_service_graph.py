@@ -1,7 +1,29 @@
 from topology_class import *
 
+def index_by_description(nodes):
+    # Makes a hash of description -> list of nodes (in order) so that each topology edge maps straight to its copies
+    index = {}
+    for node in nodes:
+        index.setdefault(node.description, []).append(node)
+    return index
+
+def copy_edge(edge, origin, sources, sinks, new_edges):
+    # Adds a copy of edge between every source and sink (and the reverse if the edge is two way). origin is the index
+    # of edge in the topology links, which the copies carry so paths can be mapped straight back to topology links.
+    for source in sources:
+        for sink in sinks:
+            new_edge = edge.copy_with_new_nodes(source, sink, origin)
+            new_edge.setLinkCost(1)
+            new_edges.append(new_edge)
+            if edge.two_way == True:
+                new_edge = edge.copy_with_new_nodes(sink, source, origin)
+                new_edge.setLinkCost(1)
+                new_edges.append(new_edge)
+
 def make_graph(_service, _topology):
     # Makes a graph (instance of topology) representing the service
+    # Paths start and end at the gateway (raises ValueError if the topology does not have exactly one)
+    _topology.getGateway()
     layers = _topology.getLocationsByTypes()
     no_components = len(_service.components)
     graph_segments = {}
@@ -15,18 +37,10 @@ def make_graph(_service, _topology):
             for layer in layers:
                 for node in layer:
                     new_nodes.append(node.copy())
+            copies = index_by_description(new_nodes)
             # Makes a copy of all links in the topology
-            for edge in _topology.links:    
-                for source in new_nodes:
-                    for sink in new_nodes:
-                        if edge.source.description == source.description and edge.sink.description == sink.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
+            for origin, edge in enumerate(_topology.links):
+                copy_edge(edge, origin, copies.get(edge.source.description, []), copies.get(edge.sink.description, []), new_edges)
             graph_segments[str(k)] = (new_nodes, new_edges)
 
         elif k == no_components:
@@ -36,17 +50,10 @@ def make_graph(_service, _topology):
             for layer in layers:
                 for node in layer:
                     new_nodes.append(node.copy())
-            for edge in _topology.links:
-                for source in new_nodes:
-                    for sink in new_nodes:
-                        if edge.source.description == sink.description and edge.sink.description == source.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
+            copies = index_by_description(new_nodes)
+            # Links are reversed since flow goes back up to the gateway
+            for origin, edge in enumerate(_topology.links):
+                copy_edge(edge, origin, copies.get(edge.sink.description, []), copies.get(edge.source.description, []), new_edges)
             graph_segments[str(k)] = (new_nodes, new_edges)
 
         else:
@@ -68,57 +75,24 @@ def make_graph(_service, _topology):
 
             for node in layers[1]:
                 # mid nodes are nodes in top layer (one down from gateway)
-                mid_nodes.append(node)
+                mid_nodes.append(node.copy())
+
+            out_copies = index_by_description(out_nodes)
+            in_copies = index_by_description(in_nodes)
+            mid_copies = index_by_description(mid_nodes)
 
-            for edge in _topology.links:
+            for origin, edge in enumerate(_topology.links):
                 # Adds links between mid layers
-                for source in out_nodes:
-                    for sink in out_nodes:
-                        if edge.source.description == sink.description and edge.sink.description == source.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
-                for source in in_nodes:
-                    for sink in in_nodes:
-                        if edge.source.description == source.description and edge.sink.description == sink.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
+                copy_edge(edge, origin, out_copies.get(edge.sink.description, []), out_copies.get(edge.source.description, []), new_edges)
+                copy_edge(edge, origin, in_copies.get(edge.source.description, []), in_copies.get(edge.sink.description, []), new_edges)
                 # Adds links between out layer and mid
-                for source in out_nodes:
-                    for sink in mid_nodes:
-                        if edge.source.description == sink.description and edge.sink.description == source.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
+                copy_edge(edge, origin, out_copies.get(edge.sink.description, []), mid_copies.get(edge.source.description, []), new_edges)
                 # # Adds links between mid layer and in
-                for source in mid_nodes:
-                    for sink in in_nodes:
-                        if edge.source.description == source.description and edge.sink.description == sink.description:
-                            new_edge = edge.copy_with_new_nodes(source, sink)
-                            new_edge.setLinkCost(1)
-                            new_edges.append(new_edge)
-                            if edge.two_way == True:
-                                new_edge = edge.copy_with_new_nodes(sink, source)
-                                new_edge.setLinkCost(1)
-                                new_edges.append(new_edge)
+                copy_edge(edge, origin, mid_copies.get(edge.source.description, []), in_copies.get(edge.sink.description, []), new_edges)
             # Adds links between out version of node and in version of same node to prevent having to go up a layer
             for source in out_nodes:
-                for sink in in_nodes:
-                    if source.description == sink.description:
-                        new_edges.append(link(source, sink, {"bandwidth": inf, "latency": 0, "cost": 0}, two_way=False))
+                for sink in in_copies.get(source.description, []):
+                    new_edges.append(link(source, sink, {"bandwidth": inf, "latency": 0, "cost": 0}, two_way=False))
             new_nodes = out_nodes + mid_nodes + in_nodes
 
             graph_segments[str(k)] = (new_nodes, new_edges)
@@ -127,34 +101,37 @@ def make_graph(_service, _topology):
     for i in range(no_components):
         new_nodes = []
         new_edges = []
-        for l in _topology.locations:
+        suffix = "_" + _service.components[i].description
+        for n, l in enumerate(_topology.getNodes()):
             # Adds dummy nodes representing node_component[i]
-            if l.type == "node":
-                new_nodes.append(location(l.description + "_" + _service.components[i].description, "dummy"))
-     
+            dummy = location(l.description + suffix, "dummy")
+            dummy.assignment = (i, n)
+            new_nodes.append(dummy)
+        dummies = index_by_description(new_nodes)
+
         # Joins pre layer to nodes
         pre_layer = graph_segments[str(i)]
+        # Only nodes with no outgoing edges in the pre layer are joined
+        has_outgoing = set(l.source.id for l in pre_layer[1])
         for source in pre_layer[0]:
-            for sink in new_nodes:
-                # Last part checks that there is no incoming edges to the source node
-                #if sink.description == source.description + "_" + _service.components[i].description:
-                if sink.description == source.description + "_" + _service.components[i].description and not [l for l in pre_layer[1] if l.source == source]:
+            if source.id not in has_outgoing:
+                for sink in dummies.get(source.description + suffix, []):
                     new_edges.append(link(source, sink, {"bandwidth": inf, "latency": 0, "cost": 0}, two_way=False))
-            
+
         # # Joins post layer to nodes
         post_layer = graph_segments[str(i+1)]
+        # Only nodes with no incoming edges in the post layer are joined
+        has_incoming = set(l.sink.id for l in post_layer[1])
+        post_copies = index_by_description([sink for sink in post_layer[0] if sink.id not in has_incoming])
         for source in new_nodes:
-            for sink in post_layer[0]:
-                # Last part checks that there is no outgoing edges to the sink node
-                if source.description == sink.description + "_" + _service.components[i].description and not [l for l in post_layer[1] if l.sink == sink]:
-                #if sink.description == source.description + "_" + _service.components[i].description and not [l for l in post_layer[1] if l.sink == sink]:
-                    new_edges.append(link(source, sink, {"bandwidth": inf, "latency": 0, "cost": 0}, two_way=False))
-            
+            for sink in post_copies.get(source.description[:-len(suffix)], []):
+                new_edges.append(link(source, sink, {"bandwidth": inf, "latency": 0, "cost": 0}, two_way=False))
+
         graph_segments["Component {}".format(i)] = (new_nodes, new_edges)
-        
+
     nodes = []
     edges = []
     for key in graph_segments:
         nodes += graph_segments[key][0]
-        edges += graph_segments[key][1]     
-    return (nodes, edges)
\ No newline at end of file
+        edges += graph_segments[key][1]
+    return (nodes, edges)
@@ -0,0 +1,344 @@
+import numpy as np
+import scipy.sparse as sp
+from solver_backend import makeBackend, LESS_EQUAL, GREATER_EQUAL, EQUAL, OPTIMAL
+from topology_class import LINK_REMOVED, LINK_ADDED, BANDWIDTH, RESOURCES
+from metrics import logger, timed, timer, count, gauge
+from results import master_result
+
+class master_problem(object):
+    ## Master problem over the paths in each service graph. The solver model is kept alive so that during column generation
+    ## new paths are added as columns to the existing rows and re-solves warm start from the previous basis.
+        # \param topology          Topology the service graphs were made from
+        # \param services          List of services, each with a graph for topology
+        # \param relax             If True the assignment variables are continuous in [0, 1] (LP relaxation) so that duals are available
+        # \param artificial_cost   If given, adds an artificial flow variable per service with this cost so that the throughput
+        #                          constraints can always be satisfied (used whilst there are too few paths to be feasible)
+        # \param verbose           If False the solver log is not printed
+        # \param backend           "gurobi", "highs" or a solver_backend.solver_backend to build the model with
+        # \param shared_pool       If True, other master problems are built over the same service graphs at the same time
+        #                          (e.g. by branch_and_price workers), so the active flags of the column pools are left
+        #                          alone. The model's own active columns are those with a flow variable in flows.
+    @timed("model_build")
+    def __init__(self, topology, services, relax=False, artificial_cost=None, verbose=True, backend="gurobi", shared_pool=False):
+        self.topology = topology
+        self.services = services
+        self.nodes = topology.getLocationsByType("node")
+        self.artificial_cost = artificial_cost
+        self.solver = makeBackend(backend, topology.name, verbose)
+        arrays = topology.getArrays()
+
+        # Makes list of components for all service so that no duplicate components are considered (kept in order so that
+        # constraints are always added in the same order)
+        components = {}
+        for service in services:
+            for component in service.components:
+                components[component] = None
+        self.components = list(components)
+        self.component_index = dict((self.components[c].description, c) for c in range(len(self.components)))
+        self.node_index = dict((self.nodes[n].description, n) for n in range(len(self.nodes)))
+        n_nodes, n_components, n_services = len(self.nodes), len(self.components), len(services)
+
+        # Variables are x (a flow for every path already in the service graphs, grouped by service), y (assignment of
+        # component c to node n at index c*n_nodes + n) and a (artificial flow for each service). Every block of rows is
+        # built as a scipy.sparse matrix over the stacked vector [x, y, a], with the path coefficients read straight from
+        # the column_store of each service graph.
+        stores = [service.graphs[topology.name].store for service in services]
+        n_paths = [len(store) for store in stores]
+        names = ["{}_flows[{}]".format(services[s].description, k) for s in range(n_services) for k in range(n_paths[s])]
+        x = self.solver.addVariables(0, 0, np.inf, False, names)
+        # Objective coefficients of the assignment variables are the node rental costs
+        costs = arrays.node_cost
+        names = ["{}_assignment[{}]".format(c.description, n) for c in self.components for n in range(n_nodes)]
+        self.y = self.solver.addVariables(np.tile(costs, n_components), 0, 1, True, names)
+        # Artificial flow variables can make up any shortfall in throughput at a high cost
+        n_artificial = n_services if artificial_cost != None else 0
+        names = [service.description + "_artificial" for service in services[:n_artificial]]
+        a = self.solver.addVariables(artificial_cost if artificial_cost != None else 0, 0, np.inf, False, names)
+        n_x, n_y = sum(n_paths), n_components * n_nodes
+        path_service = np.repeat(np.arange(n_services), n_paths)
+
+        self.rows = {}
+        # The right hand sides of every row and the coefficients of y and a in them are kept for lagrangianBound
+        rhs_blocks, ya_blocks = [], []
+        def addRows(block, x_block, y_block, a_block, rhs, sense, names):
+            # Adds the rows [x_block, y_block, a_block] @ [x, y, a] (sense) rhs
+            blocks = [(x_block, n_x), (y_block, n_y), (a_block, n_artificial)]
+            matrix = sp.hstack([sp.csr_matrix(block if block is not None else (len(rhs), n), shape=(len(rhs), n)) for block, n in blocks], format="csr")
+            self.rows[block] = self.solver.addRows(matrix, sense, rhs, names)
+            rhs_blocks.append(np.asarray(rhs, dtype=float))
+            ya_blocks.append(matrix[:, n_x:])
+
+        # throughput: the sum of flows for each service must be greater than the required throughput for the service
+        x_block = sp.csr_matrix((np.ones(n_x), (path_service, np.arange(n_x))), shape=(n_services, n_x))
+        addRows("throughput", x_block, None, sp.eye(n_services, n_artificial), [s.required_throughput for s in services], GREATER_EQUAL,
+                ["throughput_{}".format(s.description) for s in services])
+
+        # bandwidth: the sum of all flows through the edge must be less than the bandwidth (0 if the link has failed)
+        x_block = sp.hstack([store.linkMatrix() for store in stores]) if n_services else None
+        addRows("bandwidth", x_block, None, None, arrays.availableBandwidth(), LESS_EQUAL,
+                ["bandwidth_{}".format(l.description) for l in topology.links])
+
+        # assignmentflow: flows must be zero for any path containing a node that a required component is not assigned to,
+        # i.e. the sum of flows of service s through node n with component c <= required throughput of s * y[c, n]
+        keys = [(s, self.component_index[c.description], n) for n in range(n_nodes) for c in self.components for s in range(n_services) if c in services[s].components]
+        key_index = dict((keys[k], k) for k in range(len(keys)))
+        self.assignmentflow_rows = []
+        blocks = []
+        for s in range(n_services):
+            # Row of the assignmentflow constraint for each (component of the service, node)
+            rows = np.array([key_index[(s, self.component_index[c.description], n)] for c in services[s].components for n in range(n_nodes)], dtype=np.int64)
+            self.assignmentflow_rows.append(rows)
+            matrix = stores[s].assignmentMatrix().tocoo()
+            blocks.append(sp.csr_matrix((matrix.data, (rows[matrix.row], matrix.col)), shape=(len(keys), n_paths[s])))
+        x_block = sp.hstack(blocks) if n_services else None
+        y_block = sp.csr_matrix(([-services[s].required_throughput for s, c, n in keys], (np.arange(len(keys)), [c * n_nodes + n for s, c, n in keys])), shape=(len(keys), n_y))
+        self.assignmentflow_keys = [(services[s].description, self.components[c].description, self.nodes[n].description) for s, c, n in keys]
+        addRows("assignmentflow", x_block, y_block, None, np.zeros(len(keys)), LESS_EQUAL,
+                ["assignmentflow_{}_{}_{}".format(*key) for key in self.assignmentflow_keys])
+
+        # replicas: a component must be assigned to x different nodes where x is the replica count
+        y_block = sp.csr_matrix((np.ones(n_y), (np.repeat(np.arange(n_components), n_nodes), np.arange(n_y))), shape=(n_components, n_y))
+        addRows("replicas", None, y_block, None, [c.replica_count for c in self.components],
+                EQUAL, ["replicas_{}".format(c.description) for c in self.components])
+
+        # capacity: the sum of component requirements running on a node must not exceed the capacity. Every resource
+        # type in location.resources gives a row for each node that has it.
+        capacity_nodes, capacity_resources = np.nonzero(arrays.has_resource)
+        capacity_keys = [(arrays.resources[r], n) for n, r in zip(capacity_nodes.tolist(), capacity_resources.tolist())]
+        requirements = np.array([[c.requirements.get(resource, 0) for resource in arrays.resources] for c in self.components], dtype=float).reshape(n_components, len(arrays.resources))
+        # Row k has the requirement of every component c for its resource in the column of y[c, n]
+        rows = np.repeat(np.arange(len(capacity_keys)), n_components)
+        columns = (np.arange(n_components)[None, :] * n_nodes + capacity_nodes[:, None]).ravel()
+        values = requirements[:, capacity_resources].T.ravel()
+        addRows("capacity", None, (values, (rows, columns)), None, arrays.capacity[capacity_nodes, capacity_resources], LESS_EQUAL,
+                ["capacity_{}_{}".format(resource, self.nodes[n].description) for resource, n in capacity_keys])
+
+        self.rhs = np.concatenate(rhs_blocks)
+        self.ya_matrix = sp.vstack(ya_blocks, format="csr")
+        self.ya_cost = np.r_[np.tile(costs, n_components), np.full(n_artificial, artificial_cost if artificial_cost != None else 0, dtype=float)]
+        self.y_lb, self.y_ub = np.zeros(n_y), np.ones(n_y)
+
+        # Indexes of the rows and variables are kept so that new paths can be added as columns
+        self.throughput = dict(zip([s.description for s in services], self.rows["throughput"].tolist()))
+        self.bandwidth = self.rows["bandwidth"]
+        self.assignmentflow = self.rows["assignmentflow"]
+        self.capacity = dict(zip(capacity_keys, self.rows["capacity"].tolist()))
+        y = self.y.tolist()
+        self.assignment = dict((self.components[c].description, y[c*n_nodes:(c+1)*n_nodes]) for c in range(n_components))
+        self.artificial = dict(zip([s.description for s in services[:n_artificial]], a.tolist()))
+        # Flow variable of each column in the column_store of each service (-1 if the column has been evicted). Every
+        # column starts active.
+        x = x.tolist()
+        self.flows = dict((services[s].description, x[sum(n_paths[:s]):sum(n_paths[:s+1])]) for s in range(n_services))
+        if shared_pool == False:
+            for store, service in zip(stores, services):
+                pool = service.graphs[topology.name].pool
+                if pool != None:
+                    pool.active = [True] * len(store)
+        self.service_index = dict((services[s].description, s) for s in range(n_services))
+        self.status = None
+        self.lp_basis = None
+        # Number of topology.deltas applied to the model (see applyDeltas)
+        self.delta = len(topology.deltas)
+        self.setRelaxed(relax)
+        self.recordSize()
+
+    def recordSize(self):
+        gauge("model_rows", self.solver.numRows())
+        gauge("model_columns", self.solver.numVariables())
+
+    def addFlow(self, service, column, link_indices, link_counts, components, nodes):
+        # Adds a flow variable for column k of the service's column_store with its coefficients in the throughput,
+        # bandwidth and assignmentflow rows. Returns the index of the variable.
+        rows = self.assignmentflow_rows[self.service_index[service.description]]
+        coefficients = [1.0] + [float(count) for count in link_counts] + [1.0] * len(components)
+        constraints = [self.throughput[service.description]] + [int(self.bandwidth[i]) for i in link_indices]
+        constraints += [int(self.assignmentflow[rows[c * len(self.nodes) + n]]) for c, n in zip(components, nodes)]
+        return self.solver.addColumn(0, 0, np.inf, constraints, coefficients, "{}_flows[{}]".format(service.description, column))
+
+    @timed("column_insertion")
+    def addPath(self, service, path):
+        # Adds a flow variable for a path just added to the service graph. Returns the index of the variable.
+        flows = self.flows[service.description]
+        x = self.addFlow(service, len(flows), *path.getColumns())
+        flows.append(x)
+        return x
+
+    @timed("column_insertion")
+    def activateColumn(self, service, column):
+        # Adds back a column of the service's column_store that was evicted. Returns the index of the variable.
+        store = service.graphs[self.topology.name].store
+        x = self.addFlow(service, column, *(store.getLinks(column) + store.getAssignments(column)))
+        self.flows[service.description][column] = x
+        service.graphs[self.topology.name].pool.setActive(column, True)
+        return x
+
+    def addNewColumns(self):
+        # Adds a flow variable for every column added to the column_store of a service since this model was built or last
+        # updated (e.g. by another master problem sharing the service graphs). Returns the number added.
+        added = 0
+        for service in self.services:
+            store = service.graphs[self.topology.name].store
+            flows = self.flows[service.description]
+            for column in range(len(flows), len(store)):
+                flows.append(self.addFlow(service, column, *(store.getLinks(column) + store.getAssignments(column))))
+                added += 1
+        return added
+
+    def fixAssignments(self, fixed):
+        # Fixes the assignment variables in fixed, {(component index, node index): 0 or 1}, and frees every other one
+        # (to [0, 1])
+        lb, ub = np.zeros(len(self.y)), np.ones(len(self.y))
+        for (c, n), value in fixed.items():
+            lb[c * len(self.nodes) + n] = ub[c * len(self.nodes) + n] = value
+        self.solver.setBounds(self.y, lb, ub)
+        self.y_lb, self.y_ub = lb, ub
+
+    def activeColumns(self, service):
+        # (column indexes in the service's column_store, indexes of their flow variables) of the active columns
+        flows = np.asarray(self.flows[service.description], dtype=np.int64)
+        columns = np.flatnonzero(flows >= 0)
+        return columns, flows[columns]
+
+    def evictColumns(self, service, columns):
+        # Removes the flow variables of the given columns of the service's column_store from the model. They stay in
+        # the store and pool so can be added back with activateColumn. Only non basic columns should be evicted.
+        if len(columns) == 0:
+            return
+        flows = self.flows[service.description]
+        mapping = self.solver.removeVariables([flows[c] for c in columns])
+        pool = service.graphs[self.topology.name].pool
+        for c in columns:
+            flows[c] = -1
+            pool.setActive(c, False)
+        # Every other variable index shifts down past the removed ones
+        remap = lambda indexes: [int(mapping[i]) if i >= 0 else -1 for i in indexes]
+        self.y = mapping[self.y]
+        self.assignment = dict((c, remap(y)) for c, y in self.assignment.items())
+        self.artificial = dict(zip(self.artificial.keys(), remap(self.artificial.values())))
+        for s in self.flows:
+            self.flows[s] = remap(self.flows[s])
+        count("columns_evicted", len(columns))
+
+    def setRelaxed(self, relax):
+        # Switches the assignment variables between continuous (LP relaxation) and binary. The LP is re-solved with primal
+        # simplex since adding columns keeps the previous basis primal feasible. The basis of the last LP solved is kept
+        # in self.lp_basis (e.g. to save for a later run) when switching to binary and restored when switching back.
+        if not relax and getattr(self, "relax", False) and self.status == OPTIMAL:
+            self.lp_basis = self.solver.getBasis()
+        elif relax and not getattr(self, "relax", True) and self.lp_basis != None:
+            self.solver.setBasis(*self.lp_basis)
+        self.relax = relax
+        self.solver.setIntegrality(self.y, not relax)
+        self.solver.setPrimalSimplex(relax)
+
+    @timed("apply_deltas")
+    def applyDeltas(self):
+        # Applies the changes recorded in topology.deltas since the model was built (or last updated) in place so that
+        # the next solve starts from the current basis. Each service graph is updated (service.updateGraph), the right
+        # hand sides of the bandwidth rows of changed, removed or restored links and of the capacity rows of changed
+        # nodes are set, a bandwidth row is added for every new link and the columns using removed links are evicted
+        # (they may be basic, in which case the solver repairs the basis). Returns the number of columns evicted.
+        topology = self.topology
+        deltas = topology.deltas[self.delta:]
+        self.delta = len(topology.deltas)
+        for service in self.services:
+            service.updateGraph(topology)
+
+        # New links are appended to topology.links so their rows go at the end of the bandwidth block
+        n_links = len(self.bandwidth)
+        if len(topology.links) > n_links:
+            new = topology.links[n_links:]
+            rows = self.solver.addRows(None, LESS_EQUAL, topology.getArrays().availableBandwidth()[n_links:], ["bandwidth_{}".format(l.description) for l in new])
+            self.bandwidth = self.rows["bandwidth"] = np.concatenate([self.bandwidth, rows])
+            self.rhs = np.r_[self.rhs, topology.getArrays().availableBandwidth()[n_links:]]
+            self.ya_matrix = sp.vstack([self.ya_matrix, sp.csr_matrix((len(new), self.ya_matrix.shape[1]))], format="csr")
+        links = sorted(set(i for kind, i in deltas if kind in (LINK_REMOVED, LINK_ADDED, BANDWIDTH) and i < n_links))
+        arrays = topology.getArrays()
+        if links:
+            self.solver.setRHS(self.bandwidth[links], arrays.availableBandwidth()[links])
+            self.rhs[self.bandwidth[links]] = arrays.availableBandwidth()[links]
+
+        capacity = {}
+        for kind, i in deltas:
+            if kind == RESOURCES:
+                n = arrays.node_index[i]
+                for r in np.flatnonzero(arrays.has_resource[n]).tolist():
+                    key = (arrays.resources[r], n)
+                    if key in self.capacity:
+                        capacity[self.capacity[key]] = arrays.capacity[n, r]
+                    else:
+                        logger.warning("No capacity row for %s of %s, rebuild the master problem to add it", key[0], self.nodes[n].description)
+        if capacity:
+            self.solver.setRHS(list(capacity.keys()), list(capacity.values()))
+            self.rhs[list(capacity.keys())] = list(capacity.values())
+
+        removed = [i for i in links if arrays.failed[i]]
+        evicted = 0
+        if removed:
+            for service in self.services:
+                store = service.graphs[topology.name].store
+                columns, variables = self.activeColumns(service)
+                if len(columns) == 0:
+                    continue
+                uses = store.linkMatrix().tocsr()[removed][:, columns].getnnz(axis=0) > 0
+                self.evictColumns(service, columns[uses].tolist())
+                evicted += int(uses.sum())
+        self.recordSize()
+        return evicted
+
+    def solve(self):
+        # Re-solves the model, warm started from the previous basis as rows and variables are only ever added.
+        # Returns the status (solver_backend.OPTIMAL etc.)
+        with timer("optimise"):
+            self.status = self.solver.solve()
+        count("solver_work", self.solver.work())
+        self.recordSize()
+        return self.status
+
+    def getObjective(self):
+        return self.solver.objective()
+
+    def getResult(self):
+        # Solution of the last solve as a results.master_result
+        return master_result(self)
+
+    @timed("dual_extraction")
+    def getDuals(self):
+        # Reads the duals of the throughput, bandwidth and assignmentflow rows of the solved relaxation in bulk.
+        # Returns {"throughput": {service: pi}, "bandwidth": array over topology.links, "assignmentflow": {(service, component, node): pi}}
+        return self.dualsFromVector(self.solver.duals())
+
+    def dualsFromVector(self, pi):
+        # Duals in the form of getDuals from an array over all rows (e.g. stabilised duals, see stabilisation)
+        return {"throughput": dict(zip(self.throughput.keys(), pi[self.rows["throughput"]].tolist())),
+                "bandwidth": pi[self.rows["bandwidth"]],
+                "assignmentflow": dict(zip(self.assignmentflow_keys, pi[self.rows["assignmentflow"]].tolist()))}
+
+    def reducedCost(self, service, columns, duals):
+        # Reduced cost of a column of service, (link indexes, link counts, components, nodes) as in column_store, for the
+        # duals (in the form of getDuals)
+        link_indices, link_counts, components, nodes = columns
+        cost = -float(np.dot(np.asarray(duals["bandwidth"])[list(link_indices)], link_counts)) if len(link_indices) else 0.0
+        for c, n in zip(components, nodes):
+            cost -= duals["assignmentflow"][(service.description, service.components[c].description, self.nodes[n].description)]
+        return cost - duals["throughput"][service.description]
+
+    def lagrangianBound(self, pi, min_reduced_costs):
+        # Lower bound on the LP relaxation over every path (not only those in the model) from row duals pi (an array over
+        # all rows with the signs of an optimal dual: >= 0 for >= rows and <= 0 for <= rows) and the least reduced cost
+        # of a path of each service at pi, {service: reduced cost}. The rows are relaxed with pi, the assignments and
+        # artificial flows kept within their bounds and the flows of each service kept to at most its throughput (some
+        # optimal solution never sends more). Returns -inf if a service was not priced or an artificial flow has
+        # negative reduced cost.
+        reduced = self.ya_cost - self.ya_matrix.T @ pi
+        n_y = len(self.y_lb)
+        bound = float(self.rhs @ pi)
+        bound += float(np.where(reduced[:n_y] < 0, reduced[:n_y] * self.y_ub, reduced[:n_y] * self.y_lb).sum())
+        if (reduced[n_y:] < -1e-9).any():
+            return -np.inf
+        for service in self.services:
+            if service.description not in min_reduced_costs:
+                return -np.inf
+            bound += service.required_throughput * min(0.0, min_reduced_costs[service.description])
+        return bound
@@ -0,0 +1,114 @@
+import json
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+# Logger used by every module in the package. Only warnings are shown (on stderr) unless setLogLevel is called, so the
+# variable/dual dumps (DEBUG) and progress messages (INFO) are opt-in.
+logger = logging.getLogger("5g_optimisation")
+
+def setLogLevel(level):
+    # Shows messages at level (a logging level or its name, e.g. "info" or "debug") and above on stderr
+    if isinstance(level, str):
+        level = getattr(logging, level.upper())
+    logger.setLevel(level)
+    if not any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        logger.addHandler(handler)
+
+class metrics_recorder(object):
+    ## Collects timers, counters and gauges from the phases of a run. Totals are always kept (cheaply, in dictionaries)
+    ## and each measurement is also passed as an event to every hook, e.g. a jsonl_writer for monitoring.
+    ## An event is a dictionary {"event": "timer" | "counter" | "gauge", "name": str, "value": float, "time": unix time}
+    ## plus any fields given with the measurement (e.g. service or iteration).
+    def __init__(self):
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        # Clears the totals (hooks are kept)
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def addHook(self, hook):
+        # hook is called with every event
+        self.hooks.append(hook)
+        return hook
+
+    def removeHook(self, hook):
+        self.hooks.remove(hook)
+
+    def emit(self, event, name, value, fields):
+        if self.hooks:
+            record = {"event": event, "name": name, "value": value, "time": time.time()}
+            record.update(fields)
+            for hook in self.hooks:
+                hook(record)
+
+    @contextmanager
+    def timer(self, name, **fields):
+        # Times the enclosed block. Totals are kept as {name: [seconds, calls]}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            total = self.timers.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            self.emit("timer", name, seconds, fields)
+
+    def count(self, name, value=1, **fields):
+        # Adds value to counter name
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.emit("counter", name, value, fields)
+
+    def gauge(self, name, value, **fields):
+        # Records the current value of name (e.g. the number of rows in the model)
+        self.gauges[name] = value
+        self.emit("gauge", name, value, fields)
+
+    def summary(self):
+        # Totals so far as {"timers": {name: {"seconds": s, "calls": n}}, "counters": {...}, "gauges": {...}}
+        return {"timers": dict((name, {"seconds": s, "calls": n}) for name, (s, n) in self.timers.items()),
+                "counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+class jsonl_writer(object):
+    ## Hook writing every event as a line of JSON to filename
+        # \param filename   File to write to
+        # \param append     If False the file is overwritten
+    def __init__(self, filename, append=True):
+        self.file = open(filename, "a" if append else "w")
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event, default=float) + "\n")
+
+    def write(self, record):
+        # Writes any other record (e.g. recorder.summary()) as a line
+        self.__call__(record)
+
+    def close(self):
+        self.file.close()
+
+# Recorder used by the package
+recorder = metrics_recorder()
+timer = recorder.timer
+count = recorder.count
+gauge = recorder.gauge
+
+def timed(name):
+    # Decorator timing every call of a function with recorder.timer(name)
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with recorder.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def writeMetrics(filename, append=True):
+    # Starts writing every event to the JSON-lines file filename. Returns the writer (close it with removeHook then close).
+    return recorder.addHook(jsonl_writer(filename, append))
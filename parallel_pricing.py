@@ -0,0 +1,63 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Pricers held by each worker process (set once by the pool initializer so that the service graphs are only sent once)
+_pricers = None
+
+def _initialise(pricers):
+    global _pricers
+    _pricers = pricers
+
+def _price(indexes, duals):
+    # Prices the services at indexes with the pricers held by this worker.
+    # Returns (pid, seconds, [(service index, links_i, cost, exact)]), where exact is False if the pricer could not prove
+    # its path the cheapest (see pricing.latency_pricer)
+    start = time.perf_counter()
+    results = []
+    for i in indexes:
+        pricer = _pricers[i]
+        links_i, cost = pricer.shortestPath(pricer.linkCosts(duals))
+        results.append((i, links_i, cost, getattr(pricer, "exact", True)))
+    return os.getpid(), time.perf_counter() - start, results
+
+class pricing_pool(object):
+    ## Prices every service graph in parallel with a process pool. Each worker gets a pickled copy of the array form of
+    ## every pricer (pricing.shortest_path_pricer) when it starts, so each round only the duals are sent to the workers
+    ## and only the link indexes of the cheapest paths are sent back.
+        # \param pricers    List of shortest_path_pricer, one per service (results are returned in this order)
+        # \param workers    Number of worker processes (defaults to the number of CPUs, capped at the number of services)
+    def __init__(self, pricers, workers=None):
+        self.pricers = pricers
+        if workers == None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, min(workers, len(pricers)))
+        # Services are dealt round robin so every worker gets one batch per round
+        self.batches = [list(range(w, len(pricers), self.workers)) for w in range(self.workers)]
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_initialise, initargs=(pricers,))
+        # Seconds spent pricing by each worker (keyed by pid) in each round
+        self.timings = []
+
+    def price(self, duals):
+        # Prices all services with the duals from master_problem.getDuals.
+        # Returns a list of (links_i, cost, exact) in the same order as the pricers, whichever worker finishes first. The
+        # pricers of this process are not used, so exact comes from the worker's copy.
+        futures = [self.executor.submit(_price, batch, duals) for batch in self.batches if batch]
+        results = [None] * len(self.pricers)
+        timing = {}
+        for future in futures:
+            pid, seconds, batch = future.result()
+            timing[pid] = timing.get(pid, 0) + seconds
+            for i, links_i, cost, exact in batch:
+                results[i] = (links_i, cost, exact)
+        self.timings.append(timing)
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
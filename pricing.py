@@ -0,0 +1,480 @@
+import heapq
+import numpy as np
+from service_class import service_path, pathColumns
+from layered_graph import DUMMY
+
+class shortest_path_pricer(object):
+    ## Prices paths through a service graph with Dijkstra's algorithm instead of solving a MIP. The service graph is
+    ## converted once into arrays so that each pricing call only needs the new link costs.
+        # \param topology       Topology the service graph was made from
+        # \param service        Service whose graph is priced (service.addGraph(topology) must have been called)
+    def __init__(self, topology, service):
+        self.topology = topology
+        self.service = service
+        self.description = service.description
+        self.graph = service.graphs[topology.name]
+        links = self.graph.links
+        self.n_links = len(links)
+        self.n_topology_links = len(topology.links)
+
+        # Dense index for every location in the service graph (a location can appear in more than one segment)
+        self.index = {}
+        self.nodes = []
+        for location in self.graph.locations:
+            if location.id not in self.index:
+                self.index[location.id] = len(self.nodes)
+                self.nodes.append(location)
+        self.tails = np.array([self.index[l.source.id] for l in links], dtype=np.int64)
+        self.heads = np.array([self.index[l.sink.id] for l in links], dtype=np.int64)
+        self.n_nodes = len(self.nodes)
+        self.start = self.index[self.graph.getStartNode().id]
+        self.end = self.index[self.graph.getEndNode().id]
+
+        # CSR out adjacency: the links leaving node i are self.order[indptr[i]:indptr[i+1]]
+        self.order = np.argsort(self.tails, kind="stable")
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.tails, minlength=len(self.nodes)), out=self.indptr[1:])
+        # Python lists are much faster than numpy arrays to index one element at a time in the search
+        self._indptr = self.indptr.tolist()
+        self._order = self.order.tolist()
+        self._heads = self.heads.tolist()
+        self._tails = self.tails.tolist()
+
+        # Topology link each service graph link was copied from (-1 if none)
+        self.origins = np.array([l.origin if l.origin != None else -1 for l in links], dtype=np.int64)
+        self.copied = np.flatnonzero(self.origins >= 0)
+        self.update()
+
+        # Service graph links into dummy nodes, which represent assigning a component to a node
+        nodes = topology.getNodes()
+        self.assignment_links = np.array([a for a in range(len(links)) if links[a].sink.assignment != None], dtype=np.int64)
+        self.assignment_keys = [(service.components[links[a].sink.assignment[0]].description, nodes[links[a].sink.assignment[1]].description) for a in self.assignment_links]
+
+    def __getstate__(self):
+        # Only the arrays are pickled (e.g. to send to a worker process) so the pricer can still reprice and find
+        # shortest paths, but paths must be made with the original pricer
+        state = dict(self.__dict__)
+        for key in ("topology", "service", "graph", "nodes", "index"):
+            state[key] = None
+        return state
+
+    def update(self):
+        # Reads which topology links have failed (topology.removeLink) so that their copies are never priced into a path.
+        # The graph itself must be unchanged (a new pricer is needed if service.updateGraph remade it).
+        self.failed = self.topology.getArrays().failed.copy()
+        self.blocked = self.copied[self.failed[self.origins[self.copied]]]
+
+    def initialCosts(self):
+        # Link costs for the first path of the service (by number of topology links), skipping failed links
+        costs = np.array([l.cost for l in self.graph.links], dtype=float)
+        costs[self.blocked] = np.inf
+        return costs
+
+    def linkCosts(self, duals):
+        # Vectorised repricing of the service graph links from the master duals (as returned by master_problem.getDuals)
+        costs = np.zeros(self.n_links)
+        costs[self.copied] = -np.asarray(duals["bandwidth"])[self.origins[self.copied]]
+        costs[self.assignment_links] -= np.array([duals["assignmentflow"][(self.description,) + key] for key in self.assignment_keys])
+        # Duals of <= rows are non-positive so any negative cost here is numerical noise
+        costs = np.maximum(costs, 0)
+        costs[self.blocked] = np.inf
+        return costs
+
+    def shortestPath(self, costs):
+        # Dijkstra's algorithm from the start to the end of the service graph. costs must be non-negative.
+        # Returns the indexes of the links in the path (in order) and the cost of the path.
+        costs = costs.tolist() if isinstance(costs, np.ndarray) else costs
+        indptr, order, heads = self._indptr, self._order, self._heads
+        distance = [np.inf] * self.n_nodes
+        previous = [-1] * self.n_nodes
+        done = [False] * self.n_nodes
+        distance[self.start] = 0.0
+        heap = [(0.0, self.start)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == self.end:
+                break
+            for k in range(indptr[u], indptr[u+1]):
+                a = order[k]
+                v = heads[a]
+                new_distance = d + costs[a]
+                if new_distance < distance[v]:
+                    distance[v] = new_distance
+                    previous[v] = a
+                    heapq.heappush(heap, (new_distance, v))
+        if not done[self.end]:
+            return [], np.inf
+        path = []
+        v = self.end
+        while v != self.start:
+            a = previous[v]
+            path.append(a)
+            v = self._tails[a]
+        path.reverse()
+        return path, distance[self.end]
+
+    def timesTraversed(self, links_i):
+        # Number of times the path traverses each link in the topology
+        origins = self.origins[links_i]
+        return np.bincount(origins[origins >= 0], minlength=self.n_topology_links)
+
+    def componentAssignment(self, links_i):
+        # {component: {node: 0 or 1}} for the path
+        component_assignment = {}
+        for component in self.service.components:
+            component_assignment[str(component.description)] = {}
+            for node in self.topology.getNodes():
+                component_assignment[str(component.description)][str(node.description)] = 0
+        used = set(links_i)
+        for a, (component, node) in zip(self.assignment_links.tolist(), self.assignment_keys):
+            if a in used:
+                component_assignment[str(component)][str(node)] = 1
+        return component_assignment
+
+    def price(self, costs):
+        # Finds the cheapest path for the given link costs.
+        # Returns (links used, times_traversed vector over topology links, component_assignment, cost)
+        links_i, cost = self.shortestPath(costs)
+        if not links_i:
+            return [], None, None, cost
+        return [self.graph.links[a] for a in links_i], self.timesTraversed(links_i), self.componentAssignment(links_i), cost
+
+    def makePath(self, links_i):
+        # Makes a service_path in the same form as optimisation.makePath from the indexes of the links it uses
+        used_links = [self.graph.links[a] for a in links_i]
+        used_nodes = list({id(l): l for l in [x.source for x in used_links] + [x.sink for x in used_links]}.values())
+        return service_path(self.topology.name + "_" + self.service.description, used_nodes, used_links, pathColumns(used_links), self.topology, self.service)
+
+class layered_pricer(object):
+    ## Prices paths through a layered_graph (service.addLayeredGraph) with Dijkstra's algorithm over the implicit graph.
+    ## The cost of a link only depends on the topology link it copies, or on the (component, node) of the dummy node it
+    ## enters, so link costs are an array over topology links shared by every segment plus an array over dummy nodes.
+    ## Has the same interface as shortest_path_pricer, with paths given as lists of (node, topology link or -1) steps.
+        # \param topology       Topology the layered graph was made from
+        # \param service        Service whose graph is priced (service.addLayeredGraph(topology) must have been called)
+    def __init__(self, topology, service):
+        self.topology = topology
+        self.service = service
+        self.description = service.description
+        self.graph = service.graphs[topology.name]
+        self.layered = self.graph.layered
+        self.n_topology_links = len(topology.links)
+        nodes = topology.getNodes()
+        self.assignment_keys = [(c.description, n.description) for c in service.components for n in nodes]
+        self.update()
+
+    def __getstate__(self):
+        # As shortest_path_pricer, only the arrays are pickled
+        state = dict(self.__dict__)
+        for key in ("topology", "service", "graph"):
+            state[key] = None
+        return state
+
+    def update(self):
+        # Reads which topology links have failed so they are never priced into a path
+        self.blocked = np.flatnonzero(self.topology.getArrays().failed)
+
+    def initialCosts(self):
+        link_costs = np.ones(self.n_topology_links)
+        link_costs[self.blocked] = np.inf
+        return link_costs, np.zeros(len(self.assignment_keys))
+
+    def linkCosts(self, duals):
+        # (costs of the copies of each topology link, costs of the links into the dummy node of each (component, node))
+        link_costs = np.maximum(-np.asarray(duals["bandwidth"], dtype=float), 0)
+        link_costs[self.blocked] = np.inf
+        dummy_costs = np.maximum(-np.array([duals["assignmentflow"][(self.description,) + key] for key in self.assignment_keys]), 0)
+        return link_costs, dummy_costs
+
+    def shortestPath(self, costs):
+        # Dijkstra's algorithm from the gateway of the first segment to the gateway of the last. Returns the path as a
+        # list of (node, topology link the step copies or -1) steps after the start and the cost of the path.
+        link_costs, dummy_costs = costs
+        layered = self.layered
+        templates = layered.base.templates
+        n_nodes = layered.base.n_nodes
+        offsets, kinds, components = layered.offsets, layered.kinds, layered.components
+        # Cost of every link of each kind of segment, shared by all segments of that kind (links with origin -1, which
+        # join the out and in copies of a node, pick the 0 appended at the end)
+        link_costs = np.r_[link_costs, 0.0]
+        template_costs = dict((kind, link_costs[template.origins].tolist()) for kind, template in templates.items())
+        dummy_costs = dummy_costs.tolist()
+
+        distance = {layered.start: 0.0}
+        previous = {}
+        done = set()
+        heap = [(0.0, layered.start)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            if u == layered.end:
+                break
+            block = layered.block(u)
+            offset = offsets[block]
+            local = u - offset
+            steps = []
+            if kinds[block] == DUMMY:
+                # Into the copy of the node in the next segment
+                v = templates[kinds[block + 1]]._entries[local]
+                if v >= 0:
+                    steps.append((offsets[block + 1] + v, -1, 0.0))
+            else:
+                template = templates[kinds[block]]
+                cost = template_costs[kinds[block]]
+                for k in range(template._indptr[local], template._indptr[local+1]):
+                    a = template._order[k]
+                    steps.append((offset + template._heads[a], template._origins[a], cost[a]))
+                n = template._exits[local]
+                if n >= 0 and block + 1 < len(kinds):
+                    steps.append((offsets[block + 1] + n, -1, dummy_costs[components[block + 1] * n_nodes + n]))
+            for v, origin, cost in steps:
+                new_distance = d + cost
+                if new_distance < distance.get(v, np.inf):
+                    distance[v] = new_distance
+                    previous[v] = (u, origin)
+                    heapq.heappush(heap, (new_distance, v))
+        if layered.end not in done:
+            return [], np.inf
+        path = []
+        v = layered.end
+        while v != layered.start:
+            u, origin = previous[v]
+            path.append((v, origin))
+            v = u
+        path.reverse()
+        return path, distance[layered.end]
+
+    def makePath(self, path):
+        # Makes a service_path holding only the compact columns of the path (it has no service graph links)
+        layered = self.layered
+        counts = {}
+        components, nodes = [], []
+        for v, origin in path:
+            if origin >= 0:
+                counts[origin] = counts.get(origin, 0) + 1
+            block = layered.block(v)
+            if layered.kinds[block] == DUMMY:
+                components.append(layered.components[block])
+                nodes.append(v - layered.offsets[block])
+        link_indices = sorted(counts)
+        columns = (link_indices, [counts[i] for i in link_indices], components, nodes)
+        return service_path(self.topology.name + "_" + self.service.description, [], [], columns, self.topology, self.service)
+
+class latency_pricer(layered_pricer):
+    ## Prices paths through a layered_graph that meet the end to end latency budget of the service (service.required_latency)
+    ## as a resource constrained shortest path, by label setting over (cost, latency) labels. Labels are searched in order
+    ## of cost plus the cheapest cost to the end and pruned by dominance (a label at a node that has already been left with
+    ## no more latency), by the least latency to the end and by cost bounds, so the first label to reach the end is the
+    ## cheapest path within the budget. Links into and out of dummy nodes have no latency.
+        # \param topology       Topology the layered graph was made from
+        # \param service        Service whose graph is priced (service.addLayeredGraph(topology) must have been called)
+        # \param max_labels     Most labels made in one search. If reached, the cheapest path known to be within the budget
+        #                       is returned instead (and exact is set False).
+        # \param early_exit     If True, the path with least latency is returned without a search when it already has
+        #                       negative reduced cost (exact is then False)
+    def __init__(self, topology, service, max_labels=100000, early_exit=False):
+        self.max_labels = max_labels
+        self.early_exit = early_exit
+        self.budget = service.required_latency if service.required_latency != None else np.inf
+        # Whether the last search proved its path the cheapest within the budget, and the labels it made
+        self.exact = True
+        self.labels = 0
+        layered_pricer.__init__(self, topology, service)
+
+    def update(self):
+        # Reads the failed links and link latencies of the topology and finds the least latency from every node to the end
+        layered_pricer.update(self)
+        self.latencies = self.topology.getArrays().latency.astype(float)
+        self.latencies[self.blocked] = np.inf
+        latencies = np.r_[self.latencies, 0.0]
+        self.template_latencies = dict((kind, latencies[template.origins].tolist()) for kind, template in self.layered.base.templates.items())
+        dummy_latencies = [0.0] * len(self.assignment_keys)
+        self.latency_to_end, self.latency_next = self.toEnd(self.template_latencies, dummy_latencies)
+
+    def initialCosts(self):
+        return layered_pricer.initialCosts(self) + (np.inf,)
+
+    def linkCosts(self, duals):
+        # As layered_pricer with the throughput dual of the service, as paths costing at least that are not needed
+        return layered_pricer.linkCosts(self, duals) + (duals["throughput"][self.description],)
+
+    def toEnd(self, template_values, dummy_values):
+        # Dijkstra's algorithm back from the end of the layered graph. Returns the least total value (by the value of every
+        # link of each kind of segment and of the links into each dummy node) from every node to the end, and the next
+        # (node, origin) step on that path from each node.
+        layered = self.layered
+        templates = layered.base.templates
+        n_nodes = layered.base.n_nodes
+        offsets, kinds, components = layered.offsets, layered.kinds, layered.components
+        distance = [np.inf] * layered.n_nodes
+        following = [None] * layered.n_nodes
+        done = [False] * layered.n_nodes
+        distance[layered.end] = 0.0
+        heap = [(0.0, layered.end)]
+        while heap:
+            d, v = heapq.heappop(heap)
+            if done[v]:
+                continue
+            done[v] = True
+            block = layered.block(v)
+            offset = offsets[block]
+            local = v - offset
+            steps = []
+            if kinds[block] == DUMMY:
+                # From the copies of the node in the previous segment that have no links out of it
+                template = templates[kinds[block - 1]]
+                value = dummy_values[components[block] * n_nodes + local]
+                for k in range(template._exit_indptr[local], template._exit_indptr[local+1]):
+                    steps.append((offsets[block - 1] + template._exit_order[k], -1, value))
+            else:
+                template = templates[kinds[block]]
+                values = template_values[kinds[block]]
+                for k in range(template._rindptr[local], template._rindptr[local+1]):
+                    a = template._rorder[k]
+                    steps.append((offset + template._tails[a], template._origins[a], values[a]))
+                n = template._entry_of[local]
+                if n >= 0 and block > 0:
+                    steps.append((offsets[block - 1] + n, -1, 0.0))
+            for u, origin, value in steps:
+                new_distance = d + value
+                if new_distance < distance[u]:
+                    distance[u] = new_distance
+                    following[u] = (v, origin)
+                    heapq.heappush(heap, (new_distance, u))
+        return distance, following
+
+    def follow(self, following, values):
+        # The path from the start along following (from toEnd) and its total by values, a function of each step (see
+        # stepValues)
+        path, total = [], 0.0
+        u = self.layered.start
+        while u != self.layered.end:
+            v, origin = following[u]
+            total += values(u, v, origin)
+            path.append((v, origin))
+            u = v
+        return path, total
+
+    def stepValues(self, link_values, dummy_values):
+        # Function giving the value of the step u -> v copying topology link origin
+        layered = self.layered
+        n_nodes = layered.base.n_nodes
+        def value(u, v, origin):
+            if origin >= 0:
+                return link_values[origin]
+            block = layered.block(v)
+            if layered.kinds[block] == DUMMY:
+                return dummy_values[layered.components[block] * n_nodes + v - layered.offsets[block]]
+            return 0.0
+        return value
+
+    def shortestPath(self, costs):
+        # Cheapest path from the start to the end of the layered graph within the latency budget. costs are as returned by
+        # linkCosts, with a threshold above which paths are not wanted. Returns the path as a list of (node, origin) steps
+        # (as layered_pricer) and its cost, or [] and inf if there is no such path cheaper than the threshold.
+        link_costs, dummy_costs, threshold = costs
+        layered = self.layered
+        templates = layered.base.templates
+        n_nodes = layered.base.n_nodes
+        offsets, kinds, components = layered.offsets, layered.kinds, layered.components
+        self.exact = True
+        self.labels = 0
+        if self.latency_to_end[layered.start] > self.budget:
+            return [], np.inf
+
+        # The cheapest path to the end from every node bounds the cost of the labels there. If the cheapest path from the
+        # start is within the budget there is nothing to search.
+        template_costs = dict((kind, np.r_[link_costs, 0.0][template.origins].tolist()) for kind, template in templates.items())
+        dummy_costs = dummy_costs.tolist()
+        cost_to_end, cost_next = self.toEnd(template_costs, dummy_costs)
+        if cost_to_end[layered.start] >= threshold:
+            return [], np.inf
+        latency = self.stepValues(self.latencies, [0.0] * len(dummy_costs))
+        cost = self.stepValues(link_costs, dummy_costs)
+        path, path_latency = self.follow(cost_next, latency)
+        if path_latency <= self.budget:
+            return path, cost_to_end[layered.start]
+        # The path with least latency is the best known within the budget
+        best_path, best_cost = self.follow(self.latency_next, cost)
+        if self.early_exit and best_cost < threshold:
+            self.exact = False
+            return best_path, best_cost
+        bound = min(threshold, best_cost)
+
+        # Labels are (cost, latency, node, parent label, origin of the step into node)
+        label_cost, label_latency, label_node, label_parent, label_origin = [0.0], [0.0], [layered.start], [-1], [-1]
+        least_latency = [np.inf] * layered.n_nodes
+        latency_to_end, template_latencies = self.latency_to_end, self.template_latencies
+        heap = [(cost_to_end[layered.start], 0.0, 0)]
+        found = -1
+        while heap:
+            _, l, i = heapq.heappop(heap)
+            u = label_node[i]
+            # Labels at u are left in order of cost, so one with no less latency than one already left is dominated
+            if l >= least_latency[u]:
+                continue
+            least_latency[u] = l
+            if u == layered.end:
+                found = i
+                break
+            c = label_cost[i]
+            block = layered.block(u)
+            offset = offsets[block]
+            local = u - offset
+            steps = []
+            if kinds[block] == DUMMY:
+                v = templates[kinds[block + 1]]._entries[local]
+                if v >= 0:
+                    steps.append((offsets[block + 1] + v, -1, 0.0, 0.0))
+            else:
+                template = templates[kinds[block]]
+                step_costs, step_latencies = template_costs[kinds[block]], template_latencies[kinds[block]]
+                for k in range(template._indptr[local], template._indptr[local+1]):
+                    a = template._order[k]
+                    steps.append((offset + template._heads[a], template._origins[a], step_costs[a], step_latencies[a]))
+                n = template._exits[local]
+                if n >= 0 and block + 1 < len(kinds):
+                    steps.append((offsets[block + 1] + n, -1, dummy_costs[components[block + 1] * n_nodes + n], 0.0))
+            for v, origin, step_cost, step_latency in steps:
+                new_cost, new_latency = c + step_cost, l + step_latency
+                if new_latency >= least_latency[v] or new_latency + latency_to_end[v] > self.budget or new_cost + cost_to_end[v] >= bound:
+                    continue
+                label_cost.append(new_cost)
+                label_latency.append(new_latency)
+                label_node.append(v)
+                label_parent.append(i)
+                label_origin.append(origin)
+                heapq.heappush(heap, (new_cost + cost_to_end[v], new_latency, len(label_node) - 1))
+            if len(label_node) > self.max_labels:
+                self.exact = False
+                break
+        self.labels = len(label_node)
+        if found < 0:
+            # Nothing cheaper than the path with least latency (if the search finished) or the label limit was reached
+            return (best_path, best_cost) if best_cost < threshold else ([], np.inf)
+        path = []
+        i = found
+        while label_parent[i] >= 0:
+            path.append((label_node[i], label_origin[i]))
+            i = label_parent[i]
+        path.reverse()
+        return path, label_cost[found]
+
+def makePricer(topology, service, latency=False, max_labels=None):
+    # Shortest path pricer for the graph of service on topology (layered_pricer if it was made with addLayeredGraph). If
+    # latency, paths must meet the latency budget of the service (latency_pricer, layered graphs only), searching with
+    # at most max_labels labels if given.
+    if latency == True:
+        if service.graphs[topology.name].layered == None:
+            raise ValueError("latency pricing needs a layered service graph (service.addLayeredGraph)")
+        if max_labels != None:
+            return latency_pricer(topology, service, max_labels=max_labels)
+        return latency_pricer(topology, service)
+    if service.graphs[topology.name].layered != None:
+        return layered_pricer(topology, service)
+    return shortest_path_pricer(topology, service)
@@ -0,0 +1,114 @@
+import numpy as np
+from solver_backend import OPTIMAL
+
+class master_result(object):
+    ## Solution of a master_problem read from the solver in bulk. Values, duals, reduced costs and basis statuses are
+    ## NumPy arrays over the variable/row indexes of the model, each read once when first used, and placements and path
+    ## flows are decoded from them on demand. The arrays are read lazily so the result should be used before the model
+    ## is changed (e.g. new columns added), or the arrays needed should be read straight away with load(). Duals, reduced
+    ## costs and basis statuses only exist for the LP relaxation and are None if the master was solved as a MIP.
+        # \param master     Solved master_problem
+    def __init__(self, master):
+        self.master = master
+        self.solver = master.solver
+        self.status = master.status
+        self.objective = self.solver.objective() if self.status == OPTIMAL else None
+        self.relaxed = master.relax
+        self.cache = {}
+
+    def _read(self, key, read, relaxed_only=False):
+        if relaxed_only and not self.relaxed:
+            return None
+        if key not in self.cache:
+            self.cache[key] = read()
+        return self.cache[key]
+
+    def load(self, *keys):
+        # Reads the given arrays now ("X", "Pi", "RC", "VBasis", "CBasis"; all of them if none are given)
+        for key in keys or ("X", "Pi", "RC", "VBasis", "CBasis"):
+            getattr(self, key)
+        return self
+
+    @property
+    def X(self):
+        return self._read("X", self.solver.values)
+
+    @property
+    def Pi(self):
+        return self._read("Pi", self.solver.duals, True)
+
+    @property
+    def RC(self):
+        return self._read("RC", self.solver.reducedCosts, True)
+
+    @property
+    def VBasis(self):
+        basis = self._read("basis", self.solver.getBasis, True)
+        return basis[0] if basis != None else None
+
+    @property
+    def CBasis(self):
+        basis = self._read("basis", self.solver.getBasis, True)
+        return basis[1] if basis != None else None
+
+    def getBasis(self):
+        # (VBasis, CBasis) to warm start another model with solver_backend.setBasis
+        return self.VBasis, self.CBasis
+
+    def values(self, name):
+        # Values of a group of variables: "x" (all path flows), "y" (all assignments) or "artificial"
+        master = self.master
+        if name == "x":
+            return np.concatenate([self.flows(service) for service in master.services]) if master.services else np.zeros(0)
+        if name == "y":
+            return self.X[master.y]
+        if name == "artificial":
+            return self.X[list(master.artificial.values())]
+        raise ValueError("name must be 'x', 'y' or 'artificial'")
+
+    def duals(self, block):
+        # Duals of a block of rows ("throughput", "bandwidth", "assignmentflow", "replicas" or "capacity")
+        return self.Pi[self.master.rows[block]] if self.relaxed else None
+
+    def assignment(self, tolerance=1e-9):
+        # {component: {node: y}} for every y above tolerance (fractional in the LP relaxation)
+        master = self.master
+        y = self.X[master.y].reshape(len(master.components), len(master.nodes))
+        assignment = {}
+        for c, n in zip(*np.nonzero(y > tolerance)):
+            assignment.setdefault(master.components[c].description, {})[master.nodes[n].description] = y[c, n]
+        return assignment
+
+    def placements(self):
+        # {component: [nodes it is placed on]} in the integer solution (y > 0.5)
+        master = self.master
+        y = self.X[master.y].reshape(len(master.components), len(master.nodes)) > 0.5
+        return dict((master.components[c].description, [master.nodes[n].description for n in np.flatnonzero(y[c])])
+                    for c in range(len(master.components)))
+
+    def flows(self, service):
+        # Array of the flow on every path of service (in the order of service_graph.getPaths()), which is 0 for paths
+        # evicted from the master
+        flows = np.asarray(self.master.flows[service.description], dtype=np.int64)
+        return np.where(flows >= 0, self.X[flows], 0.0)
+
+    def pathFlows(self, service, tolerance=1e-9):
+        # [(service_path, flow)] for the paths of service with flow above tolerance
+        flows = self.flows(service)
+        paths = service.graphs[self.master.topology.name].getPaths()
+        return [(paths[k], flows[k]) for k in np.flatnonzero(flows > tolerance)]
+
+    def artificialFlows(self):
+        # {service: artificial flow}, which is non zero if the paths found so far cannot meet the service's throughput
+        artificial = self.master.artificial
+        return dict(zip(artificial.keys(), self.X[list(artificial.values())].tolist()))
+
+    def linkUsage(self):
+        # Array over topology links of the total flow through each link (the activity of the bandwidth rows)
+        master = self.master
+        usage = np.zeros(len(master.topology.links))
+        for service in master.services:
+            store = service.graphs[master.topology.name].store
+            if len(store):
+                usage += store.linkMatrix() @ self.flows(service)
+        return usage
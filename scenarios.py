@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from column_generation import solveColumnGeneration
+from solver_backend import OPTIMAL
+from metrics import logger
+
+class scenario(object):
+    ## Demand scenario: changes to the base topology and services that are solved as one run
+        # \param name           Name of the scenario in the results
+        # \param throughput     {service description: required throughput} (services not given keep their throughput)
+        # \param replicas       {component description: replica count} (components not given keep their replica count)
+        # \param failed_links   Indexes of the topology links that have failed
+    def __init__(self, name, throughput=None, replicas=None, failed_links=()):
+        self.name = name
+        self.throughput = dict(throughput or {})
+        self.replicas = dict(replicas or {})
+        self.failed_links = tuple(sorted(set(int(i) for i in failed_links)))
+
+    def group(self):
+        # Scenarios with the same group have the same failed links. Their paths are the same, so the column pools built
+        # solving one are a good start for the others whatever their throughputs and replica counts.
+        return self.failed_links
+
+    def forJSON(self):
+        return {"name": self.name, "throughput": self.throughput, "replicas": self.replicas, "failed_links": list(self.failed_links)}
+
+def readScenarios(filename):
+    # Reads scenarios from a JSON list or a JSON-lines file of objects with the keys of scenario.forJSON
+    with open(filename) as f:
+        text = f.read()
+    try:
+        rows = json.loads(text)
+    except ValueError:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [scenario(row["name"], row.get("throughput"), row.get("replicas"), row.get("failed_links", ())) for row in rows]
+
+def readResults(filename):
+    # Reads the results written by solveScenarios, {scenario name: result}
+    results = {}
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                results[result["scenario"]] = result
+    return results
+
+# Relative gap between an integer solution and the Lagrangian bound within which it counts as proven optimal
+_proof_gap = 1e-6
+
+# State of each worker process, set by _initialise: the pickled base topology and services, the options passed to
+# solveColumnGeneration and the topology and services of the groups solved most recently, with their column pools
+_base = None
+_options = None
+_groups = None
+_cache_size = None
+
+def _initialise(base, options, cache_size):
+    global _base, _options, _groups, _cache_size
+    _base, _options, _groups, _cache_size = base, options, OrderedDict(), cache_size
+
+def _groupState(key):
+    # (topology, services) for a scenario group: a copy of the base with the group's links failed, kept between
+    # scenarios so that each starts from the columns found by those of the group solved before it in this process
+    if key in _groups:
+        _groups.move_to_end(key)
+        return _groups[key]
+    topology, services = pickle.loads(_base)
+    for i in key:
+        topology.removeLink(i)
+    for service in services:
+        service.updateGraph(topology)
+    _groups[key] = (topology, services)
+    while len(_groups) > _cache_size:
+        _groups.popitem(last=False)
+    return topology, services
+
+def _solve(_scenario, throughput, replicas):
+    # Solves one scenario in a worker. throughput and replicas are the base values, restored for anything the scenario
+    # does not change. Returns a dictionary of results (see solveScenarios).
+    start = time.perf_counter()
+    result = {"scenario": _scenario.name, "pid": os.getpid(), "failed_links": list(_scenario.failed_links)}
+    try:
+        topology, services = _groupState(_scenario.group())
+        for service in services:
+            service.required_throughput = _scenario.throughput.get(service.description, throughput[service.description])
+            for component in service.components:
+                component.replica_count = _scenario.replicas.get(component.description, replicas[component.description])
+        columns = sum(len(s.graphs[topology.name].getPaths()) for s in services)
+        master, history = solveColumnGeneration(topology, services, **_options)
+        bound = history[-1]["lagrangian_bound"]
+        if master.status == OPTIMAL:
+            solution = master.getResult()
+            artificial = solution.values("artificial")
+            unmet = dict((description, float(artificial[i])) for i, description in enumerate(master.artificial))
+            # The MIP is only over the columns generated for the LP relaxation, so its solution is proven optimal only
+            # if it reaches the Lagrangian bound on the LP relaxation
+            gap = max(solution.objective - bound, 0.0) / max(1.0, abs(solution.objective))
+            if sum(unmet.values()) >= 1e-6:
+                status = "unmet_demand"
+            else:
+                status = "optimal" if gap <= _proof_gap else "feasible"
+            result.update({"status": status, "objective": solution.objective, "gap": gap,
+                           "placement": solution.placements(), "unmet_throughput": unmet})
+        else:
+            result.update({"status": master.status, "objective": None, "gap": None, "placement": None})
+        result.update({"lp_status": history[-1]["status"], "lp_objective": history[-1]["objective"], "lagrangian_bound": bound,
+                       "iterations": len(history), "columns_reused": columns,
+                       "columns": sum(len(s.graphs[topology.name].getPaths()) for s in services)})
+    except Exception as e:
+        logger.exception("Scenario %s failed", _scenario.name)
+        result.update({"status": "error", "error": repr(e)})
+    result["solve_time"] = time.perf_counter() - start
+    return result
+
+def solveScenarios(topology, services, scenarios, filename, workers=None, cache_size=4, layered=False, **options):
+    # Solves every scenario with column generation (column_generation.solveColumnGeneration) in a process pool and
+    # appends a line of JSON with each scenario's results to filename as soon as it finishes.
+    # The service graphs are made once (if the services have none for topology yet) and sent to each worker process
+    # once, when it starts. Each worker keeps the graphs of the last cache_size scenario groups it solved (see
+    # scenario.group) so alike scenarios start from the columns of those solved before them. Scenarios are handed out
+    # group by group so that alike scenarios tend to follow each other in the same worker.
+    # \param workers       Number of worker processes (defaults to the number of CPUs). With 1 the scenarios are solved
+    #                      in this process, one after the other.
+    # \param cache_size    Most scenario groups whose graphs and columns each worker keeps
+    # \param layered       If True, graphs are made with service.addLayeredGraph instead of service.addGraph
+    # \param options       Passed on to solveColumnGeneration (pricing, backend, max_iterations, gap etc.)
+    # Returns {scenario name: result}, where each result has the scenario's status, objective, placement
+    # ({component: [nodes]}), unmet throughput of each service, column generation status ("lp_status"), LP objective,
+    # Lagrangian bound, iterations, columns reused and held at the end, and solve time in seconds. The integer solution
+    # is found over the columns generated for the LP relaxation only, so the status is "optimal" only if its objective
+    # reaches the Lagrangian bound and "feasible" otherwise, with the relative gap between the two in "gap". It is
+    # "unmet_demand" if some throughput could only be met by artificial flow, a solver status or "error". Use
+    # branch_and_price where a proven optimum is needed.
+    if "master" in options or "warm_start_dir" in options:
+        raise ValueError("scenarios are solved from the column pools of their group, not from master or warm_start_dir")
+    names = [s.name for s in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("scenario names must be unique")
+    with_graphs = 0
+    for service in services:
+        if topology.name not in service.graphs:
+            if layered == True:
+                service.addLayeredGraph(topology)
+            else:
+                service.addGraph(topology)
+            with_graphs += 1
+    logger.info("Scenarios: {} service graphs made, {} scenarios in {} groups".format(with_graphs, len(scenarios), len(set(s.group() for s in scenarios))))
+    base = pickle.dumps((topology, services))
+    throughput = dict((s.description, s.required_throughput) for s in services)
+    replicas = dict((c.description, c.replica_count) for s in services for c in s.components)
+    ordered = sorted(scenarios, key=lambda s: s.group())
+
+    if workers == None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(scenarios)))
+    results = {}
+    start = time.perf_counter()
+    with open(filename, "a") as f:
+        def record(result):
+            results[result["scenario"]] = result
+            f.write(json.dumps(result, default=float) + "\n")
+            f.flush()
+            logger.info("Scenario {} ({}/{}): {}, objective {}, {:.3f}s".format(result["scenario"], len(results), len(scenarios),
+                                                                             result["status"], result.get("objective"), result["solve_time"]))
+        if workers == 1:
+            _initialise(base, options, cache_size)
+            for _scenario in ordered:
+                record(_solve(_scenario, throughput, replicas))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initialise, initargs=(base, options, cache_size)) as executor:
+                futures = [executor.submit(_solve, _scenario, throughput, replicas) for _scenario in ordered]
+                for future in as_completed(futures):
+                    record(future.result())
+    logger.info("Scenarios finished: {} solved in {:.3f}s".format(len(results), time.perf_counter() - start))
+    return results
@@ -1,6 +1,5 @@
 from glob import escape
 import sys
-import this
 import graphviz as gvz
 import subprocess
 import copy
@@ -9,8 +8,28 @@ import itertools
 from topology_class import *
 from numpy import inf
 from make_service_graph import make_graph
+from column_store import column_store
+from column_pool import column_pool
+from layered_graph import layered_graph, baseLayer
+from metrics import logger, timer
 inf = 10000
 
+def pathColumns(links):
+    # Compact master problem coefficients of a path from the service graph links it uses: (topology link indexes, counts,
+    # component indexes, node indexes). Links copied from the topology carry its index in link.origin and dummy nodes
+    # carry the (component, node) assignment they represent in location.assignment.
+    counts = {}
+    components = []
+    nodes = []
+    for l in links:
+        if l.origin != None:
+            counts[l.origin] = counts.get(l.origin, 0) + 1
+        if l.sink.assignment != None:
+            components.append(l.sink.assignment[0])
+            nodes.append(l.sink.assignment[1])
+    link_indices = sorted(counts)
+    return (link_indices, [counts[i] for i in link_indices], components, nodes)
+
 class component(object):
     id_iter = itertools.count()
     ## Class representing a node (datacenter location)
@@ -58,44 +77,149 @@ class service(object):
     
     def addGraph(self, _topology):
         # Given a topology it makes the equivalent service graph and initialises the paths as an empyt list
-        nodes, edges = make_graph(self, _topology)
-        self.graphs[_topology.name] = service_graph(_topology.name + "_" + self.description, nodes, edges)
+        with timer("graph_build", topology=_topology.name, service=self.description):
+            nodes, edges = make_graph(self, _topology)
+            store = column_store(len(_topology.links), len(self.components), len(_topology.getNodes()))
+            self.graphs[_topology.name] = service_graph(_topology.name + "_" + self.description, nodes, edges, store)
+            self.graphs[_topology.name].delta = len(_topology.deltas)
+
+    def addLayeredGraph(self, _topology):
+        # As addGraph but the graph is held as a layered_graph over the base layer shared by every service on _topology,
+        # so no locations or links are copied. It can only be priced with pricing.layered_pricer (shortest paths).
+        with timer("graph_build", topology=_topology.name, service=self.description):
+            store = column_store(len(_topology.links), len(self.components), len(_topology.getNodes()))
+            graph = service_graph(_topology.name + "_" + self.description, [], [], store)
+            graph.layered = layered_graph(baseLayer(_topology), len(self.components))
+            graph.delta = len(_topology.deltas)
+            self.graphs[_topology.name] = graph
+
+    def updateGraph(self, _topology):
+        # Applies the changes recorded in _topology.deltas since the graph was made (or last updated). Bandwidth and latency
+        # changes are copied to the copies of the changed links only. Removed links stay in the graph (pricing skips
+        # copies of failed links). If links were added the graph (or layered graph) is remade, keeping its paths, store and
+        # pool since existing columns are unchanged. Returns True if the graph was remade.
+        graph = self.graphs[_topology.name]
+        deltas = _topology.deltas[graph.delta:]
+        graph.delta = len(_topology.deltas)
+        if len(_topology.links) > graph.store.n_links and graph.layered != None:
+            graph.layered = layered_graph(baseLayer(_topology), len(self.components))
+            graph.store.n_links = len(_topology.links)
+            return True
+        if len(_topology.links) > graph.store.n_links:
+            with timer("graph_build", topology=_topology.name, service=self.description):
+                nodes, edges = make_graph(self, _topology)
+                new_graph = service_graph(graph.name, nodes, edges)
+            new_graph.paths, new_graph.store, new_graph.pool, new_graph.delta = graph.paths, graph.store, graph.pool, graph.delta
+            new_graph.store.n_links = len(_topology.links)
+            self.graphs[_topology.name] = new_graph
+            return True
+        for kind, i in deltas:
+            if kind == BANDWIDTH or kind == LATENCY:
+                for a in graph.copiesOf(i):
+                    graph.links[a].parameters[kind] = _topology.links[i].parameters[kind]
+        return False
 
     def getGraph(self, topology):
         try:
             return self.graphs[topology.name]
         except KeyError:
-            print("No graph for given topology. Try using service.addGraph(topology) to create one")
+            logger.warning("No graph for given topology. Try using service.addGraph(topology) to create one")
             return None
 
 
 class service_graph(topology):
-    def __init__(self, name, locations, links):
+    ## Service graph (see make_service_graph.make_graph) and the paths found through it
+        # \param store     column_store holding the paths in compact form (optional). If given, a column_pool keeps
+        #                  the paths unique.
+    def __init__(self, name, locations, links, store=None):
         super().__init__(name, locations, links)
         self.paths = []
+        self.store = store
+        self.pool = column_pool(store) if store != None else None
+        # Number of topology.deltas applied to the graph (see service.updateGraph)
+        self.delta = 0
+        self.copies = None
+        # layered_graph if made with service.addLayeredGraph (the graph then has no locations or links of its own)
+        self.layered = None
+
+    def copiesOf(self, origin):
+        # Indexes of the links in the graph copied from topology link origin
+        if self.copies == None:
+            self.copies = {}
+            for a, l in enumerate(self.links):
+                if l.origin != None:
+                    self.copies.setdefault(l.origin, []).append(a)
+        return self.copies.get(origin, [])
 
     def addPath(self, path):
+        # Adds the path unless the pool already has a path with the same master problem coefficients.
+        # Returns (index of the path's column in the store, True if the path was added)
+        if self.store != None and path.store is self.store:
+            return path.column, False
+        if self.store != None and path.store == None:
+            column = self.pool.find(path.columns)
+            if column != None:
+                return column, False
+            path.column = self.store.addColumn(*path.columns)
+            self.pool.add(path.columns, path.column)
+            path.store = self.store
+            path.columns = None
         self.paths.append(path)
+        return path.column, True
     
     def getPaths(self):
         return self.paths
     
     def getStartNode(self):
         for i in self.locations:
-            incoming = [l for l in self.getLinks() if l.sink == i]
-            if not incoming:
+            if not self.incomingEdgeIndexes(i):
                 return i
     
     def getEndNode(self):
         for i in self.locations:
-            outgoing = [l for l in self.getLinks() if l.source == i]
-            if not outgoing:
+            if not self.outgoingEdgeIndexes(i):
                 return i
 
 class service_path(topology):
+    ## Path through a service graph. Its coefficients in the master problem are kept in compact form: the topology links it
+    ## traverses (with counts) and the (component, node) assignments it makes, by index. Once added to a service graph they
+    ## are held in the graph's column_store.
+        # \param columns   (topology link indexes, counts, component indexes, node indexes)
+        # \param topology  Topology the service graph was made from
+        # \param service   Service the path belongs to
     id_iter = itertools.count()
-    def __init__(self, name, locations, links, times_traversed, component_assignment):
+    def __init__(self, name, locations, links, columns, topology, service):
         super().__init__(name, locations, links)
         self.name = name + str(next(location.id_iter))
-        self.times_traversed = times_traversed
-        self.component_assignment = component_assignment
\ No newline at end of file
+        self.columns = columns
+        self.topology = topology
+        self.service = service
+        self.store = None
+        self.column = None
+
+    def getColumns(self):
+        # (topology link indexes, counts, component indexes, node indexes) of the path
+        if self.store == None:
+            return self.columns
+        return self.store.getLinks(self.column) + self.store.getAssignments(self.column)
+
+    @property
+    def times_traversed(self):
+        # List of (link, number of times the path traverses it) for every link in the topology
+        link_indices, link_counts, _, _ = self.getColumns()
+        counts = [0] * len(self.topology.links)
+        for i, count in zip(link_indices, link_counts):
+            counts[i] = int(count)
+        return list(zip(self.topology.links, counts))
+
+    @property
+    def component_assignment(self):
+        # {component: {node: 1 if the path assigns component to node else 0}}
+        _, _, components, nodes = self.getColumns()
+        topology_nodes = self.topology.getNodes()
+        component_assignment = {}
+        for component in self.service.components:
+            component_assignment[str(component.description)] = dict((str(node.description), 0) for node in topology_nodes)
+        for c, n in zip(components, nodes):
+            component_assignment[str(self.service.components[c].description)][str(topology_nodes[n].description)] = 1
+        return component_assignment
\ No newline at end of file
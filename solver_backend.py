@@ -0,0 +1,407 @@
+import numpy as np
+import scipy.sparse as sp
+# Both solvers are optional so that e.g. batch workers without a Gurobi licence can run on HiGHS only
+try:
+    import gurobipy as gp
+    from gurobipy import GRB
+except ImportError:
+    gp = None
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# Row senses (the same characters as GRB.LESS_EQUAL, GRB.GREATER_EQUAL and GRB.EQUAL)
+LESS_EQUAL, GREATER_EQUAL, EQUAL = "<", ">", "="
+# Statuses returned by solve()
+OPTIMAL, INFEASIBLE, UNBOUNDED, OTHER = "optimal", "infeasible", "unbounded", "other"
+# Basis statuses are given in Gurobi's VBasis/CBasis convention by every backend so a saved basis can be used with either
+BASIC, AT_LOWER, AT_UPPER, SUPERBASIC = 0, -1, -2, -3
+
+class solver_backend(object):
+    ## Solver agnostic interface to the LPs/MIPs made by this package. Variables and rows are referred to by their index
+    ## (in the order they were added) and values, duals and bases are returned as arrays over those indexes.
+        # \param name       Name of the model (used for the files written)
+        # \param verbose    If False the solver log is not printed
+    def __init__(self, name, verbose=True):
+        self.name = name
+        self.verbose = verbose
+        self.variable_names = []
+        self.row_names = []
+        self.row_senses = []
+
+    def numVariables(self):
+        return len(self.variable_names)
+
+    def numRows(self):
+        return len(self.row_names)
+
+    def _newVariables(self, names):
+        # Records names of new variables and returns their indexes
+        start = self.numVariables()
+        self.variable_names += list(names)
+        return np.arange(start, self.numVariables())
+
+    def _newRows(self, names, sense):
+        # Records names and sense of new rows and returns their indexes
+        start = self.numRows()
+        self.row_names += list(names)
+        self.row_senses += [sense] * len(names)
+        return np.arange(start, self.numRows())
+
+    def _removedVariables(self, variables):
+        # Drops the names of removed variables and returns the array mapping old indexes to new ones (-1 if removed)
+        keep = np.ones(self.numVariables(), dtype=bool)
+        keep[np.asarray(variables, dtype=np.int64)] = False
+        mapping = np.full(self.numVariables(), -1, dtype=np.int64)
+        mapping[keep] = np.arange(int(keep.sum()))
+        self.variable_names = [name for name, k in zip(self.variable_names, keep.tolist()) if k]
+        return mapping, keep
+
+    def _padBasis(self, vbasis, cbasis):
+        # A basis saved before columns or rows were added is extended with the new variables at their lower bound and
+        # the new rows basic
+        vbasis = np.concatenate([np.asarray(vbasis, dtype=np.int64), np.full(max(0, self.numVariables() - len(vbasis)), AT_LOWER)])
+        cbasis = np.concatenate([np.asarray(cbasis, dtype=np.int64), np.full(max(0, self.numRows() - len(cbasis)), BASIC)])
+        return vbasis[:self.numVariables()], cbasis[:self.numRows()]
+
+    def addVariables(self, obj, lb, ub, integer, names):
+        # Adds len(names) variables with objective coefficients obj and bounds lb, ub (scalars or arrays). Returns their indexes.
+        raise NotImplementedError
+
+    def addRows(self, matrix, sense, rhs, names):
+        # Adds the rows matrix @ variables (sense) rhs, where matrix is a scipy.sparse matrix with a column for each
+        # variable added so far (or fewer, in which case the missing columns are zero). Returns their indexes.
+        raise NotImplementedError
+
+    def addColumn(self, obj, lb, ub, rows, coefficients, name, integer=False):
+        # Adds a variable with the given coefficients in the existing rows. Returns its index.
+        raise NotImplementedError
+
+    def removeVariables(self, variables):
+        # Removes the variables at the given indexes. The remaining variables keep their order, so their indexes shift
+        # down. Returns an array mapping old indexes to new ones (-1 for those removed). Removing only non basic
+        # variables keeps the basis valid for the next solve.
+        raise NotImplementedError
+
+    def setRHS(self, rows, rhs):
+        # Changes the right hand sides of the rows at the given indexes in place (keeping the basis)
+        raise NotImplementedError
+
+    def setIntegrality(self, variables, integer):
+        # Makes the variables at the given indexes integer (True) or continuous (False)
+        raise NotImplementedError
+
+    def setBounds(self, variables, lb, ub):
+        # Sets the lower and upper bounds of the variables at the given indexes
+        raise NotImplementedError
+
+    def setPrimalSimplex(self, primal):
+        # If True LPs are solved with primal simplex, which re-solves quickly from the previous basis after columns are added
+        raise NotImplementedError
+
+    def solve(self):
+        # Solves the model (warm started from the previous basis if there is one) and returns one of the statuses above
+        raise NotImplementedError
+
+    def objective(self):
+        raise NotImplementedError
+
+    def work(self):
+        # Work done by the last solve (Gurobi's deterministic work units, or simplex plus barrier iterations for HiGHS)
+        raise NotImplementedError
+
+    def values(self):
+        # Array of variable values
+        raise NotImplementedError
+
+    def duals(self):
+        # Array of row duals. For a minimisation these are >= 0 for ">" rows and <= 0 for "<" rows with either solver.
+        raise NotImplementedError
+
+    def reducedCosts(self):
+        # Array of variable reduced costs
+        raise NotImplementedError
+
+    def getBasis(self):
+        # (variable statuses, row statuses) of the current basis
+        raise NotImplementedError
+
+    def setBasis(self, vbasis, cbasis):
+        # Warm starts the next solve from the given basis (as returned by getBasis, possibly for a smaller model)
+        raise NotImplementedError
+
+    def setStart(self, variables, values):
+        # Gives a (partial) starting solution for the next MIP solve: values of the variables at the given indexes
+        raise NotImplementedError
+
+    def diagnose(self, filename=None):
+        # Finds an irreducible infeasible subsystem of an infeasible model and returns the names of the rows and
+        # variable bounds in it. If filename is given, the subsystem is also written to it.
+        raise NotImplementedError
+
+    def write(self, filename):
+        # Writes the model (the format is taken from the extension, e.g. .lp or .mps)
+        raise NotImplementedError
+
+def _matrix(matrix, n_rows, n_columns):
+    # matrix (or an empty block if None) as CSR with exactly n_columns columns
+    matrix = sp.csr_matrix(matrix if matrix is not None else (n_rows, n_columns))
+    if matrix.shape[1] < n_columns:
+        matrix = sp.hstack([matrix, sp.csr_matrix((matrix.shape[0], n_columns - matrix.shape[1]))], format="csr")
+    return matrix
+
+class gurobi_backend(solver_backend):
+    ## Solver backend using Gurobi (gurobipy)
+        # \param env    Gurobi environment for the model (the default environment if None). Models used from different
+        #               threads each need their own environment.
+    def __init__(self, name, verbose=True, env=None):
+        if gp == None:
+            raise ImportError("gurobipy is required for the gurobi backend")
+        solver_backend.__init__(self, name, verbose)
+        self.m = gp.Model(name, env=env)
+        self.m.Params.OutputFlag = int(verbose)
+        self.variables = []
+        self.constraints = []
+        # MVar/MConstr over all variables/rows, made when first needed after variables/rows are added, so attributes
+        # are read in bulk as NumPy arrays
+        self.variable_array = None
+        self.constraint_array = None
+
+    def variableArray(self):
+        if self.variable_array is None or self.variable_array.shape[0] != len(self.variables):
+            self.variable_array = gp.MVar.fromlist(self.variables)
+        return self.variable_array
+
+    def constraintArray(self):
+        if self.constraint_array is None or self.constraint_array.shape[0] != len(self.constraints):
+            self.constraint_array = gp.MConstr.fromlist(self.constraints)
+        return self.constraint_array
+
+    def addVariables(self, obj, lb, ub, integer, names):
+        v = self.m.addMVar(shape=len(names), lb=lb, ub=ub, obj=obj, vtype=GRB.INTEGER if integer else GRB.CONTINUOUS, name=np.array(names, dtype=object))
+        self.m.update()
+        self.variables += v.tolist()
+        return self._newVariables(names)
+
+    def addRows(self, matrix, sense, rhs, names):
+        matrix = _matrix(matrix, len(names), self.numVariables())
+        rows = self.m.addMConstr(matrix, self.variableArray(), sense, np.asarray(rhs, dtype=float))
+        self.m.update()
+        self.m.setAttr("ConstrName", rows.tolist(), list(names))
+        self.constraints += rows.tolist()
+        return self._newRows(names, sense)
+
+    def addColumn(self, obj, lb, ub, rows, coefficients, name, integer=False):
+        column = gp.Column([float(c) for c in coefficients], [self.constraints[r] for r in rows])
+        self.variables.append(self.m.addVar(lb=lb, ub=ub, obj=obj, vtype=GRB.INTEGER if integer else GRB.CONTINUOUS, column=column, name=name))
+        return self._newVariables([name])[0]
+
+    def removeVariables(self, variables):
+        self.m.remove([self.variables[i] for i in variables])
+        self.m.update()
+        mapping, keep = self._removedVariables(variables)
+        self.variables = [v for v, k in zip(self.variables, keep.tolist()) if k]
+        self.variable_array = None
+        return mapping
+
+    def setRHS(self, rows, rhs):
+        self.m.setAttr("RHS", [self.constraints[r] for r in rows], [float(b) for b in rhs])
+
+    def setIntegrality(self, variables, integer):
+        variables = [self.variables[i] for i in variables]
+        self.m.setAttr("VType", variables, [GRB.INTEGER if integer else GRB.CONTINUOUS] * len(variables))
+
+    def setBounds(self, variables, lb, ub):
+        variables = [self.variables[i] for i in variables]
+        self.m.setAttr("LB", variables, [float(b) for b in lb])
+        self.m.setAttr("UB", variables, [float(b) for b in ub])
+
+    def setPrimalSimplex(self, primal):
+        self.m.Params.Method = 0 if primal else -1
+
+    def solve(self):
+        self.m.optimize()
+        return {GRB.OPTIMAL: OPTIMAL, GRB.INFEASIBLE: INFEASIBLE, GRB.UNBOUNDED: UNBOUNDED, GRB.INF_OR_UNBD: INFEASIBLE}.get(self.m.status, OTHER)
+
+    def objective(self):
+        return self.m.ObjVal
+
+    def work(self):
+        return self.m.Work
+
+    def values(self):
+        return self.variableArray().X
+
+    def duals(self):
+        return self.constraintArray().Pi
+
+    def reducedCosts(self):
+        return self.variableArray().RC
+
+    def getBasis(self):
+        return self.variableArray().VBasis, self.constraintArray().CBasis
+
+    def setBasis(self, vbasis, cbasis):
+        vbasis, cbasis = self._padBasis(vbasis, cbasis)
+        self.m.setAttr("VBasis", self.variables, vbasis.tolist())
+        self.m.setAttr("CBasis", self.constraints, cbasis.tolist())
+
+    def setStart(self, variables, values):
+        self.m.setAttr("Start", [self.variables[i] for i in variables], [float(v) for v in values])
+
+    def diagnose(self, filename=None):
+        self.m.computeIIS()
+        if filename != None:
+            self.m.write(filename)
+        names = [c.ConstrName for c in self.constraints if c.IISConstr]
+        names += [v.VarName + " lb" for v in self.variables if v.IISLB] + [v.VarName + " ub" for v in self.variables if v.IISUB]
+        return names
+
+    def write(self, filename):
+        self.m.write(filename)
+
+class highs_backend(solver_backend):
+    ## Solver backend using HiGHS (highspy), which needs no licence
+    def __init__(self, name, verbose=True):
+        if highspy == None:
+            raise ImportError("highspy is required for the highs backend")
+        solver_backend.__init__(self, name, verbose)
+        self.h = highspy.Highs()
+        self.h.setOptionValue("output_flag", bool(verbose))
+
+    def _setIntegrality(self, variables, integer):
+        variables = np.asarray(variables, dtype=np.int32)
+        value = highspy.HighsVarType.kInteger if integer else highspy.HighsVarType.kContinuous
+        self.h.changeColsIntegrality(len(variables), variables, np.full(len(variables), int(value), dtype=np.uint8))
+
+    def addVariables(self, obj, lb, ub, integer, names):
+        n = len(names)
+        start = self.numVariables()
+        variables = np.arange(start, start + n, dtype=np.int32)
+        self.h.addVars(n, np.broadcast_to(np.asarray(lb, dtype=float), n).copy(), np.broadcast_to(np.asarray(ub, dtype=float), n).copy())
+        self.h.changeColsCost(n, variables, np.broadcast_to(np.asarray(obj, dtype=float), n).copy())
+        if integer and n:
+            self._setIntegrality(variables, True)
+        for i, name in zip(variables.tolist(), names):
+            self.h.passColName(i, name)
+        return self._newVariables(names)
+
+    def addRows(self, matrix, sense, rhs, names):
+        n = len(names)
+        start = self.numRows()
+        matrix = _matrix(matrix, n, self.numVariables())
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), n)
+        lower = rhs if sense != LESS_EQUAL else np.full(n, -np.inf)
+        upper = rhs if sense != GREATER_EQUAL else np.full(n, np.inf)
+        self.h.addRows(n, np.ascontiguousarray(lower), np.ascontiguousarray(upper), matrix.nnz, matrix.indptr[:-1].astype(np.int32), matrix.indices.astype(np.int32), matrix.data.astype(float))
+        for i, name in enumerate(names):
+            self.h.passRowName(start + i, name)
+        return self._newRows(names, sense)
+
+    def addColumn(self, obj, lb, ub, rows, coefficients, name, integer=False):
+        index = self.numVariables()
+        self.h.addCol(obj, lb, ub, len(rows), np.asarray(rows, dtype=np.int32), np.asarray(coefficients, dtype=float))
+        if integer:
+            self._setIntegrality([index], True)
+        self.h.passColName(index, name)
+        return self._newVariables([name])[0]
+
+    def removeVariables(self, variables):
+        variables = np.asarray(variables, dtype=np.int32)
+        self.h.deleteCols(len(variables), variables)
+        return self._removedVariables(variables)[0]
+
+    def setRHS(self, rows, rhs):
+        rows = np.asarray(rows, dtype=np.int32)
+        rhs = np.asarray(rhs, dtype=float)
+        senses = np.array([self.row_senses[r] for r in rows.tolist()])
+        lower = np.where(senses != LESS_EQUAL, rhs, -np.inf)
+        upper = np.where(senses != GREATER_EQUAL, rhs, np.inf)
+        self.h.changeRowsBounds(len(rows), rows, lower, upper)
+
+    def setIntegrality(self, variables, integer):
+        self._setIntegrality(variables, integer)
+
+    def setBounds(self, variables, lb, ub):
+        variables = np.asarray(variables, dtype=np.int32)
+        self.h.changeColsBounds(len(variables), variables, np.asarray(lb, dtype=float), np.asarray(ub, dtype=float))
+
+    def setPrimalSimplex(self, primal):
+        # simplex_strategy 4 is primal simplex and 1 is HiGHS's default (dual) choice
+        self.h.setOptionValue("simplex_strategy", 4 if primal else 1)
+
+    def solve(self):
+        self.h.run()
+        status = self.h.getModelStatus()
+        return {highspy.HighsModelStatus.kOptimal: OPTIMAL, highspy.HighsModelStatus.kInfeasible: INFEASIBLE,
+                highspy.HighsModelStatus.kUnbounded: UNBOUNDED, highspy.HighsModelStatus.kUnboundedOrInfeasible: INFEASIBLE}.get(status, OTHER)
+
+    def objective(self):
+        return self.h.getInfo().objective_function_value
+
+    def work(self):
+        info = self.h.getInfo()
+        return max(info.simplex_iteration_count, 0) + max(info.ipm_iteration_count, 0)
+
+    def values(self):
+        return np.array(self.h.getSolution().col_value)
+
+    def duals(self):
+        return np.array(self.h.getSolution().row_dual)
+
+    def reducedCosts(self):
+        return np.array(self.h.getSolution().col_dual)
+
+    def getBasis(self):
+        # HiGHS statuses (kLower, kBasic, kUpper, kZero, kNonbasic) are mapped by value through lookup tables
+        basis = self.h.getBasis()
+        columns = np.array([AT_LOWER, BASIC, AT_UPPER, SUPERBASIC, AT_LOWER])
+        rows = np.array([AT_LOWER, BASIC, AT_LOWER, AT_LOWER, AT_LOWER])
+        col_status = np.array([s.value for s in basis.col_status], dtype=np.int64)
+        row_status = np.array([s.value for s in basis.row_status], dtype=np.int64)
+        return columns[col_status], rows[row_status]
+
+    def setBasis(self, vbasis, cbasis):
+        status = highspy.HighsBasisStatus
+        vbasis, cbasis = self._padBasis(vbasis, cbasis)
+        columns = {BASIC: status.kBasic, AT_LOWER: status.kLower, AT_UPPER: status.kUpper, SUPERBASIC: status.kZero}
+        # A non basic row is at its rhs, which is the upper bound of a "<" row and the lower bound otherwise
+        basis = highspy.HighsBasis()
+        basis.col_status = [columns[s] for s in vbasis.tolist()]
+        basis.row_status = [status.kBasic if s == BASIC else (status.kUpper if sense == LESS_EQUAL else status.kLower) for s, sense in zip(cbasis.tolist(), self.row_senses)]
+        basis.valid = True
+        self.h.setBasis(basis)
+
+    def setStart(self, variables, values):
+        self.h.setSolution(len(variables), np.asarray(variables, dtype=np.int32), np.asarray(values, dtype=float))
+
+    def diagnose(self, filename=None):
+        # The default strategy only finds trivially infeasible rows/bounds, so the deletion filter is asked for
+        self.h.setOptionValue("iis_strategy", int(highspy.IisStrategy.kIisStrategyIrreducible))
+        _, iis = self.h.getIis()
+        if filename != None:
+            self.h.writeIisModel(filename)
+        names = [self.row_names[r] for r in iis.row_index_]
+        names += [self.variable_names[c] + " bounds" for c in iis.col_index_]
+        return names
+
+    def write(self, filename):
+        self.h.writeModel(filename)
+
+backends = {"gurobi": gurobi_backend, "highs": highs_backend}
+
+def makeBackend(backend, name, verbose=True, threaded=False):
+    # Returns a new solver_backend called name from the name of a backend ("gurobi" or "highs"), or backend itself if it
+    # is already a solver_backend. If threaded, the model can be solved alongside others in different threads (a Gurobi
+    # model gets its own environment).
+    if isinstance(backend, solver_backend):
+        return backend
+    if backend not in backends:
+        raise ValueError("backend must be one of {}".format(", ".join(backends)))
+    if threaded and backend == "gurobi":
+        env = gp.Env(empty=True)
+        env.setParam("OutputFlag", int(verbose))
+        env.start()
+        return gurobi_backend(name, verbose, env)
+    return backends[backend](name, verbose)
@@ -0,0 +1,89 @@
+import numpy as np
+
+class stabiliser(object):
+    ## Dual stabilisation for column generation. Each round the master's duals (the "out" point) are pulled towards a
+    ## stability centre (the "in" point, the duals with the best Lagrangian bound so far) and services are priced at the
+    ## resulting separation point instead, which damps the swings of the master duals between iterations. The centre
+    ## moves to the separation point whenever that improves the Lagrangian bound. If pricing at the separation point
+    ## finds no column with negative reduced cost at the master's duals (a mis-pricing) the separation point is moved
+    ## towards the master's duals and pricing repeated, until it reaches them and pricing is exact.
+    ## This class is no stabilisation: the separation point is the master's duals and only the best bound is kept.
+    def __init__(self):
+        self.centre = None
+        self.bound = -np.inf
+        self.mispricings = 0
+
+    def separationPoint(self, pi):
+        # Duals (an array over the master's rows) to price at, given the master's duals pi
+        if self.centre is None or len(self.centre) != len(pi):
+            # No centre yet, or rows were added since (e.g. new links) so the centre and its bound no longer match
+            self.centre, self.bound = None, -np.inf
+            return pi
+        return self.separate(pi)
+
+    def separate(self, pi):
+        return pi
+
+    def update(self, point, bound):
+        # Moves the centre to point if its Lagrangian bound is the best so far. Returns True if it moved.
+        if bound > self.bound:
+            self.centre, self.bound = np.array(point, dtype=float), bound
+            return True
+        return False
+
+    def exact(self, pi, point):
+        # Whether point is the master's duals pi, so that pricing there is exact
+        return self.centre is None or np.array_equal(pi, point)
+
+    def misprice(self):
+        # Moves the next separation point towards the master's duals after a mis-pricing
+        self.mispricings += 1
+
+    def priced(self):
+        # Resets the mis-pricing count after pricing found columns
+        self.mispricings = 0
+
+class wentges(stabiliser):
+    ## Wentges smoothing: the separation point is alpha * centre + (1 - alpha) * master duals. After k mis-pricings in
+    ## a row alpha is reduced to max(0, 1 - (k + 1) * (1 - alpha)), so pricing is exact after at most 1 / (1 - alpha).
+        # \param alpha  Weight of the centre, in [0, 1)
+    def __init__(self, alpha=0.8):
+        stabiliser.__init__(self)
+        if not 0 <= alpha < 1:
+            raise ValueError("alpha must be in [0, 1)")
+        self.alpha = alpha
+
+    def weight(self):
+        return max(0.0, 1 - (self.mispricings + 1) * (1 - self.alpha))
+
+    def separate(self, pi):
+        alpha = self.weight()
+        return alpha * self.centre + (1 - alpha) * pi
+
+class boxstep(stabiliser):
+    ## Boxstep: the separation point is the master's duals clipped to a box of half width delta (relative to the
+    ## largest centre dual) around the centre, penalising any move further than that from the centre. The box
+    ## doubles with every mis-pricing in a row until it contains the master's duals.
+        # \param delta  Half width of the box as a fraction of the largest absolute dual at the centre
+    def __init__(self, delta=0.1):
+        stabiliser.__init__(self)
+        if delta <= 0:
+            raise ValueError("delta must be positive")
+        self.delta = delta
+
+    def separate(self, pi):
+        width = self.delta * (2 ** self.mispricings) * max(1.0, np.abs(self.centre).max())
+        # Clipping keeps the sign of every dual as both the centre and pi have the signs of an optimal dual
+        return np.clip(pi, self.centre - width, self.centre + width)
+
+def makeStabiliser(stabilisation):
+    # stabiliser from None (no stabilisation), "wentges", "boxstep" or a stabiliser
+    if stabilisation == None:
+        return stabiliser()
+    if isinstance(stabilisation, stabiliser):
+        return stabilisation
+    if stabilisation == "wentges":
+        return wentges()
+    if stabilisation == "boxstep":
+        return boxstep()
+    raise ValueError("stabilisation must be 'wentges', 'boxstep' or a stabiliser")
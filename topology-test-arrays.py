@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from topology_class import topology_arrays
+
+def checkArrays(problem):
+    # The cached arrays of the topology hold the same values as its locations and links (and as arrays built afresh)
+    arrays = problem.getArrays()
+    locations = problem.locations
+    nodes = problem.getNodes()
+    assert [locations[i] for i in arrays.link_source] == [l.source for l in problem.links]
+    assert [locations[i] for i in arrays.link_sink] == [l.sink for l in problem.links]
+    assert arrays.two_way.tolist() == [l.two_way for l in problem.links]
+    assert arrays.failed.tolist() == [l.failed for l in problem.links]
+    assert arrays.bandwidth.tolist() == [l.bandwidth for l in problem.links]
+    assert arrays.latency.tolist() == [l.latency for l in problem.links]
+    assert arrays.availableBandwidth().tolist() == [0 if l.failed else l.bandwidth for l in problem.links]
+    assert [locations[i] for i in arrays.nodes] == nodes
+    assert arrays.node_cost.tolist() == [n.cost for n in nodes]
+    for n, node in enumerate(nodes):
+        assert dict((r, arrays.capacity[n, arrays.resource_index[r]]) for r in node.resources) == node.resources
+    fresh = topology_arrays(problem)
+    for name in ("link_source", "link_sink", "two_way", "failed", "bandwidth", "latency", "nodes", "capacity", "has_resource", "node_cost"):
+        assert np.array_equal(getattr(arrays, name), getattr(fresh, name), equal_nan=getattr(fresh, name).dtype.kind == "f"), name
+    return arrays
+
+def main():
+    # The arrays stay in sync with the topology through every way it can be changed, in place until a link is added
+    problem = fatTree(4, seed=1, resources={"cpu": (1, 4), "ram": [4, 8]}, cost=(1, 10))
+    arrays = checkArrays(problem)
+    problem.updateLink(3, bandwidth=1.5, latency=7)
+    problem.links[4].setBandwidth(2.5)
+    problem.links[5].setLatency(3)
+    problem.removeLink(6)
+    problem.removeLink(7)
+    problem.restoreLink(7)
+    problem.updateResources(problem.getNodes()[2], {"cpu": 0.5})
+    assert checkArrays(problem) is arrays
+    assert arrays.bandwidth[3] == 1.5 and arrays.latency[5] == 3 and arrays.failed[6] and not arrays.failed[7]
+    try:
+        problem.updateResources(problem.getNodes()[2], {"gpu": 1})
+    except ValueError:
+        pass
+    else:
+        assert False, "unknown resource accepted"
+    assert checkArrays(problem) is arrays
+    nodes = problem.getNodes()
+    problem.addLink(nodes[0], nodes[1], {"bandwidth": 4, "latency": 2})
+    assert checkArrays(problem) is not arrays and len(problem.getArrays().bandwidth) == len(problem.links)
+
+    # Locations and links have no per instance dictionary
+    assert not hasattr(problem.locations[0], "__dict__") and not hasattr(problem.links[0], "__dict__")
+    print("arrays OK")
+
+if __name__ == "__main__":
+    main()
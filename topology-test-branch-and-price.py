@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import networkx as nx
+from topology_generator import fabric
+from service_class import component, service
+from pricing import shortest_path_pricer
+from master_problem import master_problem
+from branch_and_price import branch_and_price
+
+def makeProblem(seed, layered=False):
+    # A small leaf-spine fabric with two services whose random requirements leave the LP relaxation fractional
+    problem = fabric(0, 1, 2, 2, seed=seed, resources={"cpu": 3.0, "ram": 3.0}, cost=(1, 10))
+    rng = np.random.default_rng(seed)
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": float(rng.integers(1, 3)), "ram": float(rng.integers(1, 3))},
+                                                          int(rng.integers(1, 3))) for i in range(2)], float(rng.uniform(1, 4)), 10)
+                for k in range(2)]
+    for s in services:
+        if layered == True:
+            s.addLayeredGraph(problem)
+        else:
+            s.addGraph(problem)
+    return problem, services
+
+def fullMIP(seed, backend):
+    # Objective of the master problem solved as a MIP over every simple path of every service graph
+    problem, services = makeProblem(seed)
+    for s in services:
+        pricer = shortest_path_pricer(problem, s)
+        graph = nx.DiGraph()
+        arcs = {}
+        for a, (tail, head) in enumerate(zip(pricer.tails.tolist(), pricer.heads.tolist())):
+            graph.add_edge(tail, head)
+            arcs[(tail, head)] = a
+        for path in nx.all_simple_paths(graph, pricer.start, pricer.end):
+            s.graphs[problem.name].addPath(pricer.makePath([arcs[arc] for arc in zip(path[:-1], path[1:])]))
+    master = master_problem(problem, services, relax=False, artificial_cost=10000, verbose=False, backend=backend)
+    master.solve()
+    return master.getObjective()
+
+def close(a, b, tolerance=1e-4):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def main():
+    # Branch and price finds the optimum of the MIP over every path whichever backend solves the masters, whether the
+    # service graphs are copied or layered and however many workers search the tree
+    branched = False
+    for seed in (1, 3):
+        optimum = fullMIP(seed, "highs")
+        assert close(optimum, fullMIP(seed, "gurobi"))
+        for backend in ("gurobi", "highs"):
+            for layered in (False, True):
+                for workers in (1, 3):
+                    problem, services = makeProblem(seed, layered)
+                    search = branch_and_price(problem, services, workers=workers, backend=backend).solve()
+                    assert search.status in ("optimal", "gap"), search.status
+                    assert close(search.objective, optimum), (seed, backend, layered, workers, search.objective, optimum)
+                    assert search.bound <= search.objective + 1e-6
+                    # The incumbent's placement meets every replica count
+                    for s in services:
+                        for c in s.components:
+                            assert len(search.placement[c.description]) == c.replica_count
+                    branched = branched or search.nodes_solved > 1
+    assert branched, "no search branched"
+    print("branch and price OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem(layered=False):
+    # A 4-ary fat tree with two services of two components each, their graphs copied or layered
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        if layered == True:
+            s.addLayeredGraph(problem)
+        else:
+            s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def checkBackends():
+    # Column generation converges to the same LP objective whichever backend solves the master and whether the service
+    # graphs are copied or layered
+    objectives = {}
+    for backend in ("gurobi", "highs"):
+        for layered in (False, True):
+            problem, services = makeProblem(layered)
+            master, history = solveColumnGeneration(problem, services, backend=backend)
+            assert history[-1]["status"] == "optimal", (backend, layered, history[-1]["status"])
+            assert history[-1]["min_reduced_cost"] >= -1e-6
+            assert history[-1]["columns_added"] == 0 and history[-1]["duplicates"] == 0
+            objectives[(backend, layered)] = history[-1]["objective"]
+    lp = objectives[("gurobi", False)]
+    assert all(close(lp, objective) for objective in objectives.values()), objectives
+    return lp
+
+def checkStalled():
+    # With a negative tolerance the paths priced are already in the master, which is "stalled" and not "optimal"
+    problem, services = makeProblem()
+    master, history = solveColumnGeneration(problem, services, backend="highs", tolerance=-1e-3)
+    assert history[-1]["status"] == "stalled", history[-1]["status"]
+    assert history[-1]["columns_added"] == 0 and history[-1]["duplicates"] > 0
+
+def checkMIPPricing(lp):
+    # Pricing with the pricing MIP reaches the same LP objective as shortest path pricing and leaves the costs of the
+    # service graph links as they were
+    problem, services = makeProblem()
+    costs = [[l.cost for l in s.graphs[problem.name].links] for s in services]
+    master, history = solveColumnGeneration(problem, services, backend="highs", pricing="mip")
+    assert history[-1]["status"] == "optimal" and close(history[-1]["objective"], lp)
+    assert [[l.cost for l in s.graphs[problem.name].links] for s in services] == costs
+
+def main():
+    lp = checkBackends()
+    checkStalled()
+    checkMIPPricing(lp)
+    print("column generation OK, LP objective {}".format(lp))
+
+if __name__ == "__main__":
+    main()
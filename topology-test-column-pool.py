@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+from pricing import makePricer
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def checkPool(lp):
+    # Evicting unused columns still converges to the same LP objective, and a path already in the pool is not stored twice
+    problem, services = makeProblem()
+    master, history = solveColumnGeneration(problem, services, backend="highs", max_columns=2, max_age=1)
+    assert history[-1]["status"] == "optimal" and close(history[-1]["objective"], lp)
+    stats = history[-1]["pool"]
+    assert stats["evictions"] > 0 and stats["active"] < stats["columns"], stats
+    graph = services[0].graphs[problem.name]
+    paths = len(graph.getPaths())
+    column, new = graph.addPath(graph.getPaths()[0])
+    assert column == 0 and new == False and len(graph.getPaths()) == paths
+    # The path column generation was seeded with, priced again
+    pricer = makePricer(problem, services[0])
+    links_i, _ = pricer.shortestPath(pricer.initialCosts())
+    column, new = graph.addPath(pricer.makePath(links_i))
+    assert column == 0 and new == False and len(graph.getPaths()) == paths
+
+def main():
+    problem, services = makeProblem()
+    _, history = solveColumnGeneration(problem, services, backend="highs")
+    lp = history[-1]["objective"]
+    checkPool(lp)
+    print("column pool OK")
+
+if __name__ == "__main__":
+    main()
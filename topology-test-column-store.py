@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service, pathColumns
+from column_store import column_store
+from column_generation import solveColumnGeneration
+
+def checkStore():
+    # Columns read back from a hand built store, and its matrices, match what was added (including links traversed more
+    # than once, paths with no links and matrices of the columns from start onwards)
+    store = column_store(4, 2, 3)
+    columns = [([0, 2], [1, 2], [0, 1], [2, 0]), ([], [], [0, 1], [1, 1]), ([1, 2, 3], [1, 1, 3], [0, 1], [0, 2])]
+    for k, columns_k in enumerate(columns):
+        assert store.addColumn(*columns_k) == k
+    assert len(store) == len(columns)
+    links, assignments = store.linkMatrix().toarray(), store.assignmentMatrix().toarray()
+    assert links.shape == (4, 3) and assignments.shape == (6, 3)
+    for k, (link_indices, link_counts, components, nodes) in enumerate(columns):
+        assert store.getLinks(k)[0].tolist() == link_indices and store.getLinks(k)[1].tolist() == link_counts
+        assert store.getAssignments(k)[0].tolist() == components and store.getAssignments(k)[1].tolist() == nodes
+        expected = np.zeros(4)
+        expected[link_indices] = link_counts
+        assert (links[:, k] == expected).all()
+        expected = np.zeros(6)
+        expected[np.array(components, dtype=int) * 3 + np.array(nodes, dtype=int)] = 1
+        assert (assignments[:, k] == expected).all()
+    assert (store.linkMatrix(1).toarray() == links[:, 1:]).all()
+    assert (store.assignmentMatrix(2).toarray() == assignments[:, 2:]).all()
+    # Views taken before the store grows are unchanged by it
+    before = store.getLinks(2)[1]
+    store.addColumn([3], [5], [0, 1], [0, 0])
+    assert before.tolist() == [1, 1, 3] and store.getLinks(3)[1].tolist() == [5]
+
+def checkPaths():
+    # The columns of the paths found by column generation match the links they use in the service graph
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": 1, "ram": 1}, 2) for c in range(2)], 2, 10) for s in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    master, history = solveColumnGeneration(problem, services, verbose=False)
+    assert history[-1]["status"] == "optimal"
+    for s in services:
+        graph = s.graphs[problem.name]
+        links = graph.store.linkMatrix().toarray()
+        assert len(graph.store) == len(graph.getPaths())
+        for k, path in enumerate(graph.getPaths()):
+            assert path.store is graph.store and path.column == k
+            expected = pathColumns(path.links)
+            columns = path.getColumns()
+            assert all(list(a) == list(b) for a, b in zip(columns, expected))
+            assert (links[:, k] == [count for _, count in path.times_traversed]).all()
+            assert sorted(columns[2]) == list(range(len(s.components)))
+
+def main():
+    checkStore()
+    checkPaths()
+    print("column store OK")
+
+if __name__ == "__main__":
+    main()
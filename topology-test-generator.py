@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree, fabric
+
+def describe(problem):
+    # Everything the generator makes, in order, so that two topologies can be compared
+    locations = [(l.description, l.type, l.resources, l.cost) if l.type == "node" else (l.description, l.type) for l in problem.locations]
+    links = [(l.source.description, l.sink.description, l.bandwidth, l.latency, l.two_way) for l in problem.links]
+    return locations, links
+
+def reachable(problem):
+    # Descriptions of the locations reachable from the gateway (two way links can be used either way)
+    successors = {}
+    for l in problem.links:
+        successors.setdefault(l.source.description, []).append(l.sink.description)
+        if l.two_way:
+            successors.setdefault(l.sink.description, []).append(l.source.description)
+    seen, stack = {"Gateway"}, ["Gateway"]
+    while stack:
+        for sink in successors.get(stack.pop(), []):
+            if sink not in seen:
+                seen.add(sink)
+                stack.append(sink)
+    return seen
+
+def checkSeed():
+    # The same seed gives the same topology, a different seed a different one, and sampled parameters are within their
+    # ranges (or taken from their lists)
+    parameters = dict(bandwidths={"spine": (2, 8)}, latencies={"leaf": [1, 2, 3]}, resources={"cpu": (1, 4), "ram": [4, 8]}, cost=(1, 10))
+    first, second, other = fatTree(4, seed=3, **parameters), fatTree(4, seed=3, **parameters), fatTree(4, seed=4, **parameters)
+    assert describe(first) == describe(second)
+    assert describe(first) != describe(other)
+    assert describe(fabric(1, 2, 4, 2, seed=3, **parameters)) == describe(fabric(1, 2, 4, 2, seed=3, **parameters))
+    for n in first.getNodes():
+        assert 1 <= n.resources["cpu"] < 4 and n.resources["ram"] in (4, 8) and 1 <= n.cost < 10
+    for l in first.links:
+        if l.source.type == "spine":
+            assert 2 <= l.bandwidth < 8
+        if l.source.type == "leaf":
+            assert l.latency in (1, 2, 3)
+        if l.source.type == "gateway":
+            assert l.bandwidth == 10 and l.latency == 1
+    # Without parameters every node has the defaults
+    assert all(n.resources == {"cpu": 4, "ram": 8} and n.cost == 1 for n in fatTree(2).getNodes())
+
+def checkFatTree():
+    # A k-ary fat tree has (k/2)^2 core switches, k^2/2 aggregation and edge switches and k^3/4 nodes, every core switch
+    # reaches one aggregation switch in every pod and every location is reachable from the gateway
+    for k in (2, 4, 6):
+        half = k // 2
+        problem = fatTree(k, seed=1)
+        assert [len(problem.getLocationsByType(type)) for type in ("gateway", "super_spine", "spine", "leaf", "node")] == [1, half * half, k * half, k * half, k ** 3 // 4]
+        assert len(problem.links) == half * half + half * half * k + k * half * half + k ** 3 // 4 + k * (half // 2)
+        for core in problem.getLocationsByType("super_spine"):
+            pods = [l.sink.description.split("_")[0] for l in problem.links if l.source is core]
+            assert sorted(pods) == sorted(set(pods)) and len(pods) == k
+        assert all(l.source.description.split("_")[0] == l.sink.description.split("_")[0] for l in problem.links if l.two_way)
+        assert reachable(problem) == set(l.description for l in problem.locations)
+    assert not any(l.two_way for l in fatTree(4, leaf_links=False).links)
+    for k in (0, 3):
+        try:
+            fatTree(k)
+        except ValueError:
+            pass
+        else:
+            assert False, "fat tree made with k = {}".format(k)
+
+def checkFabric():
+    # A fabric has the links given by its layer sizes, with the gateway joined to the spines if there are no super spines
+    for n_super_spines, n_spines, n_leafs, nodes_per_leaf in ((2, 3, 4, 2), (0, 2, 3, 3)):
+        problem = fabric(n_super_spines, n_spines, n_leafs, nodes_per_leaf, seed=1)
+        assert len(problem.getNodes()) == n_leafs * nodes_per_leaf
+        assert len(problem.links) == (n_super_spines or n_spines) + n_super_spines * n_spines + n_spines * n_leafs + n_leafs * nodes_per_leaf + n_leafs // 2
+        assert reachable(problem) == set(l.description for l in problem.locations)
+
+def main():
+    checkSeed()
+    checkFatTree()
+    checkFabric()
+    print("generator OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from master_problem import master_problem
+from column_generation import solveColumnGeneration
+from heuristic import greedyPlacement, applyStart
+from solver_backend import OPTIMAL
+
+def makeProblem(cpu=1):
+    # A 4-ary fat tree with two services of two components each (each component needing cpu)
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": cpu, "ram": 1}, 2) for c in range(2)], 2, 10) for s in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def checkFeasible():
+    # The greedy placement puts every replica on a node with room for it, routes every service's throughput within the
+    # link bandwidths through placed replicas only and costs what the nodes it uses cost. Given as a start, the MIP of a
+    # master problem built afterwards is no worse than it.
+    problem, services = makeProblem()
+    nodes = problem.getNodes()
+    solution = greedyPlacement(problem, services)
+    assert solution.feasible
+    used = {}
+    for s in services:
+        for c in s.components:
+            placed = solution.placement[c.description]
+            assert len(placed) == len(set(placed)) == c.replica_count
+            for node in placed:
+                used.setdefault(node, []).append(c)
+    for n in nodes:
+        for resource, capacity in n.resources.items():
+            assert sum(c.requirements.get(resource, 0) for c in used.get(n.description, [])) <= capacity
+    assert np.isclose(solution.cost, sum(n.cost * len(used.get(n.description, [])) for n in nodes))
+    usage = np.zeros(len(problem.links))
+    for s in services:
+        flows = solution.flows[s.description]
+        assert np.isclose(sum(flows.values()), s.required_throughput) and solution.unmet[s.description] == 0
+        for column, flow in flows.items():
+            link_indices, link_counts, components, path_nodes = s.graphs[problem.name].getPaths()[column].getColumns()
+            usage[list(link_indices)] += flow * np.asarray(link_counts)
+            for c, n in zip(components, path_nodes):
+                assert nodes[n].description in solution.placement[s.components[c].description]
+    assert (usage <= np.array([l.bandwidth for l in problem.links]) + 1e-9).all()
+
+    master = master_problem(problem, services, relax=False, artificial_cost=10000, verbose=False)
+    applyStart(master, solution)
+    assert master.solve() == OPTIMAL
+    assert master.getObjective() <= solution.cost + 1e-6
+    assert all(a < 1e-9 for a in master.getResult().artificialFlows().values())
+
+def checkInfeasible():
+    # Components that fit on no node are not placed and their service's throughput is reported as unmet
+    problem, services = makeProblem(cpu=100)
+    solution = greedyPlacement(problem, services)
+    assert not solution.feasible
+    assert all(solution.placement[c.description] == [] for s in services for c in s.components)
+    assert solution.unmet == dict((s.description, s.required_throughput) for s in services)
+
+def checkColumnGeneration():
+    # Seeding column generation with the heuristic gives the same LP as starting from the shortest paths
+    objectives = []
+    for heuristic in (False, True):
+        problem, services = makeProblem()
+        master, history = solveColumnGeneration(problem, services, heuristic=heuristic, verbose=False)
+        assert history[-1]["status"] == "optimal"
+        master.setRelaxed(True)
+        assert master.solve() == OPTIMAL
+        objectives.append(master.getObjective())
+    assert np.isclose(objectives[0], objectives[1])
+
+def main():
+    checkFeasible()
+    checkInfeasible()
+    checkColumnGeneration()
+    print("heuristic OK")
+
+if __name__ == "__main__":
+    main()
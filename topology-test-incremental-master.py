@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service, service_path
+from master_problem import master_problem
+from column_generation import solveColumnGeneration
+from solver_backend import OPTIMAL
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": 1, "ram": 1}, 2) for c in range(2)], 2, 10) for s in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def main():
+    # A master problem kept alive while paths are added one at a time and re-solved ends at the same LP as the column
+    # generation run that found the paths and as a master problem built afresh over all of them. The LP objective never
+    # increases as paths are added and switching to the MIP and back gives the LP again.
+    for backend in ("gurobi", "highs"):
+        problem, services = makeProblem()
+        solved, history = solveColumnGeneration(problem, services, backend=backend, verbose=False)
+        assert history[-1]["status"] == "optimal"
+        solved.setRelaxed(True)
+        assert solved.solve() == OPTIMAL
+        lp = solved.getObjective()
+
+        fresh = master_problem(problem, services, relax=True, artificial_cost=solved.artificial_cost, verbose=False, backend=backend)
+        assert fresh.solve() == OPTIMAL
+        assert abs(fresh.getObjective() - lp) <= 1e-6 * max(1.0, abs(lp))
+
+        copy, copy_services = makeProblem()
+        master = master_problem(copy, copy_services, relax=True, artificial_cost=solved.artificial_cost, verbose=False, backend=backend)
+        assert master.solve() == OPTIMAL
+        objective = master.getObjective()
+        for s, copy_service in zip(services, copy_services):
+            for path in s.graphs[problem.name].getPaths():
+                copied = service_path(path.name, [], [], path.getColumns(), copy, copy_service)
+                column, added = copy_service.graphs[copy.name].addPath(copied)
+                assert added
+                master.addPath(copy_service, copied)
+                assert master.solve() == OPTIMAL
+                assert master.getObjective() <= objective + 1e-6 * max(1.0, abs(objective))
+                objective = master.getObjective()
+        assert master.solver.numVariables() == fresh.solver.numVariables()
+        assert abs(objective - lp) <= 1e-6 * max(1.0, abs(lp))
+
+        master.setRelaxed(False)
+        assert master.solve() == OPTIMAL
+        assert master.getObjective() >= lp - 1e-6 * max(1.0, abs(lp))
+        master.setRelaxed(True)
+        assert master.solve() == OPTIMAL
+        assert abs(master.getObjective() - lp) <= 1e-6 * max(1.0, abs(lp))
+    print("incremental master OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+import topology_io
+
+def main():
+    # Round trip JSON -> npz -> JSON of a fat tree with services, checking nothing is lost on the way
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    problem.updateLink(0, bandwidth=2.5)
+    problem.links[1].setLinkCost(3.0)
+    services = [service("service1", [component("component1", {"cpu": 1, "ram": 2}, 2)], 1, 10),
+                service("service2", [component("component2", {"cpu": 2}, 1), component("component3", {"ram": 1}, 1)], 2.5, 8)]
+    directory = tempfile.mkdtemp()
+    first, binary, second = [os.path.join(directory, name) for name in ("first.json", "topology.npz", "second.json")]
+
+    topology_io.writeJSON(first, problem, services)
+    from_json = topology_io.readJSON(first)
+    topology_io.writeBinary(binary, *from_json)
+    for mmap in (True, False):
+        from_binary = topology_io.readBinary(binary, mmap)
+        assert topology_io.compare((problem, services), from_binary) == [], "npz round trip (mmap={})".format(mmap)
+    topology_io.writeJSON(second, *topology_io.readBinary(binary))
+    assert topology_io.compare((problem, services), topology_io.readJSON(second)) == [], "JSON -> npz -> JSON round trip"
+    with open(first) as f, open(second) as g:
+        assert f.read() == g.read(), "JSON written after the round trip differs"
+    assert topology_io.checkRoundTrip(problem, services, directory) == []
+
+    # The arrays read straight from the npz match those made from the topology
+    arrays, name, descriptions = topology_io.readArrays(binary)
+    expected = problem.getArrays()
+    assert name == problem.name and descriptions.tolist() == [l.description for l in problem.locations]
+    assert arrays.resources == expected.resources
+    for key in ("link_source", "link_sink", "two_way", "failed", "bandwidth", "latency", "link_cost", "nodes", "capacity", "has_resource", "node_cost"):
+        assert np.array_equal(np.asarray(getattr(arrays, key)), getattr(expected, key), equal_nan=True), key
+    print("topology_io round trip OK")
+
+if __name__ == "__main__":
+    main()
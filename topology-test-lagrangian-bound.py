@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def checkBounds(lp):
+    # The Lagrangian bounds never pass the LP optimum and reach it when column generation converges (with or without
+    # stabilisation), and stopping on a gap leaves the master objective within it of both
+    for stabilisation in (None, "wentges", "boxstep"):
+        problem, services = makeProblem()
+        _, history = solveColumnGeneration(problem, services, backend="highs", stabilisation=stabilisation)
+        bounds = [h["lagrangian_bound"] for h in history]
+        assert all(b <= lp + 1e-6 for b in bounds) and bounds == sorted(bounds), (stabilisation, bounds)
+        assert history[-1]["status"] == "optimal" and close(bounds[-1], lp) and close(history[-1]["objective"], lp), stabilisation
+    problem, services = makeProblem()
+    _, history = solveColumnGeneration(problem, services, backend="highs", gap=0.05)
+    assert history[-1]["status"] == "gap" and history[-1]["gap"] <= 0.05
+    assert history[-1]["lagrangian_bound"] <= lp + 1e-6 and history[-1]["objective"] >= lp - 1e-6
+    assert history[-1]["objective"] - history[-1]["lagrangian_bound"] <= 0.05 * max(1.0, history[-1]["objective"])
+
+def checkNothingPriced():
+    # A run that prices nothing still returns its status: with no iterations, and with a master that is unbounded as
+    # its artificial flows have negative cost
+    for options, status in (({"max_iterations": 0}, "iteration_limit"), ({"artificial_cost": -1}, "master_not_optimal")):
+        problem, services = makeProblem()
+        _, history = solveColumnGeneration(problem, services, backend="highs", **options)
+        assert len(history) == 1 and history[-1]["status"] == status and history[-1]["objective"] is None, history
+
+def main():
+    problem, services = makeProblem()
+    _, history = solveColumnGeneration(problem, services, backend="highs")
+    lp = history[-1]["objective"]
+    checkBounds(lp)
+    checkNothingPriced()
+    print("Lagrangian bounds OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem(budget):
+    # A 4-ary fat tree with two services of two components each and the given latency budget, their graphs layered
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, budget)
+                for k in range(2)]
+    for s in services:
+        s.addLayeredGraph(problem)
+    return problem, services
+
+def pathLatency(problem, path):
+    link_indices, link_counts, _, _ = path.getColumns()
+    return sum(problem.links[i].latency * n for i, n in zip(link_indices, link_counts))
+
+def main():
+    # Every path priced is within the latency budget, and a search cut short by max_labels is reported "inexact"
+    # rather than "optimal" as the pricers never proved that no path has negative reduced cost
+    problem, services = makeProblem(8)
+    master, history = solveColumnGeneration(problem, services, backend="highs", pricing="latency")
+    assert history[-1]["status"] == "optimal" and all(h["exact"] for h in history)
+    lp = history[-1]["objective"]
+    for s in services:
+        for path in s.graphs[problem.name].getPaths():
+            assert pathLatency(problem, path) <= s.required_latency + 1e-9
+
+    problem, services = makeProblem(8)
+    master, history = solveColumnGeneration(problem, services, backend="highs", pricing="latency", max_labels=1)
+    assert history[-1]["status"] == "inexact", history[-1]["status"]
+    assert history[-1]["exact"] == False and history[-1]["columns_added"] == 0
+    assert history[-1]["objective"] >= lp - 1e-6
+    print("latency pricing OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from topology_class import location, link, topology
+from service_class import component, service
+from pricing import shortest_path_pricer, layered_pricer, makePricer
+
+def makeProblem():
+    # A 4-ary fat tree with the same three component service held once as a copied service graph and once as a layered
+    # graph (the two service objects share their description and components so that they have the same duals)
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    components = [component("component{}".format(i), {"cpu": 1, "ram": 1}, 2) for i in range(3)]
+    copied, layered = service("service0", components, 2, 10), service("service0", components, 2, 10)
+    copied.addGraph(problem)
+    layered.addLayeredGraph(problem)
+    return problem, copied, layered
+
+def randomDuals(rng, problem, _service):
+    # Duals in the form of master_problem.getDuals with the signs of an optimal dual
+    nodes = problem.getNodes()
+    return {"throughput": {_service.description: 10.0},
+            "bandwidth": -rng.uniform(0, 5, len(problem.links)),
+            "assignmentflow": dict(((_service.description, c.description, n.description), -rng.uniform(0, 5)) for c in _service.components for n in nodes)}
+
+def checkPricing():
+    # The layered pricer finds paths as cheap as Dijkstra over the copied service graph at the same duals, before and
+    # after a link fails, and the columns of its paths cost what it says they do
+    problem, copied, layered = makeProblem()
+    nodes = problem.getNodes()
+    assert isinstance(makePricer(problem, layered), layered_pricer) and isinstance(makePricer(problem, copied), shortest_path_pricer)
+    rng = np.random.default_rng(2)
+    for failed in (None, 0):
+        if failed != None:
+            problem.removeLink(failed)
+        pricers = [shortest_path_pricer(problem, copied), layered_pricer(problem, layered)]
+        for _ in range(5):
+            duals = randomDuals(rng, problem, copied)
+            costs = []
+            for pricer in pricers:
+                path, cost = pricer.shortestPath(pricer.linkCosts(duals))
+                link_indices, link_counts, components, path_nodes = pricer.makePath(path).getColumns()
+                assert list(components) == list(range(len(layered.components)))
+                assert failed == None or failed not in list(link_indices)
+                column_cost = -float(np.dot(np.asarray(duals["bandwidth"])[list(link_indices)], link_counts))
+                column_cost -= sum(duals["assignmentflow"][("service0", layered.components[c].description, nodes[n].description)] for c, n in zip(components, path_nodes))
+                assert np.isclose(column_cost, cost)
+                costs.append(cost)
+            assert np.isclose(costs[0], costs[1])
+
+def checkGateway():
+    # Service graphs can only be made from a topology with exactly one gateway
+    for n_gateways in (0, 2):
+        gateways = [location("Gateway{}".format(i), "gateway") for i in range(n_gateways)]
+        node = location("Node", "node", resources={"cpu": 4, "ram": 8}, cost=1)
+        problem = topology("gateways_{}".format(n_gateways), gateways + [node], [link(g, node, {"bandwidth": 5, "latency": 1}) for g in gateways])
+        for add in ("addGraph", "addLayeredGraph"):
+            _service = service("service0", [component("component0", {"cpu": 1}, 1)], 1, 10)
+            try:
+                getattr(_service, add)(problem)
+            except ValueError:
+                pass
+            else:
+                assert False, "{} made a graph with {} gateways".format(add, n_gateways)
+
+def main():
+    checkPricing()
+    checkGateway()
+    print("layered graph OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each, one component shared by both
+    problem = fatTree(4, seed=1, resources={"cpu": 2.0, "ram": 4.0}, cost=(1, 10))
+    shared = component("shared", {"cpu": 1, "ram": 2}, 2)
+    services = [service("service0", [component("component0", {"cpu": 1}, 2), shared], 2, 10),
+                service("service1", [shared, component("component1", {"ram": 1}, 1)], 3, 10)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def checkSolution(problem, services, master, tolerance=1e-6):
+    # Checks the solution of master against every constraint of the master problem, worked out from the paths and the
+    # topology rather than from the model's matrices
+    result = master.getResult()
+    nodes = problem.getNodes()
+    y = result.values("y").reshape(len(master.components), len(nodes))
+    artificial = result.artificialFlows()
+    usage = np.zeros(len(problem.links))
+    objective = float(np.dot(np.tile([n.cost for n in nodes], len(master.components)), y.ravel()))
+    for s in services:
+        flows = result.flows(s)
+        assert (flows >= -tolerance).all()
+        assert flows.sum() + artificial[s.description] >= s.required_throughput - tolerance
+        objective += master.artificial_cost * artificial[s.description]
+        through = np.zeros(y.shape)
+        for path, flow in zip(s.graphs[problem.name].getPaths(), flows):
+            link_indices, link_counts, components, path_nodes = path.getColumns()
+            usage[list(link_indices)] += np.asarray(link_counts) * flow
+            for c, n in zip(components, path_nodes):
+                through[master.component_index[s.components[c].description], n] += flow
+        assert (through <= s.required_throughput * y + tolerance).all()
+    assert (usage <= np.array([l.bandwidth for l in problem.links]) + tolerance).all()
+    for c, _component in enumerate(master.components):
+        assert abs(y[c].sum() - _component.replica_count) <= tolerance
+    for n, node in enumerate(nodes):
+        for resource, capacity in node.resources.items():
+            assert sum(_component.requirements.get(resource, 0) * y[c, n] for c, _component in enumerate(master.components)) <= capacity + tolerance
+    assert abs(objective - result.objective) <= tolerance * max(1.0, abs(objective))
+
+def main():
+    # The master problem built from sparse blocks holds every constraint of the model, for the LP relaxation and the
+    # MIP, with both backends and a component shared between services
+    for backend in ("gurobi", "highs"):
+        problem, services = makeProblem()
+        master, history = solveColumnGeneration(problem, services, backend=backend)
+        assert history[-1]["status"] == "optimal"
+        checkSolution(problem, services, master)
+        master.setRelaxed(True)
+        master.solve()
+        checkSolution(problem, services, master)
+        # One row per service, link, (service, component, node), component and node resource
+        nodes = problem.getNodes()
+        rows = len(services) + len(problem.links) + sum(len(s.components) for s in services) * len(nodes) + len(master.components) + 2 * len(nodes)
+        assert master.solver.numRows() == rows
+    print("master problem OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import logging
+import tempfile
+import subprocess
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+from metrics import recorder, writeMetrics, setLogLevel, logger
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": 1, "ram": 1}, 2) for c in range(2)], 2, 10) for s in range(2)]
+    return problem, services
+
+def checkRun():
+    # A column generation run records a timer for every phase, counters that agree with its history and the size of the
+    # model, and passes every measurement to the hooks and the JSON-lines file
+    recorder.reset()
+    events = []
+    hook = recorder.addHook(events.append)
+    filename = os.path.join(tempfile.mkdtemp(), "metrics.jsonl")
+    writer = writeMetrics(filename, append=False)
+    problem, services = makeProblem()
+    for s in services:
+        s.addGraph(problem)
+    master, history = solveColumnGeneration(problem, services, verbose=False)
+    recorder.removeHook(hook)
+    recorder.removeHook(writer)
+    writer.close()
+    assert history[-1]["status"] == "optimal"
+
+    summary = recorder.summary()
+    for name in ("graph_build", "model_build", "optimise", "dual_extraction", "column_insertion", "pricing"):
+        assert summary["timers"][name]["calls"] > 0 and summary["timers"][name]["seconds"] >= 0, name
+    assert summary["timers"]["graph_build"]["calls"] == len(services)
+    assert summary["counters"]["iterations"] == len(history)
+    assert summary["counters"]["columns_generated"] == sum(row["columns_added"] for row in history)
+    assert summary["counters"]["solver_work"] > 0
+    assert summary["gauges"]["model_rows"] == master.solver.numRows()
+    assert summary["gauges"]["model_columns"] == master.solver.numVariables()
+
+    lines = [json.loads(line) for line in open(filename)]
+    assert len(lines) == len(events) > 0
+    for line, event in zip(lines, events):
+        assert line["event"] == event["event"] and line["name"] == event["name"]
+        assert event["event"] in ("timer", "counter", "gauge") and "time" in event and "value" in event
+    assert set(event["service"] for event in events if event["name"] == "graph_build") == set(s.description for s in services)
+    assert [event["iteration"] for event in events if event["name"] == "iterations"] == [row["iteration"] for row in history]
+
+    recorder.reset()
+    assert recorder.summary() == {"timers": {}, "counters": {}, "gauges": {}}
+
+def checkQuiet():
+    # Importing the package prints nothing, and only warnings are logged
+    # unless the log level is raised
+    script = "import topology_generator, service_class, column_generation, branch_and_price, scenarios, heuristic"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert output.returncode == 0 and output.stdout == "" and output.stderr == "", output.stdout + output.stderr
+    assert logger.getEffectiveLevel() == logging.WARNING
+    level = logger.level
+    setLogLevel("debug")
+    setLogLevel(logging.INFO)
+    assert logger.level == logging.INFO
+    assert len([h for h in logger.handlers if isinstance(h, logging.StreamHandler)]) == 1
+    logger.setLevel(level)
+
+def main():
+    checkRun()
+    checkQuiet()
+    print("metrics OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def checkParallel():
+    # Pricing in a pool of worker processes finds the same paths as pricing in this process, in the same order
+    problem, services = makeProblem()
+    _, serial = solveColumnGeneration(problem, services, backend="highs")
+    problem, services = makeProblem()
+    _, parallel = solveColumnGeneration(problem, services, backend="highs", workers=2)
+    assert [h["objective"] for h in parallel] == [h["objective"] for h in serial]
+    assert all(h["worker_times"] for h in parallel)
+    assert parallel[-1]["status"] == "optimal"
+
+def main():
+    checkParallel()
+    print("parallel pricing OK")
+
+if __name__ == "__main__":
+    main()
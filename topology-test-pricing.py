@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from pricing import shortest_path_pricer
+from optimisation import pricingProblem
+from column_generation import dualCosts
+
+def makeProblem():
+    # A 4-ary fat tree with a service of two components
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    _service = service("service0", [component("component0_{}".format(i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+    _service.addGraph(problem)
+    return problem, _service
+
+def randomDuals(rng, problem, _service):
+    # Duals in the form of master_problem.getDuals with the signs of an optimal dual
+    nodes = problem.getNodes()
+    return {"throughput": {_service.description: 10.0},
+            "bandwidth": -rng.uniform(0, 5, len(problem.links)),
+            "assignmentflow": dict(((_service.description, c.description, n.description), -rng.uniform(0, 5)) for c in _service.components for n in nodes)}
+
+def main():
+    # Dijkstra over the service graph finds paths as cheap as the pricing MIP at the same link costs, prices the links
+    # at the duals as the MIP pricing does, and never uses a failed link
+    problem, _service = makeProblem()
+    pricer = shortest_path_pricer(problem, _service)
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        duals = randomDuals(rng, problem, _service)
+        costs = pricer.linkCosts(duals)
+        assert np.allclose(costs, dualCosts(problem, _service, duals))
+        costs += rng.uniform(0, 1, len(costs))
+        links_i, cost = pricer.shortestPath(costs)
+        assert np.isclose(costs[links_i].sum(), cost)
+        m, mip_links = pricingProblem(problem, _service, False, "highs", costs)
+        assert np.isclose(cost, m.objective()) and np.isclose(costs[mip_links].sum(), cost)
+        # The path visits every component in order, once
+        assert list(pricer.makePath(links_i).getColumns()[2]) == list(range(len(_service.components)))
+
+    links_i, _ = pricer.shortestPath(pricer.initialCosts())
+    failed = int(pricer.origins[links_i[0]])
+    problem.removeLink(failed)
+    pricer.update()
+    links_i, cost = pricer.shortestPath(pricer.initialCosts())
+    assert links_i and failed not in pricer.origins[links_i].tolist()
+    print("pricing OK")
+
+if __name__ == "__main__":
+    main()
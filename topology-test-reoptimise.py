@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem(layered=False):
+    # A 4-ary fat tree with two services of two components each, their graphs copied or layered
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        if layered == True:
+            s.addLayeredGraph(problem)
+        else:
+            s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def changeTopology(problem, failed, limited, bandwidth, node):
+    # Fails one link, sets the bandwidth of another and takes a cpu from the node
+    problem.removeLink(failed)
+    problem.updateLink(limited, bandwidth=bandwidth)
+    location = problem.getLocationByDescription(node)
+    problem.updateResources(location, {"cpu": location.resources["cpu"] - 1})
+
+def checkReoptimise():
+    # Re-optimising in place after a link failure, a bandwidth change and a capacity change gives the same LP objective
+    # as solving the changed topology from scratch
+    for layered in (False, True):
+        problem, services = makeProblem(layered)
+        master, _ = solveColumnGeneration(problem, services, backend="highs")
+        master.setRelaxed(True)
+        master.solve()
+        # The busiest link fails and the next is left half the flow it carries
+        usage = master.getResult().linkUsage()
+        link, limited = np.argsort(-usage)[:2].tolist()
+        bandwidth = usage[limited] / 2
+        node = sorted(master.getResult().placements().values())[0][0]
+        changeTopology(problem, link, limited, bandwidth, node)
+        master, history = solveColumnGeneration(problem, services, backend="highs", master=master)
+        assert history[-1]["status"] == "optimal"
+        for s in services:
+            for path, flow in master.getResult().pathFlows(s):
+                assert link not in path.getColumns()[0], "flow through a failed link"
+
+        problem, services = makeProblem(layered)
+        changeTopology(problem, link, limited, bandwidth, node)
+        _, cold = solveColumnGeneration(problem, services, backend="highs")
+        assert close(history[-1]["objective"], cold[-1]["objective"]), (layered, history[-1]["objective"], cold[-1]["objective"])
+
+def checkLinkSetters():
+    # Changes made on a link itself (link.setBandwidth, link.setLatency) are recorded like those made through
+    # topology.updateLink, so re-optimising keeps to the new bandwidth
+    problem, services = makeProblem()
+    master, _ = solveColumnGeneration(problem, services, backend="highs")
+    master.setRelaxed(True)
+    master.solve()
+    usage = master.getResult().linkUsage()
+    link = int(np.argmax(usage))
+    problem.links[link].setBandwidth(usage[link] / 2)
+    problem.links[link].setLatency(2.0)
+    assert problem.deltas[-2:] == [("bandwidth", link), ("latency", link)]
+    assert problem.getArrays().bandwidth[link] == usage[link] / 2 and problem.getArrays().latency[link] == 2.0
+    master, history = solveColumnGeneration(problem, services, backend="highs", master=master)
+    assert history[-1]["status"] == "optimal"
+    master.setRelaxed(True)
+    master.solve()
+    assert master.getResult().linkUsage()[link] <= usage[link] / 2 + 1e-6, "bandwidth change missed"
+
+def checkUpdateResources():
+    # Resources can only be changed on nodes of the topology and only those they already have. Nothing is changed if
+    # they cannot.
+    problem, services = makeProblem()
+    problem.getArrays()
+    gateway, node = problem.getLocationByDescription("Gateway"), problem.getNodes()[0]
+    resources = dict(node.resources)
+    for location, change in ((gateway, {"cpu": 1}), (node, {"cpu": 1, "gpu": 1})):
+        try:
+            problem.updateResources(location, change)
+            assert False, "updateResources accepted {} on {}".format(change, location.description)
+        except ValueError:
+            pass
+    assert node.resources == resources and len(problem.deltas) == 0
+    problem.updateResources(node, {"cpu": 1})
+    assert problem.getArrays().capacity[0, problem.getArrays().resources.index("cpu")] == 1
+
+def main():
+    checkReoptimise()
+    checkLinkSetters()
+    checkUpdateResources()
+    print("re-optimisation OK")
+
+if __name__ == "__main__":
+    main()
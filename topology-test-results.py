@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def checkResult(backend):
+    # The result object decodes a placement and flows that meet the replica counts, throughputs and bandwidths, and
+    # its duals and basis agree with those read by the master
+    problem, services = makeProblem()
+    master, _ = solveColumnGeneration(problem, services, backend=backend)
+    result = master.getResult()
+    assert close(result.objective, master.getObjective())
+    assert result.Pi is None and result.duals("throughput") is None
+    placements = result.placements()
+    for s in services:
+        for c in s.components:
+            assert len(placements[c.description]) == c.replica_count, placements
+        assert sum(flow for _, flow in result.pathFlows(s)) + result.artificialFlows()[s.description] >= s.required_throughput - 1e-6
+    assert len(result.values("x")) == sum(len(s.graphs[problem.name].getPaths()) for s in services)
+    bandwidths = np.array([l.bandwidth for l in problem.links])
+    assert (result.linkUsage() <= bandwidths + 1e-6).all()
+
+    master.setRelaxed(True)
+    master.solve()
+    result = master.getResult()
+    duals = master.getDuals()
+    assert np.allclose(result.duals("throughput"), [duals["throughput"][s.description] for s in services])
+    assert np.allclose(result.duals("bandwidth"), duals["bandwidth"])
+    assert len(result.VBasis) == len(result.X) and len(result.CBasis) == len(result.Pi)
+    vbasis, cbasis = master.solver.getBasis()
+    assert np.array_equal(result.VBasis, vbasis) and np.array_equal(result.CBasis, cbasis)
+
+def main():
+    for backend in ("gurobi", "highs"):
+        checkResult(backend)
+    print("results OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+from scenarios import scenario, solveScenarios, readResults
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": 1, "ram": 1}, 2) for c in range(2)], 2, 10) for s in range(2)]
+    return problem, services
+
+def makeScenarios():
+    # Two scenarios in each of three groups: no failed links, a failed gateway link and two failed core links
+    scenarios = []
+    for k, failed in enumerate(([], [0], [4, 9]) * 2):
+        scenarios.append(scenario("scenario{}".format(k), {"service0": 1.0 + k % 3, "service1": 3.0 - k % 2}, {"component00": 1 + k % 2}, failed))
+    return scenarios
+
+def solveFresh(_scenario):
+    # Solves a scenario from scratch on its own copy of the problem. Returns the LP objective.
+    problem, services = makeProblem()
+    for i in _scenario.failed_links:
+        problem.removeLink(i)
+    for s in services:
+        s.required_throughput = _scenario.throughput.get(s.description, s.required_throughput)
+        for c in s.components:
+            c.replica_count = _scenario.replicas.get(c.description, c.replica_count)
+        s.addGraph(problem)
+    master, history = solveColumnGeneration(problem, services, backend="highs", verbose=False)
+    assert history[-1]["status"] == "optimal"
+    return history[-1]["objective"]
+
+def main():
+    # Scenarios solved in this process or in a pool of workers have the LP objectives of solving each from scratch.
+    # Scenarios after the first of their group in a worker start from the columns found before them, the statuses
+    # agree with the gaps and the caller's topology and services are left as they were.
+    problem, services = makeProblem()
+    scenarios = makeScenarios()
+    directory = tempfile.mkdtemp()
+    runs = []
+    for workers in (1, 2):
+        filename = os.path.join(directory, "scenarios{}.jsonl".format(workers))
+        results = solveScenarios(problem, services, scenarios, filename, workers=workers, backend="highs", verbose=False)
+        assert sorted(results) == sorted(s.name for s in scenarios)
+        assert dict((name, r["lp_objective"]) for name, r in readResults(filename).items()) == dict((name, r["lp_objective"]) for name, r in results.items())
+        for _scenario in scenarios:
+            result = results[_scenario.name]
+            assert result["lp_status"] == "optimal" and result["failed_links"] == list(_scenario.failed_links)
+            assert result["status"] in ("optimal", "feasible", "unmet_demand")
+            if result["status"] != "unmet_demand":
+                assert (result["status"] == "optimal") == (result["gap"] <= 1e-6)
+                assert result["objective"] >= result["lagrangian_bound"] - 1e-6 * max(1.0, abs(result["objective"]))
+        runs.append(results)
+
+    # In this process the scenarios are solved group by group, in order
+    for k, _scenario in enumerate(scenarios):
+        assert (runs[0][_scenario.name]["columns_reused"] > 0) == (k >= 3)
+    for _scenario in scenarios:
+        assert np.isclose(runs[0][_scenario.name]["lp_objective"], runs[1][_scenario.name]["lp_objective"])
+    for _scenario in scenarios[:3]:
+        assert np.isclose(runs[0][_scenario.name]["lp_objective"], solveFresh(_scenario))
+
+    assert all(s.required_throughput == 2 and s.graphs[problem.name].getPaths() == [] for s in services)
+    assert not any(l.failed for l in problem.links)
+    for bad in ({"scenarios": scenarios + scenarios[:1]}, {"scenarios": scenarios, "master": None}):
+        try:
+            solveScenarios(problem, services, filename=os.path.join(directory, "bad.jsonl"), workers=1, **bad)
+        except ValueError:
+            pass
+        else:
+            assert False, "bad scenarios accepted"
+    print("scenarios OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.sparse as sp
+from solver_backend import makeBackend, backends, solver_backend, LESS_EQUAL, GREATER_EQUAL, OPTIMAL, INFEASIBLE, BASIC, AT_LOWER
+
+def makeModel(backend):
+    # min 2 x0 + 3 x1 + 2 x2 s.t. x0 + x1 >= 4, x0 - x2 <= 1, 0 <= x <= 10. The optimum x = (1, 3, 0) with objective 11
+    # is unique and not degenerate: duals (3, -1), reduced costs (0, 0, 1), x0 and x1 basic and both rows tight.
+    model = makeBackend(backend, "backend_test", verbose=False)
+    x = model.addVariables(np.array([2.0, 3.0, 2.0]), 0, 10, False, ["x0", "x1", "x2"])
+    assert x.tolist() == [0, 1, 2]
+    assert model.addRows(sp.csr_matrix([[1.0, 1.0]]), GREATER_EQUAL, np.array([4.0]), ["cover"]).tolist() == [0]
+    assert model.addRows(sp.csr_matrix([[1.0, 0.0, -1.0]]), LESS_EQUAL, np.array([1.0]), ["link"]).tolist() == [1]
+    return model
+
+def close(a, b):
+    return np.allclose(np.asarray(a, dtype=float), np.asarray(b, dtype=float), atol=1e-7)
+
+def checkModel(backend):
+    # The same LP solved through either backend gives the same solution, duals, reduced costs and basis, in the same
+    # sign and status conventions, and keeps doing so as the model is changed in place
+    model = makeModel(backend)
+    assert model.numVariables() == 3 and model.numRows() == 2
+    assert model.solve() == OPTIMAL
+    assert close(model.objective(), 11) and close(model.values(), [1, 3, 0])
+    assert close(model.duals(), [3, -1]) and close(model.reducedCosts(), [0, 0, 1])
+    vbasis, cbasis = model.getBasis()
+    assert list(vbasis) == [BASIC, BASIC, AT_LOWER] and list(cbasis) == [AT_LOWER, AT_LOWER]
+
+    # A cheaper column in the cover row replaces x1
+    assert model.addColumn(1.0, 0, 10, [0], [1.0], "x3") == 3
+    assert model.solve() == OPTIMAL
+    assert close(model.objective(), 4) and close(model.values(), [0, 0, 0, 4])
+    model.setRHS([0], [6.0])
+    assert model.solve() == OPTIMAL and close(model.objective(), 6)
+    model.setBounds([3], [0], [2.5])
+    assert model.solve() == OPTIMAL and close(model.objective(), 2.5 + 2 + 3 * 2.5)
+    model.setIntegrality([3], True)
+    assert model.solve() == OPTIMAL and close(model.objective(), 2 + 2 + 3 * 3)
+    model.setIntegrality([3], False)
+
+    # Removing a non basic variable shifts the later indexes down
+    assert model.solve() == OPTIMAL
+    assert close(model.values()[2], 0)
+    mapping = model.removeVariables([2])
+    assert list(mapping) == [0, 1, -1, 2] and model.numVariables() == 3
+    assert model.solve() == OPTIMAL and close(model.objective(), 2.5 + 2 + 3 * 2.5)
+
+    # Infeasible rows are reported, and diagnosed
+    model.setRHS([0], [100.0])
+    assert model.solve() == INFEASIBLE
+    assert "cover" in model.diagnose()
+
+def checkBasis():
+    # A basis saved from one backend warm starts the other: re-solving from the optimal basis takes no simplex iterations
+    gurobi = makeModel("gurobi")
+    assert gurobi.solve() == OPTIMAL
+    highs = makeModel("highs")
+    highs.setBasis(*gurobi.getBasis())
+    assert highs.solve() == OPTIMAL
+    assert highs.work() == 0 and close(highs.objective(), 11)
+    # A basis of a smaller model is padded with the new variables at their lower bound
+    highs.addColumn(5.0, 0, 10, [0], [1.0], "x3")
+    highs.setBasis(*gurobi.getBasis())
+    assert highs.solve() == OPTIMAL
+    assert highs.work() == 0 and close(highs.values(), [1, 3, 0, 0])
+
+def checkMakeBackend():
+    # makeBackend returns a backend given by name or an existing one and refuses any other name
+    model = makeBackend("highs", "backend_test", verbose=False)
+    assert isinstance(model, solver_backend) and makeBackend(model, "other") is model
+    try:
+        makeBackend("cplex", "backend_test")
+    except ValueError:
+        pass
+    else:
+        assert False, "unknown backend accepted"
+
+def main():
+    for backend in backends:
+        checkModel(backend)
+    checkBasis()
+    checkMakeBackend()
+    print("solver backend OK")
+
+if __name__ == "__main__":
+    main()
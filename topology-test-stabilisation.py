@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+from stabilisation import stabiliser, wentges, boxstep, makeStabiliser
+
+def makeProblem():
+    # A 4-ary fat tree with three services of three components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(s), [component("component{}{}".format(s, c), {"cpu": 1, "ram": 1}, 2) for c in range(3)], 2, 10) for s in range(3)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def checkSeparation():
+    # The separation points move from the centre to the master's duals as mis-pricings accumulate, reaching them after
+    # finitely many
+    pi, centre = np.array([4.0, -2.0, 0.0]), np.array([1.0, -1.0, -1.0])
+    for _stabiliser, steps in ((wentges(0.75), 4), (boxstep(0.25), 4)):
+        assert np.array_equal(_stabiliser.separationPoint(pi), pi)
+        _stabiliser.update(centre, 1.0)
+        assert not _stabiliser.update(pi, 0.0) and np.array_equal(_stabiliser.centre, centre)
+        distances = []
+        for k in range(steps):
+            point = _stabiliser.separationPoint(pi)
+            distances.append(np.abs(point - pi).max())
+            _stabiliser.misprice()
+        assert all(a > b for a, b in zip(distances, distances[1:]))
+        assert np.array_equal(_stabiliser.separationPoint(pi), pi) and _stabiliser.exact(pi, _stabiliser.separationPoint(pi))
+        # The centre is dropped when the number of rows changes
+        assert np.array_equal(_stabiliser.separationPoint(np.r_[pi, 1.0]), np.r_[pi, 1.0]) and _stabiliser.bound == -np.inf
+    assert np.allclose(wentges(0.75).weight(), 0.75)
+    assert type(makeStabiliser(None)) == stabiliser and type(makeStabiliser("boxstep")) == boxstep
+    for bad in (lambda: wentges(1), lambda: boxstep(0), lambda: makeStabiliser("smoothing")):
+        try:
+            bad()
+        except ValueError:
+            pass
+        else:
+            assert False, "bad stabilisation accepted"
+
+def checkColumnGeneration(tolerance=1e-6):
+    # Every stabilisation ends at the LP of the unstabilised run, with mis-pricings bounded in each round, the least
+    # reduced cost (at the master's duals) negative whenever columns were added and the bound never above the objective
+    objectives = []
+    for stabilisation, max_mispricings in ((None, 0), ("wentges", 5), ("boxstep", 64), (wentges(0.95), 20)):
+        problem, services = makeProblem()
+        master, history = solveColumnGeneration(problem, services, stabilisation=stabilisation, tolerance=tolerance, verbose=False)
+        assert history[-1]["status"] == "optimal"
+        objectives.append(history[-1]["objective"])
+        for row in history:
+            assert row["mispricings"] <= max_mispricings
+            assert row["min_reduced_cost"] <= 0
+            assert row["columns_added"] == 0 or row["min_reduced_cost"] < -tolerance
+            assert row["lagrangian_bound"] <= row["objective"] + tolerance * max(1.0, abs(row["objective"]))
+        assert history[-1]["min_reduced_cost"] >= -tolerance
+        # Each stabilisation mis-prices at least once on this problem (in the last round, when it proves optimality)
+        assert (sum(row["mispricings"] for row in history) > 0) == (stabilisation != None)
+    assert np.allclose(objectives, objectives[0])
+
+def main():
+    checkSeparation()
+    checkColumnGeneration()
+    print("stabilisation OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import tempfile
+import numpy as np
+from topology_generator import fatTree
+from service_class import component, service
+from column_generation import solveColumnGeneration
+from pricing import makePricer
+from master_problem import master_problem
+from warm_start import loadState, applyState
+
+def makeProblem():
+    # A 4-ary fat tree with two services of two components each
+    problem = fatTree(4, seed=1, cost=(1, 10))
+    services = [service("service{}".format(k), [component("component{}_{}".format(k, i), {"cpu": 1, "ram": 1}, 2) for i in range(2)], 2, 10)
+                for k in range(2)]
+    for s in services:
+        s.addGraph(problem)
+    return problem, services
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+def checkWarmStart(lp):
+    # A second run from the saved columns and basis is optimal straight away, and the saved basis still fits a master
+    # whose graphs had other paths before the saved columns were loaded
+    directory = tempfile.mkdtemp()
+    problem, services = makeProblem()
+    first, _ = solveColumnGeneration(problem, services, backend="highs", warm_start_dir=directory)
+    problem, services = makeProblem()
+    master, history = solveColumnGeneration(problem, services, backend="highs", warm_start_dir=directory)
+    assert len(history) == 1 and history[-1]["status"] == "optimal" and close(history[-1]["objective"], lp)
+    assert close(master.getObjective(), first.getObjective())
+
+    problem, services = makeProblem()
+    rng = np.random.default_rng(1)
+    for s in services:
+        pricer = makePricer(problem, s)
+        links_i, _ = pricer.shortestPath(pricer.initialCosts() + rng.uniform(0, 10, len(pricer.initialCosts())))
+        s.graphs[problem.name].addPath(pricer.makePath(links_i))
+    state = loadState(problem, services, directory)
+    assert state.dropped == 0 and min(state.columns[services[0].description]) > 0
+    master = master_problem(problem, services, relax=True, artificial_cost=10000, verbose=False, backend="highs")
+    assert applyState(master, state) == True
+    master.solve()
+    assert close(master.getObjective(), lp)
+
+def main():
+    problem, services = makeProblem()
+    _, history = solveColumnGeneration(problem, services, backend="highs")
+    lp = history[-1]["objective"]
+    checkWarmStart(lp)
+    print("warm start OK")
+
+if __name__ == "__main__":
+    main()
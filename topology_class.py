@@ -4,6 +4,7 @@ Created on Wed Feb  3 11:55:20 2021
 
 @author: kpb20194
 """
+import os
 import sys
 from unicodedata import bidirectional
 import graphviz as gvz
@@ -13,8 +14,13 @@ import logging
 import itertools
 import numpy as np
 import networkx as nx
+from metrics import logger
 inf = 10000
 
+# Kinds of change recorded in topology.deltas, each as (kind, index) with the index of the link in topology.links or,
+# for RESOURCES, the id of the location
+LINK_REMOVED, LINK_ADDED, BANDWIDTH, LATENCY, RESOURCES = "link_removed", "link_added", "bandwidth", "latency", "resources"
+
 def key_exists(dictionary, keys):
     ## Check if *keys (nested) exists in `element` (dict).
     if not isinstance(dictionary, dict):
@@ -31,12 +37,14 @@ def key_exists(dictionary, keys):
     return True 
 
 class location(object):
+    __slots__ = ("id", "description", "cost", "resources", "type", "assignment")
     id_iter = itertools.count()
     ## Class representing a node (datacenter location)
         # \param id         Unique indtance id
         # \description      String descpription of location
         # \type             One of "gateway", "super_spine", "spine", "leaf", "node" or "dummy"
         # \resources        If node, dictionary containing resources: {"cpu": float, "ram": float}
+        # \assignment       If dummy node in a service graph, (component index, node index) of the assignment it represents
     def __init__(self, description, type, resources=None, cost=None):
         self.id = next(location.id_iter)
         self.description = description
@@ -50,6 +58,7 @@ class location(object):
         else:
             self.resources = resources
         self.type = type
+        self.assignment = None
 
     def getName(self):
         return self.id
@@ -82,6 +91,13 @@ class link(object):
         # \param sink           End node in the link (instance of location class)
         # \param parameters     Dictionary containing link parameters: {"bandwidth": float, "latency": float, "cost": float}
         # \param biderectional  Boolean flag for leaf-leaf links which can flow either way.
+        # \param origin         If a copy in a service graph, index of the topology link it was copied from
+        # \param failed         True if the link has been removed with topology.removeLink
+        # \param owner          Topology holding the link (set by topology.indexLink), to which bandwidth and latency
+        #                       changes made with setBandwidth and setLatency are reported
+        # \param index          Index of the link in owner.links
+
+    __slots__ = ("source", "sink", "description", "parameters", "two_way", "origin", "failed", "owner", "index")
 
     def __init__(self, source, sink, parameters, two_way=False):
         self.source = source
@@ -89,12 +105,18 @@ class link(object):
         self.description = "({}, {})".format(source.description, sink.description)
         self.parameters = parameters
         self.two_way = two_way
+        self.origin = None
+        self.failed = False
+        self.owner = None
+        self.index = -1
 
     def copy(self):
         return link(self.source.copy(), self.sink.copy(), self.description[:], copy.deepcopy(self.parameters), self.two_way)
     
-    def copy_with_new_nodes(self, source, sink):
-        return link(source, sink, copy.deepcopy(self.parameters), self.two_way)
+    def copy_with_new_nodes(self, source, sink, origin=None):
+        new_link = link(source, sink, copy.deepcopy(self.parameters), self.two_way)
+        new_link.origin = origin
+        return new_link
     
     def getID(self):
         return self.id
@@ -107,9 +129,13 @@ class link(object):
     
     def setLatency(self, latency):
         self.parameters["latency"] = latency
+        if self.owner != None:
+            self.owner.linkChanged(self.index, LATENCY)
     
     def setBandwidth(self, bandwidth):
         self.parameters["bandwidth"] = bandwidth
+        if self.owner != None:
+            self.owner.linkChanged(self.index, BANDWIDTH)
 
     def setLinkCost(self, cost):
         self.parameters["cost"] = cost
@@ -118,19 +144,11 @@ class link(object):
         return "Link {} ({}) -> {} ({})".format(self.source.description, self.source.id, self.sink.description, self.sink.id)
 
     def forJSON(self):
-        ### To be updated
-        jsonDict = {"end_event_name": self.sink, "type": self.type, "name": self.description}
-        jsonDict["properties"] = {}
-        if self.type == "stc" or self.type == "stcu":
-            jsonDict["properties"]["lb"] = self.lb
-            jsonDict["properties"]["ub"] = self.ub
-        elif self.type == "pstc":
-            if self.distribution["type"] == "uniform":
-                jsonDict["properties"]["distribution"] = {"type": "Uniform", "lb": self.dist_lb, "ub": self.dist_ub}
-            elif self.distribution["type"] == "gaussian":
-                jsonDict["properties"]["distribution"] = {"type": "Gaussian", "mean": self.mu, "variance": self.sigma}
-        jsonDict["start_event_name"] = self.source
-        return jsonDict
+        # Row of the "links" array of the topology JSON schema (see topology_io)
+        row = [self.source.description, self.sink.description, self.bandwidth, self.latency, self.two_way]
+        if "cost" in self.parameters:
+            row.append(self.parameters["cost"])
+        return row
 
     @property
     def bandwidth(self):
@@ -144,6 +162,55 @@ class link(object):
     def cost(self):
         return self.parameters["cost"]
 
+class topology_arrays(object):
+    ## Struct of arrays view of a topology for model building and pricing. Locations are referred to by their dense index
+    ## in topology.locations (not location.id) and nodes by their index in topology.getNodes(). Made by
+    ## topology.getArrays() and kept in sync by the topology's update methods (updateLink, removeLink, updateResources
+    ## etc.); it is rebuilt when locations or links are added.
+        # \param topology   Topology to take the arrays from
+    def __init__(self, topology):
+        index = dict((l.id, i) for i, l in enumerate(topology.locations))
+        links = topology.links
+        self.location_index = index
+        self.link_source = np.array([index[l.source.id] for l in links], dtype=np.int64)
+        self.link_sink = np.array([index[l.sink.id] for l in links], dtype=np.int64)
+        self.two_way = np.array([l.two_way for l in links], dtype=bool)
+        self.failed = np.array([l.failed for l in links], dtype=bool)
+        self.bandwidth = np.array([l.parameters.get("bandwidth", np.nan) for l in links], dtype=float)
+        self.latency = np.array([l.parameters.get("latency", np.nan) for l in links], dtype=float)
+        self.link_cost = np.array([l.parameters.get("cost", np.nan) for l in links], dtype=float)
+
+        # Capacity of every node for every resource (in the order first seen) and whether the node has the resource
+        nodes = topology.getNodes()
+        self.nodes = np.array([index[n.id] for n in nodes], dtype=np.int64)
+        self.node_index = dict((n.id, i) for i, n in enumerate(nodes))
+        resources = {}
+        for node in nodes:
+            for resource in node.resources:
+                resources.setdefault(resource, len(resources))
+        self.resources = list(resources)
+        self.resource_index = resources
+        self.capacity = np.zeros((len(nodes), len(resources)))
+        self.has_resource = np.zeros((len(nodes), len(resources)), dtype=bool)
+        for n, node in enumerate(nodes):
+            for resource, value in node.resources.items():
+                self.capacity[n, resources[resource]] = value
+                self.has_resource[n, resources[resource]] = True
+        self.node_cost = np.array([node.cost if node.cost != None else 0 for node in nodes], dtype=float)
+
+    def availableBandwidth(self):
+        # Bandwidth of every link, 0 for failed links
+        return np.where(self.failed, 0, self.bandwidth)
+
+    def updateNode(self, n, resources):
+        # Copies changed resources of node n. Returns False if a resource is new, in which case the arrays must be remade.
+        for resource, value in resources.items():
+            if resource not in self.resource_index:
+                return False
+            self.capacity[n, self.resource_index[resource]] = value
+            self.has_resource[n, self.resource_index[resource]] = True
+        return True
+
 class topology(object):
     def __init__(self, name, locations, links):
         ## Class representing the datacenter topology. A graph of locations and links
@@ -153,6 +220,67 @@ class topology(object):
         self.name = name
         self.locations = locations
         self.links = links
+        # Changes made through removeLink, restoreLink, addLink, updateLink (or link.setBandwidth and link.setLatency) and
+        # updateResources, in order. Service graphs and master problems made from the topology keep how far through the
+        # list they are and apply the rest.
+        self.deltas = []
+        self.buildIndex()
+
+    def buildIndex(self):
+        # Builds the lookup index over locations and links. Keeps a hash of id -> location and description -> location,
+        # the indexes of outgoing/incoming links for every location and a hash of (source id, sink id) -> link indexes.
+        # addLocation and addLink keep the index up to date so only needs calling if self.locations or self.links are
+        # modified directly.
+        self.location_by_id = {}
+        self.location_by_description = {}
+        self.out_links = {}
+        self.in_links = {}
+        self.links_by_locations = {}
+        self.csr = None
+        # layered_graph.base_layer and topology_arrays of the topology, built when first needed
+        self.base_layer = None
+        self.arrays = None
+        for location in self.locations:
+            self.indexLocation(location)
+        for i in range(len(self.links)):
+            self.indexLink(i)
+
+    def indexLocation(self, location):
+        self.location_by_id[location.id] = location
+        # When descriptions are repeated the last location added is returned
+        self.location_by_description[location.description] = location
+        self.out_links.setdefault(location.id, [])
+        self.in_links.setdefault(location.id, [])
+
+    def indexLink(self, i):
+        link = self.links[i]
+        link.owner, link.index = self, i
+        self.out_links.setdefault(link.source.id, []).append(i)
+        self.in_links.setdefault(link.sink.id, []).append(i)
+        self.links_by_locations.setdefault((link.source.id, link.sink.id), []).append(i)
+        self.csr = None
+        self.base_layer = None
+        self.arrays = None
+
+    def getCSR(self):
+        # Returns compressed sparse row adjacency arrays over the location indexes in self.locations:
+        # {"out": (indptr, links), "in": (indptr, links)} where the outgoing link indexes of location i are
+        # links[indptr[i]:indptr[i+1]]. Built lazily and cached until a location or link is added.
+        if self.csr is None:
+            self.csr = {}
+            for key, adjacency in (("out", self.out_links), ("in", self.in_links)):
+                degrees = [len(adjacency[l.id]) for l in self.locations]
+                indptr = np.zeros(len(self.locations) + 1, dtype=np.int64)
+                np.cumsum(degrees, out=indptr[1:])
+                indices = np.fromiter(itertools.chain.from_iterable(adjacency[l.id] for l in self.locations), dtype=np.int64, count=indptr[-1])
+                self.csr[key] = (indptr, indices)
+        return self.csr
+
+    def getArrays(self):
+        # topology_arrays of the topology, built when first needed and cached until a location or link is added
+        if self.arrays == None:
+            self.arrays = topology_arrays(self)
+        return self.arrays
 
     def setName(self, name):
         self.name = name
@@ -167,21 +295,14 @@ class topology(object):
         return self.locations
     
     def getLocationByDescription(self, description):
-        result = None
-        for location in self.locations:
-            if location.description == description:
-                result = location
-        return result
+        return self.location_by_description.get(description)
     
     def getEdgeByLocations(self, source_id, sink_id):
-        # Given two locations it returns the link
-        result = None
-        for link in self.links:
-            if link.source.id == source_id and link.sink.id == sink_id:
-                result = link
-            elif link.sink.id == source_id and link.source.id == sink_id:
-                result = link
-        return result
+        # Given two locations it returns the link (in either direction). If there are several the last one added is returned
+        forward = self.links_by_locations.get((source_id, sink_id), [-1])[-1]
+        backward = self.links_by_locations.get((sink_id, source_id), [-1])[-1]
+        i = max(forward, backward)
+        return self.links[i] if i >= 0 else None
 
     def getSwitches(self):
         return [i for i in self.getLocations() if i.type == "switch"]
@@ -193,6 +314,14 @@ class topology(object):
         # Returns a list of all nodes of type=type
         return [i for i in self.getLocations() if i.type == type]
 
+    def getGateway(self):
+        # Returns the gateway, where the flow of every service starts and ends. Raises ValueError unless the topology has
+        # exactly one.
+        gateways = self.getLocationsByType("gateway")
+        if len(gateways) != 1:
+            raise ValueError("Topology {} must have exactly one gateway to make service graphs, it has {}".format(self.name, len(gateways)))
+        return gateways[0]
+
     def getLocationsByTypes(self):
         # As above but makes list of lists in format [[gateways], [super_spines], 
         # [spines], [leafs], [nodes]]
@@ -205,14 +334,22 @@ class topology(object):
         nodes = self.getLocationsByType("node")
         return [i for i in (gateway, super_spines, spines, leafs, nodes) if i]
 
+    def outgoingEdgeIndexes(self, location):
+        # Returns the indexes in self.links of the links leaving location
+        return self.out_links.get(location.id, [])
+
+    def incomingEdgeIndexes(self, location):
+        # Returns the indexes in self.links of the links entering location
+        return self.in_links.get(location.id, [])
+
     def outgoingEdge(self, location):
-        return [l for l in self.getLinks() if l.source == location]
+        return [self.links[i] for i in self.outgoingEdgeIndexes(location)]
     
     def incomingEdge(self, location):
-        return [l for l in self.getLinks() if l.sink == location]
+        return [self.links[i] for i in self.incomingEdgeIndexes(location)]
     
     def getOpposingEdge(self, link):
-        opposing = [l for l in self.getLinks() if l.source == link.sink and l.sink == link.source]
+        opposing = [self.links[i] for i in self.links_by_locations.get((link.sink.id, link.source.id), [])]
         if opposing:
             if len(opposing) == 1:
                 return opposing[0]
@@ -224,41 +361,75 @@ class topology(object):
     def addLink(self, source, sink, parameters):
         new_link = link(source, sink, parameters)
         self.links.append(new_link)
-        print("Link Added")
+        self.indexLink(len(self.links) - 1)
+        self.deltas.append((LINK_ADDED, len(self.links) - 1))
+        logger.debug("Link added: %s", self.links[-1].description)
+
+    def removeLink(self, i):
+        # Marks link i as failed. It keeps its index (so columns and rows indexed by link stay valid) but no flow can be
+        # routed through it until restoreLink(i).
+        self.links[i].failed = True
+        if self.arrays != None:
+            self.arrays.failed[i] = True
+        self.deltas.append((LINK_REMOVED, i))
+
+    def restoreLink(self, i):
+        self.links[i].failed = False
+        if self.arrays != None:
+            self.arrays.failed[i] = False
+        self.deltas.append((LINK_ADDED, i))
+
+    def updateLink(self, i, bandwidth=None, latency=None):
+        # Changes the bandwidth and/or latency of link i (the same as link.setBandwidth and link.setLatency)
+        if bandwidth != None:
+            self.links[i].setBandwidth(bandwidth)
+        if latency != None:
+            self.links[i].setLatency(latency)
+
+    def linkChanged(self, i, kind):
+        # Records a change of the bandwidth or latency (kind) of link i, made through link.setBandwidth or link.setLatency
+        if self.arrays != None:
+            getattr(self.arrays, kind)[i] = self.links[i].parameters[kind]
+        self.deltas.append((kind, i))
+
+    def updateResources(self, location, resources):
+        # Changes the resources of a node, e.g. updateResources(node, {"cpu": 2}). Only resources the node already has
+        # can be changed.
+        if location.type != "node" or self.location_by_id.get(location.id) is not location:
+            raise ValueError("{} is not a node of topology {}".format(location.description, self.name))
+        unknown = [resource for resource in resources if resource not in location.resources]
+        if unknown:
+            raise ValueError("node {} has no resources {}".format(location.description, unknown))
+        location.resources.update(resources)
+        if self.arrays != None and not self.arrays.updateNode(self.arrays.node_index[location.id], resources):
+            self.arrays = None
+        self.deltas.append((RESOURCES, location.id))
 
     def addLocation(self, location):
         self.locations.append(location)
+        self.indexLocation(location)
+        self.csr = None
+        self.base_layer = None
+        self.arrays = None
     
     def getLocationByID(self, id):
-        for location in self.getLocations():
-            if id == location.id:
-                return location
-        print("No location found with that ID.")
-        return False
-
-    def pstnJSON(self):
-        # To be updated
-        constList = []
-        for constraint in self.constraints:
-            constList.append(constraint.forJSON())
-        toWrite = {self.name: constList}
         try:
-            f = open("{}.json".format(self.name), "x")
-            f.write(str(toWrite))
-            f.close()
-            print("File successfully created")
-            return True
-        except FileExistsError:
-            print("File name already in use. Try changing name of PSTN to something not in use")
-            answer = input("Change name of PSTN? [Y/N]: ")
-            if answer == "Y" or answer == "y":
-                newName = input("Input new name: ")
-                self.setName(newName)
-                self.pstnJSON()
-            else:
-                print("File creation failed")
-                return False
-            
+            return self.location_by_id[id]
+        except KeyError:
+            logger.warning("No location found with ID %s", id)
+            return False
+
+    def pstnJSON(self, services=(), overwrite=False):
+        # Writes the topology (and services) to <name>.json in the schema of topology_io. An existing file is only
+        # replaced if overwrite is True. Returns True if the file was written.
+        import topology_io
+        filename = "{}.json".format(self.name)
+        if os.path.exists(filename) and overwrite == False:
+            logger.warning("File %s already exists, not written. Use overwrite=True to replace it", filename)
+            return False
+        topology_io.writeJSON(filename, self, services)
+        return True
+
     def plot(self):
         ## Plots the topology to a file using graphviz
         plot = gvz.Digraph(format='png')
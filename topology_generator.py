@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from topology_class import location, link, topology
+
+# Defaults match the hand built topologies: links from the gateway have bandwidth 10 and all others 5, every link has
+# latency 1 and every node has 4 cpu, 8 ram and costs 1
+default_bandwidths = {"gateway": 10, "super_spine": 5, "spine": 5, "leaf": 5}
+default_latencies = {"gateway": 1, "super_spine": 1, "spine": 1, "leaf": 1}
+default_resources = {"cpu": 4, "ram": 8}
+default_cost = 1
+
+def sample(rng, value, size):
+    # Draws size values from a parameter given as a number (constant), a (low, high) tuple (uniform) or a list (chosen
+    # uniformly at random from the list)
+    if isinstance(value, tuple):
+        return rng.uniform(value[0], value[1], size)
+    if isinstance(value, list):
+        return rng.choice(np.asarray(value, dtype=float), size)
+    return np.full(size, float(value))
+
+def makeLocations(rng, descriptions, type, resources=None, cost=None):
+    # Makes a location for each description. Nodes get resources and cost sampled with sample()
+    if type != "node":
+        return [location(description, type) for description in descriptions]
+    samples = dict((resource, sample(rng, resources[resource], len(descriptions)).tolist()) for resource in resources)
+    costs = sample(rng, cost, len(descriptions)).tolist()
+    return [location(descriptions[i], type, resources=dict((resource, samples[resource][i]) for resource in resources), cost=costs[i])
+            for i in range(len(descriptions))]
+
+def makeTopology(rng, name, locations, sources, sinks, two_way, bandwidths, latencies):
+    # Makes the topology from arrays of source and sink indexes (into locations) and the two_way flag of each link. The
+    # bandwidth and latency of a link are sampled from the entry in bandwidths/latencies for the type of its source.
+    types = np.array([l.type for l in locations], dtype=object)[sources]
+    bandwidth = np.zeros(len(sources))
+    latency = np.zeros(len(sources))
+    for type in bandwidths:
+        mask = types == type
+        bandwidth[mask] = sample(rng, bandwidths[type], int(mask.sum()))
+        latency[mask] = sample(rng, latencies[type], int(mask.sum()))
+    links = [link(locations[s], locations[t], {"bandwidth": b, "latency": l}, two_way=w)
+             for s, t, b, l, w in zip(sources.tolist(), sinks.tolist(), bandwidth.tolist(), latency.tolist(), two_way.tolist())]
+    return topology(name, locations, links)
+
+def complete(sources, sinks):
+    # Index arrays of the links joining every source to every sink
+    return np.repeat(sources, len(sinks)), np.tile(sinks, len(sources))
+
+def leafPairs(leafs):
+    # Index arrays of the two way links joining consecutive pairs of leafs
+    return leafs[0:len(leafs) - 1:2], leafs[1::2][:len(leafs) // 2]
+
+def fabric(n_super_spines, n_spines, n_leafs, nodes_per_leaf, bandwidths=None, latencies=None, resources=None, cost=None,
+           leaf_links=True, seed=None, name=None):
+    # Makes a gateway/super_spine/spine/leaf/node topology. The gateway connects to every super spine (or to every spine
+    # if there are none), every super spine to every spine and every spine to every leaf. Each leaf has nodes_per_leaf
+    # nodes and, if leaf_links, consecutive pairs of leafs are joined by a two way link.
+    # \param bandwidths     {location type: value} for links leaving locations of that type (see sample())
+    # \param latencies      As bandwidths for link latencies
+    # \param resources      {resource: value} of every node (see sample())
+    # \param cost           Cost of every node (see sample())
+    # \param seed           Seed of the random numbers used to sample parameters
+    rng = np.random.default_rng(seed)
+    bandwidths = dict(default_bandwidths, **(bandwidths or {}))
+    latencies = dict(default_latencies, **(latencies or {}))
+    layers = [["Gateway"], ["SuperSpine{}".format(i) for i in range(n_super_spines)], ["Spine{}".format(i) for i in range(n_spines)],
+              ["Leaf{}".format(i) for i in range(n_leafs)], ["Node{}_{}".format(i, j) for i in range(n_leafs) for j in range(nodes_per_leaf)]]
+    types = ["gateway", "super_spine", "spine", "leaf", "node"]
+    locations = []
+    offsets = []
+    for descriptions, type in zip(layers, types):
+        offsets.append(np.arange(len(locations), len(locations) + len(descriptions)))
+        locations += makeLocations(rng, descriptions, type, resources or default_resources, cost if cost != None else default_cost)
+    gateway, super_spines, spines, leafs, nodes = offsets
+
+    edges = [complete(gateway, super_spines if n_super_spines else spines)]
+    if n_super_spines:
+        edges.append(complete(super_spines, spines))
+    edges.append(complete(spines, leafs))
+    edges.append((np.repeat(leafs, nodes_per_leaf), nodes))
+    pairs = leafPairs(leafs) if leaf_links else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    sources = np.concatenate([s for s, _ in edges] + [pairs[0]])
+    sinks = np.concatenate([t for _, t in edges] + [pairs[1]])
+    two_way = np.arange(len(sources)) >= len(sources) - len(pairs[0])
+    if name == None:
+        name = "fabric_{}_{}_{}_{}".format(n_super_spines, n_spines, n_leafs, nodes_per_leaf)
+    return makeTopology(rng, name, locations, sources, sinks, two_way, bandwidths, latencies)
+
+def fatTree(k, bandwidths=None, latencies=None, resources=None, cost=None, leaf_links=True, seed=None, name=None):
+    # Makes a k-ary fat-tree (k even) below a gateway. There are (k/2)^2 core switches (super spines) and k pods, each
+    # with k/2 aggregation switches (spines) and k/2 edge switches (leafs) with k/2 nodes each, so k^3/4 nodes in total.
+    # Core switch i connects to aggregation switch i // (k/2) of every pod and within a pod every aggregation switch
+    # connects to every edge switch. Other parameters are as for fabric().
+    if k < 2 or k % 2:
+        raise ValueError("k must be an even number >= 2")
+    rng = np.random.default_rng(seed)
+    bandwidths = dict(default_bandwidths, **(bandwidths or {}))
+    latencies = dict(default_latencies, **(latencies or {}))
+    half = k // 2
+    layers = [["Gateway"], ["Core{}".format(i) for i in range(half * half)],
+              ["Aggregation{}_{}".format(p, i) for p in range(k) for i in range(half)],
+              ["Edge{}_{}".format(p, i) for p in range(k) for i in range(half)],
+              ["Node{}_{}_{}".format(p, i, j) for p in range(k) for i in range(half) for j in range(half)]]
+    types = ["gateway", "super_spine", "spine", "leaf", "node"]
+    locations = []
+    offsets = []
+    for descriptions, type in zip(layers, types):
+        offsets.append(np.arange(len(locations), len(locations) + len(descriptions)))
+        locations += makeLocations(rng, descriptions, type, resources or default_resources, cost if cost != None else default_cost)
+    gateway, cores, aggregations, edges, nodes = offsets
+
+    # Aggregation switch i of pod p is aggregations[p*half + i] and likewise for edge switches
+    core_pod = np.repeat(np.arange(len(cores)), k), np.tile(np.arange(k), len(cores))
+    pod, i, j = np.repeat(np.arange(k), half * half), np.tile(np.repeat(np.arange(half), half), k), np.tile(np.arange(half), k * half)
+    links = [complete(gateway, cores),
+             (cores[core_pod[0]], aggregations[core_pod[1] * half + core_pod[0] // half]),
+             (aggregations[pod * half + i], edges[pod * half + j]),
+             (np.repeat(edges, half), nodes)]
+    # Pairs of edge switches are only joined within a pod
+    pairs = [leafPairs(edges[p*half:(p+1)*half]) for p in range(k)] if leaf_links else []
+    sources = np.concatenate([s for s, _ in links] + [s for s, _ in pairs])
+    sinks = np.concatenate([t for _, t in links] + [t for _, t in pairs])
+    n_pairs = sum(len(s) for s, _ in pairs)
+    two_way = np.arange(len(sources)) >= len(sources) - n_pairs
+    if name == None:
+        name = "fat_tree_{}".format(k)
+    return makeTopology(rng, name, locations, sources, sinks, two_way, bandwidths, latencies)
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import zipfile
+import numpy as np
+from topology_class import location, link, topology, topology_arrays
+from service_class import component, service
+
+# Topologies and services are saved as JSON in this schema (rows are lists, not objects, so that large files stay small
+# and are read row by row):
+# {
+#     "name": "topology1",
+#     "resources": ["cpu", "ram"],
+#     "locations": [["Gateway", "gateway"], ..., ["Node1", "node", cost, [cpu, ram]], ...],
+#     "links": [["Gateway", "Leaf1", bandwidth, latency, two_way], ["Leaf1", "Node1", bandwidth, latency, two_way, cost], ...],
+#     "services": [{"description": "service1", "required_throughput": 1, "required_latency": 10,
+#                   "components": [["component1", {"cpu": 1, "ram": 1}, replica_count], ...]}, ...]
+# }
+# Node capacities are given in the order of "resources" (null if the node does not have the resource) and links refer to
+# locations by description, so location descriptions must be unique. The link cost is optional. "resources" must come before "locations".
+# The binary format is an uncompressed .npz of the same data as arrays, whose members can be memory mapped.
+location_types = ("gateway", "super_spine", "spine", "leaf", "node", "dummy")
+chunk_size = 1 << 20
+
+class json_stream(object):
+    ## Reads a JSON document from a file in chunks, decoding one value at a time, so the rows of a large array can be
+    ## handled as they are read without the whole document (or a dictionary per row) being held in memory
+        # \param file   File object opened for reading text
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        # Reads the next chunk, dropping what has been consumed. Returns False at the end of the file.
+        chunk = self.file.read(chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        # Next character after any whitespace ("" at the end of the file)
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer) or not self.fill():
+                return self.buffer[self.position:self.position+1]
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError("Expected '{}' at '{}'".format(character, self.buffer[self.position:self.position+20]))
+        self.position += 1
+
+    def value(self):
+        # Decodes the next value. A value ending at the end of the buffer (e.g. a number split across chunks) is only
+        # taken once the next chunk shows it is complete.
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    def items(self):
+        # Iterates over the (key, stream) pairs of an object, the value of each key must be read before the next
+        self.expect("{")
+        while self.peek() != "}":
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.position += 1
+        self.position += 1
+
+    def elements(self):
+        # Iterates over the values of an array
+        self.expect("[")
+        while self.peek() != "]":
+            yield self.value()
+            if self.peek() == ",":
+                self.position += 1
+        self.position += 1
+
+def serviceRecord(_service):
+    return {"description": _service.description, "required_throughput": _service.required_throughput, "required_latency": _service.required_latency,
+            "components": [[c.description, c.requirements, c.replica_count] for c in _service.components]}
+
+def makeService(record):
+    return service(record["description"], [component(*c) for c in record["components"]], record["required_throughput"], record["required_latency"])
+
+def resourceNames(locations):
+    # Resources of the nodes in the order first seen
+    resources = {}
+    for l in locations:
+        if l.type == "node":
+            for resource in l.resources:
+                resources.setdefault(resource, None)
+    return list(resources)
+
+def writeJSON(filename, _topology, services=()):
+    # Writes the topology and services in the schema above, one location, link or service per line
+    resources = resourceNames(_topology.locations)
+    with open(filename, "w") as f:
+        f.write('{{\n    "name": {},\n    "resources": {},\n    "locations": [\n'.format(json.dumps(_topology.name), json.dumps(resources)))
+        rows = []
+        for l in _topology.locations:
+            if l.type == "node":
+                rows.append([l.description, l.type, l.cost, [l.resources.get(resource) for resource in resources]])
+            else:
+                rows.append([l.description, l.type])
+        f.write(",\n".join("        " + json.dumps(row) for row in rows))
+        f.write('\n    ],\n    "links": [\n')
+        f.write(",\n".join("        " + json.dumps(l.forJSON()) for l in _topology.links))
+        f.write('\n    ],\n    "services": [\n')
+        f.write(",\n".join("        " + json.dumps(serviceRecord(s)) for s in services))
+        f.write("\n    ]\n}\n")
+
+def readJSON(filename):
+    # Reads a topology and its services written in the schema above. Returns (topology, [service]).
+    name, resources, locations, links, services = None, None, [], [], []
+    by_description = {}
+    with open(filename) as f:
+        stream = json_stream(f)
+        for key in stream.items():
+            if key == "locations":
+                if resources == None:
+                    raise ValueError("'resources' must come before 'locations'")
+                for row in stream.elements():
+                    if row[1] == "node":
+                        new_location = location(row[0], row[1], resources=dict((r, v) for r, v in zip(resources, row[3]) if v != None), cost=row[2])
+                    else:
+                        new_location = location(row[0], row[1])
+                    locations.append(new_location)
+                    by_description[row[0]] = new_location
+            elif key == "links":
+                for row in stream.elements():
+                    parameters = {"bandwidth": row[2], "latency": row[3]}
+                    if len(row) > 5:
+                        parameters["cost"] = row[5]
+                    links.append(link(by_description[row[0]], by_description[row[1]], parameters, two_way=row[4]))
+            elif key == "services":
+                services = [makeService(record) for record in stream.elements()]
+            elif key == "name":
+                name = stream.value()
+            elif key == "resources":
+                resources = stream.value()
+            else:
+                stream.value()
+    return topology(name, locations, links), services
+
+def writeBinary(filename, _topology, services=()):
+    # Writes the topology and services as an uncompressed .npz of arrays (see readBinary)
+    resources = resourceNames(_topology.locations)
+    index = dict((l.id, i) for i, l in enumerate(_topology.locations))
+    nodes = [i for i, l in enumerate(_topology.locations) if l.type == "node"]
+    capacity = np.array([[_topology.locations[i].resources.get(r, np.nan) for r in resources] for i in nodes], dtype=float).reshape(len(nodes), len(resources))
+    links = _topology.links
+    np.savez(filename, name=np.array(_topology.name), resources=np.array(resources, dtype=str),
+             location_description=np.array([l.description for l in _topology.locations], dtype=str),
+             location_type=np.array([location_types.index(l.type) for l in _topology.locations], dtype=np.int8),
+             node_locations=np.array(nodes, dtype=np.int64),
+             node_cost=np.array([_topology.locations[i].cost if _topology.locations[i].cost != None else np.nan for i in nodes], dtype=float),
+             capacity=capacity,
+             link_source=np.array([index[l.source.id] for l in links], dtype=np.int64),
+             link_sink=np.array([index[l.sink.id] for l in links], dtype=np.int64),
+             bandwidth=np.array([l.bandwidth for l in links], dtype=float),
+             latency=np.array([l.latency for l in links], dtype=float),
+             link_cost=np.array([l.parameters.get("cost", np.nan) for l in links], dtype=float),
+             two_way=np.array([l.two_way for l in links], dtype=bool),
+             services=np.array(json.dumps([serviceRecord(s) for s in services])))
+
+def loadArrays(filename, mmap=True):
+    # {name: array} of a file written by writeBinary. If mmap, the arrays are memory mapped from the file (copy on write,
+    # so changes stay in memory) instead of read, so even large topologies open straight away.
+    if not mmap:
+        with np.load(filename) as data:
+            return dict((key, data[key]) for key in data.files)
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("{} is compressed so cannot be memory mapped".format(info.filename))
+            # The data follows the local file header, whose name and extra field lengths can differ from the central directory
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2").tolist()
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            key = info.filename[:-len(".npy")]
+            if dtype.hasobject or not shape:
+                # Scalars (e.g. names) are tiny so are read
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                arrays[key] = np.lib.format.read_array(f)
+            else:
+                arrays[key] = np.memmap(filename, dtype=dtype, mode="c", offset=f.tell(), shape=shape, order="F" if fortran_order else "C")
+    return arrays
+
+def readArrays(filename, mmap=True):
+    # topology_arrays of a topology written by writeBinary, made straight from the (memory mapped) arrays without making
+    # a location or link object, so it takes about the same time whatever the size of the topology. Locations have no
+    # objects so location_index and node_index are None. Returns (topology_arrays, name, location descriptions).
+    data = loadArrays(filename, mmap)
+    arrays = topology_arrays.__new__(topology_arrays)
+    arrays.location_index = arrays.node_index = None
+    arrays.link_source, arrays.link_sink = data["link_source"], data["link_sink"]
+    arrays.two_way = data["two_way"]
+    arrays.failed = np.zeros(len(arrays.link_source), dtype=bool)
+    arrays.bandwidth, arrays.latency, arrays.link_cost = data["bandwidth"], data["latency"], data["link_cost"]
+    arrays.nodes = data["node_locations"]
+    arrays.resources = data["resources"].tolist()
+    arrays.resource_index = dict((r, i) for i, r in enumerate(arrays.resources))
+    capacity = np.asarray(data["capacity"])
+    arrays.has_resource = ~np.isnan(capacity)
+    arrays.capacity = np.where(arrays.has_resource, capacity, 0.0)
+    arrays.node_cost = np.nan_to_num(data["node_cost"], nan=0.0)
+    return arrays, str(data["name"]), data["location_description"]
+
+def readBinary(filename, mmap=True):
+    # Reads a topology and its services written by writeBinary. Returns (topology, [service]). A location and link object
+    # is made for every row, so this takes time in proportion to the size of the topology even when memory mapped (see
+    # readArrays for the arrays alone).
+    arrays = loadArrays(filename, mmap)
+    resources = arrays["resources"].tolist()
+    descriptions = arrays["location_description"].tolist()
+    types = [location_types[t] for t in arrays["location_type"].tolist()]
+    node_rows = dict(zip(arrays["node_locations"].tolist(), range(len(arrays["node_locations"]))))
+    capacity, node_cost = arrays["capacity"].tolist(), arrays["node_cost"].tolist()
+    locations = []
+    for i in range(len(descriptions)):
+        if i in node_rows:
+            n = node_rows[i]
+            locations.append(location(descriptions[i], types[i], resources=dict((r, v) for r, v in zip(resources, capacity[n]) if v == v),
+                                      cost=node_cost[n] if node_cost[n] == node_cost[n] else None))
+        else:
+            locations.append(location(descriptions[i], types[i]))
+    links = []
+    for s, t, b, l, c, w in zip(arrays["link_source"].tolist(), arrays["link_sink"].tolist(), arrays["bandwidth"].tolist(),
+                                arrays["latency"].tolist(), arrays["link_cost"].tolist(), arrays["two_way"].tolist()):
+        links.append(link(locations[s], locations[t], {"bandwidth": b, "latency": l} if c != c else {"bandwidth": b, "latency": l, "cost": c}, two_way=w))
+    services = [makeService(record) for record in json.loads(str(arrays["services"]))]
+    return topology(str(arrays["name"]), locations, links), services
+
+def read(filename, mmap=True):
+    # Reads a topology and services from a .json or .npz file
+    if filename.endswith(".npz"):
+        return readBinary(filename, mmap)
+    return readJSON(filename)
+
+def compare(a, b):
+    # Differences between two (topology, [service]) pairs as a list of strings (empty if they are the same)
+    (topology_a, services_a), (topology_b, services_b) = a, b
+    differences = []
+    if topology_a.name != topology_b.name:
+        differences.append("name {} != {}".format(topology_a.name, topology_b.name))
+    key = lambda l: (l.description, l.type, l.cost, l.resources)
+    rows_a, rows_b = [key(l) for l in topology_a.locations], [key(l) for l in topology_b.locations]
+    differences += ["location {} != {}".format(x, y) for x, y in zip(rows_a, rows_b) if x != y]
+    key = lambda l: (l.source.description, l.sink.description, l.bandwidth, l.latency, l.parameters.get("cost"), l.two_way)
+    rows_a, rows_b = [key(l) for l in topology_a.links], [key(l) for l in topology_b.links]
+    differences += ["link {} != {}".format(x, y) for x, y in zip(rows_a, rows_b) if x != y]
+    rows_a, rows_b = [serviceRecord(s) for s in services_a], [serviceRecord(s) for s in services_b]
+    differences += ["service {} != {}".format(x, y) for x, y in zip(rows_a, rows_b) if x != y]
+    for what, x, y in (("locations", topology_a.locations, topology_b.locations), ("links", topology_a.links, topology_b.links), ("services", services_a, services_b)):
+        if len(x) != len(y):
+            differences.append("{} {} != {}".format(what, len(x), len(y)))
+    return differences
+
+def checkRoundTrip(_topology, services, directory):
+    # Writes the topology and services to directory in both formats, reads them back and compares them with the
+    # originals. Returns the list of differences (empty if both formats match).
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    json_file = os.path.join(directory, _topology.name + ".json")
+    binary_file = os.path.join(directory, _topology.name + ".npz")
+    writeJSON(json_file, _topology, services)
+    writeBinary(binary_file, _topology, services)
+    original = (_topology, services)
+    differences = ["json: " + d for d in compare(original, readJSON(json_file))]
+    differences += ["npz: " + d for d in compare(original, readBinary(binary_file))]
+    differences += ["npz (read): " + d for d in compare(original, readBinary(binary_file, mmap=False))]
+    return differences
+
+if __name__ == "__main__":
+    # python topology_io.py input.(json|npz) output.(json|npz): converts between the formats and checks the round trip
+    _topology, services = read(sys.argv[1])
+    if sys.argv[2].endswith(".npz"):
+        writeBinary(sys.argv[2], _topology, services)
+    else:
+        writeJSON(sys.argv[2], _topology, services)
+    differences = compare((_topology, services), read(sys.argv[2]))
+    for difference in differences:
+        print(difference)
+    sys.exit(1 if differences else 0)
@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import numpy as np
+from solver_backend import AT_LOWER, BASIC
+from service_class import service_path
+from metrics import logger
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+
+def fingerprint(topology, services):
+    # Key of the saved state for a topology and set of services. Only names and component definitions are used, not
+    # bandwidths, resources or required throughputs, so a run on a fabric whose links or demands changed still finds
+    # the state of earlier runs.
+    return _hash([topology.name] + [[s.description, [[c.description, c.replica_count, c.requirements] for c in s.components]] for s in services])
+
+def structureHash(topology):
+    # Hash of everything that decides the rows and columns of the master problem for topology. A saved basis is only
+    # used if this is unchanged.
+    return _hash([[l.description, l.type, sorted(l.resources) if l.resources else None] for l in topology.locations] +
+                 [[l.source.description, l.sink.description, l.two_way] for l in topology.links])
+
+def stateFile(directory, topology, services):
+    return os.path.join(directory, fingerprint(topology, services) + ".npz")
+
+def saveState(master, directory):
+    # Saves the columns of every service (in compact index form from each column_store), the basis of the last LP
+    # relaxation solved and the placement of the last solve to directory/<fingerprint>.npz. Links and nodes are saved
+    # by description so the columns can be mapped onto a changed topology. Returns the file name.
+    topology, services = master.topology, master.services
+    arrays = {}
+    for s, service in enumerate(services):
+        store = service.graphs[topology.name].store
+        for key in ("link_indptr", "link_indices", "link_counts", "assignment_indptr", "assignment_components", "assignment_nodes"):
+            arrays["{}_{}".format(s, key)] = np.frombuffer(getattr(store, key), dtype=np.int64)
+    if master.lp_basis != None or master.relax:
+        vbasis, cbasis = master.lp_basis if master.lp_basis != None else master.solver.getBasis()
+        # The variable basis is saved in the order a new master_problem over the same columns would have (the flows of
+        # every column of every service, then assignments, then artificial flows) with evicted columns non basic
+        flows = [np.asarray(master.flows[service.description], dtype=np.int64) for service in services]
+        x = np.concatenate([np.where(f >= 0, vbasis[f], AT_LOWER) for f in flows]) if flows else np.zeros(0, dtype=np.int64)
+        arrays["vbasis"] = np.concatenate([x, vbasis[master.y], vbasis[list(master.artificial.values())]]).astype(np.int64)
+        arrays["cbasis"] = np.asarray(cbasis, dtype=np.int64)
+    result = master.getResult()
+    meta = {"fingerprint": fingerprint(topology, services), "structure": structureHash(topology),
+            "links": [[l.source.description, l.sink.description] for l in topology.links],
+            "nodes": [n.description for n in topology.getNodes()],
+            "services": [[c.description for c in service.components] for service in services],
+            "objective": result.objective, "placement": result.placements() if result.status != None and result.objective != None else None}
+    arrays["meta"] = np.array(json.dumps(meta))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    filename = stateFile(directory, topology, services)
+    np.savez(filename, **arrays)
+    return filename
+
+class warm_state(object):
+    ## State saved by saveState, loaded for a topology and services
+        # \param meta       Dictionary of the saved descriptions, objective and placement
+        # \param arrays     The saved arrays
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self.placement = meta["placement"]
+        self.objective = meta["objective"]
+        self.dropped = 0
+        self.loaded = 0
+        # Index in each service's column_store of every saved column (-1 if it was dropped), {service: [column]}. A
+        # saved column may land anywhere in the store: after paths the graph already had, or on an equal one of them.
+        self.columns = {}
+
+def loadState(topology, services, directory):
+    # Loads the state saved for topology and services (None if there is none) and adds the saved columns to the service
+    # graphs (which must have been made with service.addGraph). Columns using links or nodes no longer in the topology
+    # are dropped. The restored paths only hold their compact coefficients, not the service graph links.
+    filename = stateFile(directory, topology, services)
+    if not os.path.exists(filename):
+        return None
+    with np.load(filename) as data:
+        arrays = dict((key, data[key]) for key in data.files)
+    meta = json.loads(str(arrays.pop("meta")))
+    state = warm_state(meta, arrays)
+
+    link_index = dict(((l.source.description, l.sink.description), i) for i, l in enumerate(topology.links))
+    links = np.array([link_index.get(tuple(l), -1) for l in meta["links"]], dtype=np.int64)
+    node_index = dict((n.description, i) for i, n in enumerate(topology.getNodes()))
+    nodes = np.array([node_index.get(n, -1) for n in meta["nodes"]], dtype=np.int64)
+    for s, service in enumerate(services):
+        graph = service.graphs[topology.name]
+        component_index = dict((c.description, i) for i, c in enumerate(service.components))
+        components = np.array([component_index.get(c, -1) for c in meta["services"][s]], dtype=np.int64)
+        get = lambda key: arrays["{}_{}".format(s, key)]
+        link_indptr, assignment_indptr = get("link_indptr"), get("assignment_indptr")
+        loaded = state.columns[service.description] = []
+        for k in range(len(link_indptr) - 1):
+            link_indices = links[get("link_indices")[link_indptr[k]:link_indptr[k+1]]]
+            counts = get("link_counts")[link_indptr[k]:link_indptr[k+1]]
+            column_components = components[get("assignment_components")[assignment_indptr[k]:assignment_indptr[k+1]]]
+            column_nodes = nodes[get("assignment_nodes")[assignment_indptr[k]:assignment_indptr[k+1]]]
+            if (link_indices < 0).any() or (column_components < 0).any() or (column_nodes < 0).any():
+                state.dropped += 1
+                loaded.append(-1)
+                continue
+            order = np.argsort(link_indices, kind="stable")
+            columns = (link_indices[order].tolist(), counts[order].tolist(), column_components.tolist(), column_nodes.tolist())
+            path = service_path(topology.name + "_" + service.description, [], [], columns, topology, service)
+            column, new = graph.addPath(path)
+            loaded.append(column)
+            if new:
+                state.loaded += 1
+    logger.info("Warm start from {}: {} columns loaded, {} dropped".format(filename, state.loaded, state.dropped))
+    return state
+
+def applyState(master, state):
+    # Warm starts master (built after loadState) from the saved basis, if the topology's structure is unchanged and
+    # every saved column was loaded onto a variable of master, and gives the saved placement as a MIP start. Returns
+    # True if the basis was used.
+    used = False
+    if "vbasis" in state.arrays and state.dropped == 0 and state.meta["structure"] == structureHash(master.topology):
+        vbasis, cbasis = state.arrays["vbasis"], state.arrays["cbasis"]
+        if len(vbasis) <= master.solver.numVariables() and len(cbasis) == master.solver.numRows():
+            reordered = _reorder(master, state)
+            # Every basic variable of the saved basis must have been mapped for the basis to stay valid
+            if (reordered == BASIC).sum() == (vbasis == BASIC).sum():
+                master.solver.setBasis(reordered, cbasis)
+                used = True
+    if state.placement != None:
+        variables, values = [], []
+        for c, component in enumerate(master.components):
+            placed = set(state.placement.get(component.description, []))
+            for n, node in enumerate(master.nodes):
+                variables.append(int(master.y[c * len(master.nodes) + n]))
+                values.append(1.0 if node.description in placed else 0.0)
+        master.solver.setStart(variables, values)
+    return used
+
+def _reorder(master, state):
+    # Maps the saved basis (in master_problem construction order) onto master's variables through the store index each
+    # saved column was loaded at (warm_state.columns). Any other column (e.g. an initial or heuristic path) is non basic.
+    vbasis = state.arrays["vbasis"]
+    result = np.full(master.solver.numVariables(), AT_LOWER, dtype=np.int64)
+    position = 0
+    for service in master.services:
+        flows = np.asarray(master.flows[service.description], dtype=np.int64)
+        columns = np.asarray(state.columns[service.description], dtype=np.int64)
+        variables = flows[columns]
+        active = variables >= 0
+        result[variables[active]] = vbasis[position:position + len(columns)][active]
+        position += len(columns)
+    result[master.y] = vbasis[position:position + len(master.y)]
+    result[list(master.artificial.values())] = vbasis[position + len(master.y):]
+    return result